@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+import sys
+
+from modules.batch import find_maps, run_batch
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--maps",
+        help="Directories or glob patterns of the map files (every level of a collection or a library is solved)",
+        nargs="+",
+        default=["maps"],
+    )
+    parser.add_argument(
+        "--strategies",
+        help="Comma-separated strategies to solve every map with",
+        default="bfs",
+    )
+    parser.add_argument(
+        "--workers",
+        help="Number of jobs to run at the same time",
+        type=int,
+        default=os.cpu_count() or 1,
+    )
+    parser.add_argument(
+        "--timeout", help="Time limit of every job in seconds", type=float
+    )
+    parser.add_argument(
+        "--memory-limit", help="Memory limit of every job in megabytes", type=int
+    )
+    parser.add_argument(
+        "--push-level",
+        help="Search over box pushes instead of single player moves",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--deadlock-detection",
+        help="Prune states with frozen boxes or 2x2 blocks of boxes",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--macro-moves",
+        help="Push boxes through tunnels and into goal rooms in a single step",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--output", help="The JSON lines file to write (default: standard output)"
+    )
+    parser.add_argument(
+        "--cache", help="The solution cache database shared by the jobs", default=None
+    )
+    args = parser.parse_args()
+
+    jobs = [
+        (map_path, level, strategy, offset)
+        for map_path, level, offset in find_maps(args.maps)
+        for strategy in args.strategies.split(",")
+    ]
+    options = {
+        "push_level": args.push_level,
+        "deadlock_detection": args.deadlock_detection,
+        "macro_moves": args.macro_moves,
+    }
+    memory_limit = args.memory_limit * 1024 * 1024 if args.memory_limit else None
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    for result in run_batch(
+        jobs, args.workers, args.timeout, memory_limit, options, args.cache
+    ):
+        # Stream every result as soon as its job finishes
+        output.write(json.dumps(result) + "\n")
+        output.flush()
+    if args.output:
+        output.close()
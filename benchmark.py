@@ -0,0 +1,128 @@
+import argparse
+import os
+
+from modules.benchmark import (
+    BENCHMARK_MAPS,
+    BENCHMARK_STRATEGIES,
+    compare_results,
+    load_results,
+    run_benchmark,
+    save_results,
+)
+
+
+def print_results(results):
+    print(
+        "{:<28} {:<14} {:<16} {:>10} {:>10} {:>10} {:>10} {:>12} {:>7}".format(
+            "Map",
+            "Strategy",
+            "Status",
+            "Time (s)",
+            "CPU (s)",
+            "Mem (MB)",
+            "Expanded",
+            "Nodes/s",
+            "Moves",
+        )
+    )
+    for result in results:
+        print(
+            "{:<28} {:<14} {:<16} {:>10} {:>10} {:>10} {:>10} {:>12} {:>7}".format(
+                os.path.relpath(result["map"]),
+                result["strategy"],
+                result["status"],
+                format_value(result["time"], "{:.3f}"),
+                format_value(result["cpu_time"], "{:.3f}"),
+                format_value(result["peak_memory"], "{:.1f}", 1 / 1024 / 1024),
+                format_value(result["num_of_expanded"], "{}"),
+                format_value(result["nodes_per_second"], "{:.0f}"),
+                format_value(result["num_of_moves"], "{}"),
+            )
+        )
+
+
+def format_value(value, format, scale=1):
+    return "-" if value is None else format.format(value * scale)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--maps", help="The map files", nargs="+", default=list(BENCHMARK_MAPS)
+    )
+    parser.add_argument(
+        "--strategies",
+        help="Comma-separated strategies to benchmark",
+        default=",".join(BENCHMARK_STRATEGIES),
+    )
+    parser.add_argument(
+        "--repetitions", help="Number of measured runs", type=int, default=3
+    )
+    parser.add_argument(
+        "--warmup", help="Number of discarded runs before them", type=int, default=1
+    )
+    parser.add_argument(
+        "--timeout", help="Time limit of every run in seconds", type=float, default=60
+    )
+    parser.add_argument(
+        "--memory-limit", help="Memory limit of every run in megabytes", type=int
+    )
+    parser.add_argument(
+        "--push-level",
+        help="Search over box pushes instead of single player moves",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--deadlock-detection",
+        help="Prune states with frozen boxes or 2x2 blocks of boxes",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--macro-moves",
+        help="Push boxes through tunnels and into goal rooms in a single step",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--output", help="The JSON file to write the results to", default=None
+    )
+    parser.add_argument("--baseline", help="The JSON file of the results to compare to")
+    parser.add_argument(
+        "--threshold",
+        help="Relative growth of a metric flagged as a regression",
+        type=float,
+        default=0.1,
+    )
+    args = parser.parse_args()
+
+    options = {
+        "push_level": args.push_level,
+        "deadlock_detection": args.deadlock_detection,
+        "macro_moves": args.macro_moves,
+    }
+    memory_limit = args.memory_limit * 1024 * 1024 if args.memory_limit else None
+    results = run_benchmark(
+        args.maps,
+        args.strategies.split(","),
+        args.repetitions,
+        args.warmup,
+        args.timeout,
+        memory_limit,
+        options,
+    )
+    print_results(results)
+    if args.output:
+        save_results(args.output, results, options)
+
+    if args.baseline:
+        regressions = compare_results(
+            results, load_results(args.baseline), args.threshold
+        )
+        for map_path, strategy, metric, old_value, value in regressions:
+            print(
+                "Regression: {} {} {}: {} -> {}".format(
+                    map_path, strategy, metric, old_value, value
+                )
+            )
+        if regressions:
+            exit(1)
+        print("No regressions")
@@ -0,0 +1,38 @@
+import argparse
+import os
+import time
+
+from modules.game_state import GameState
+from modules.loader import load_map
+from modules.pattern_database import save_database
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--map", help="The map file", default="maps/demo_1.txt")
+    parser.add_argument(
+        "--level",
+        help="Index of the level in a collection (.sok/.xsb) or a binary library",
+        type=int,
+        default=0,
+    )
+    parser.add_argument(
+        "--sizes",
+        help="Comma-separated numbers of boxes of the patterns",
+        default="2",
+    )
+    parser.add_argument(
+        "--output",
+        help="The pattern database file to write (default: the map path with .pdb)",
+        default=None,
+    )
+    args = parser.parse_args()
+
+    board = GameState(load_map(args.map, args.level)).board
+    output = args.output or os.path.splitext(args.map)[0] + ".pdb"
+    start_time = time.time()
+    save_database(output, board, [int(size) for size in args.sizes.split(",")])
+    print(
+        "Pattern database written to {} ({} bytes) in {:.2f} s".format(
+            output, os.path.getsize(output), time.time() - start_time
+        )
+    )
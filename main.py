@@ -2,42 +2,190 @@ import argparse
 
 from modules.game_state import GameState
 from modules.game_visualization import GameVisualization
+from modules.loader import load_map
+from modules.solution_cache import SolutionCache
 from modules.solver import Solver
 
 
-def load_map(map_path):
-    """Load the map from the given path"""
-    f = open(map_path, "r")
-    map = []
-    for line in f:
-        map.append(list(line.strip()))
-    f.close()
-    return map
+def print_improved_solution(report):
+    print(
+        "Solution with cost {} found with weight {} (at most {:.3f} times the optimal cost)".format(
+            report["cost"], report["weight"], report["bound"]
+        )
+    )
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--map", help="The map file", default="maps/demo_1.txt")
+    parser.add_argument(
+        "--level",
+        help="Index of the level in a collection (.sok/.xsb) or a binary library",
+        type=int,
+        default=0,
+    )
     parser.add_argument(
         "--strategy", help="The strategy to solve the game", default="bfs"
     )
+    parser.add_argument(
+        "--push-level",
+        help="Search over box pushes instead of single player moves",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--deadlock-detection",
+        help="Prune states with frozen boxes or 2x2 blocks of boxes",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--table-size",
+        help="Number of slots of the transposition table used by idastar and iddfs",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--depth-limit",
+        help="Maximum depth of the depth-first strategies (dfs, iddfs)",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--workers",
+        help="Number of worker processes for the parallel bfs and astar",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--stats",
+        help="Measure and print the time spent in every part of the search",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--progress",
+        help="Print the search progress every N expanded states",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--profile", help="Run the solver under cProfile", action="store_true"
+    )
+    parser.add_argument(
+        "--time-limit", help="Time limit of the search in seconds", type=float
+    )
+    parser.add_argument(
+        "--node-limit", help="Maximum number of expanded states", type=int
+    )
+    parser.add_argument(
+        "--memory-limit", help="Approximate memory limit in megabytes", type=int
+    )
+    parser.add_argument(
+        "--weight",
+        help="Weight of the heuristic of wastar, and first weight of arastar (below 1: plain A*)",
+        type=float,
+        default=2.0,
+    )
+    parser.add_argument(
+        "--weight-step",
+        help="Amount the weight of arastar is lowered by after every solution",
+        type=float,
+        default=0.5,
+    )
+    parser.add_argument(
+        "--cache", help="The solution cache database to use", default=None
+    )
+    parser.add_argument(
+        "--cache-size",
+        help="Maximum number of solutions kept in the cache",
+        type=int,
+        default=10000,
+    )
+    parser.add_argument(
+        "--no-symmetries",
+        help="Do not match rotated and mirrored levels in the cache",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--vectorized",
+        help="Run the move-level bfs one layer at a time with NumPy",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--external",
+        help="Run the bfs one layer at a time with its states on disk",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--temp-directory",
+        help="Directory of the files of the external bfs (default: the system one)",
+        default=None,
+    )
+    parser.add_argument(
+        "--macro-moves",
+        help="Push boxes through tunnels and into goal rooms in a single step",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--pattern-database",
+        help="Pattern database file built by build_pdb.py for the informed strategies",
+        default=None,
+    )
     args = parser.parse_args()
 
-    map = load_map(args.map)
+    map = load_map(args.map, args.level)
 
     game_state = GameState(map)
     strategy = args.strategy
-    solver = Solver(game_state, strategy)
+    cache = None
+    if args.cache:
+        cache = SolutionCache(
+            args.cache, max_entries=args.cache_size, symmetries=not args.no_symmetries
+        )
+    solver = Solver(
+        game_state,
+        strategy,
+        push_level=args.push_level,
+        deadlock_detection=args.deadlock_detection,
+        table_size=args.table_size,
+        depth_limit=args.depth_limit,
+        num_of_workers=args.workers,
+        instrument=args.stats,
+        progress_callback=print if args.progress else None,
+        progress_interval=args.progress or 1000,
+        profile=args.profile,
+        time_limit=args.time_limit,
+        node_limit=args.node_limit,
+        memory_limit=args.memory_limit * 1024 * 1024 if args.memory_limit else None,
+        weight=args.weight,
+        weight_step=args.weight_step,
+        solution_callback=print_improved_solution,
+        cache=cache,
+        vectorized=args.vectorized,
+        external=args.external,
+        temp_directory=args.temp_directory,
+        macro_moves=args.macro_moves,
+        pattern_database=args.pattern_database,
+    )
     solver.solve()
     solution = solver.get_solution()
     if solution is None:
         print("No solution found")
+        solver.print_status()
+        best_path = solver.get_best_path()
+        if best_path is not None:
+            print("Best partial path: " + str(best_path))
+            solver.get_best_state().print_state()
         exit(1)
     solver.print_num_of_generated()
     solver.print_num_of_expanded()
+    if args.deadlock_detection:
+        solver.print_num_of_pruned()
     solver.print_number_of_moves()
     solver.print_time()
     solver.print_solution()
+    if args.stats:
+        solver.print_stats()
+    if args.profile:
+        solver.print_profile()
 
     game_visualization = GameVisualization(game_state, solution)
     game_visualization.start()
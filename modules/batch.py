@@ -0,0 +1,254 @@
+"""
+Sokuban batch solver
+Solves many (map, level, strategy, offset) jobs headlessly on a pool of worker processes (the offset is the byte
+offset of the level in a text file, see find_maps, or None to load the level by its index):
+- at most num_of_workers jobs run at the same time; a worker is started for the first jobs and then reused by the
+  next ones, so that a job does not pay the start-up of a process
+- the timeout is the time limit of the solver (see modules/limits.py): a job running longer stops itself and is
+  reported with the "timeout" status and its counters. The worker of a job still running TIMEOUT_GRACE seconds
+  after its timeout (e.g. while it precomputes a large puzzle) is terminated and replaced
+- a worker is limited to the memory limit (address space, Unix only), and a job that runs out of it is reported
+  with the "out_of_memory" status
+The results are yielded as soon as each job finishes, as dictionaries ready to be written as JSON lines:
+map, level (index of the level in its file), strategy, status ("solved", "no_solution", "timeout", "out_of_budget",
+"out_of_memory" or "error"), solution (string of moves), num_of_moves, num_of_expanded, num_of_generated, time,
+cpu_time (seconds), peak_memory (peak resident size of the worker process during the job in bytes, None if unknown)
+and cached (True if the solution came from the solution cache shared by the jobs, if any).
+The module has the following functions:
+- find_maps(paths): get the (map file, level, offset) of every level of the given directories and glob patterns
+- get_result(map_path, level, strategy, status, solver): get the result dictionary of a job
+- solve_job(map_path, level, strategy, offset, options, cache_path): solve one job in a worker process
+- run_worker(connection, options, memory_limit, cache_path): run the loop of a worker process
+- start_worker(context, options, memory_limit, cache_path): start a worker process
+- stop_worker(process, connection): stop a worker process
+- run_batch(jobs, num_of_workers, timeout, memory_limit, options, cache_path): run the jobs and yield their results
+"""
+
+import glob
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows: the memory limit is ignored
+    resource = None
+
+from modules.game_state import GameState
+from modules.limits import get_peak_memory, reset_peak_memory
+from modules.loader import PuzzleLibrary, get_level_offsets, is_library, load_map
+from modules.solution_cache import SolutionCache
+from modules.solver import Solver
+
+# Extensions of the map files found in a directory: single levels and collections (text), and binary libraries
+# (detected by their header, see modules/loader.py)
+MAP_EXTENSIONS = (".txt", ".sok", ".xsb", ".sokb")
+
+# Seconds a job may run past its timeout before its worker is terminated (the solver stops itself at the timeout,
+# the termination is only a backstop for a job stuck outside the search)
+TIMEOUT_GRACE = 5.0
+
+
+def find_maps(paths):
+    """Get the (map file, level, offset) of every level of the given directories and glob patterns, sorted and
+    without duplicates
+    The levels of a text file are indexed in one pass (see loader.get_level_offsets), so that every job reads its
+    level at its offset instead of parsing the whole collection; the levels of a library have no offset (they are
+    read from the memory-mapped library). A file that cannot be read or has no level still gives its level 0, so
+    that its job reports the error.
+    """
+    maps = []
+    for path in paths:
+        if os.path.isdir(path):
+            maps.extend(
+                os.path.join(path, name)
+                for name in os.listdir(path)
+                if name.endswith(MAP_EXTENSIONS)
+            )
+        else:
+            maps.extend(glob.glob(path))
+    levels = []
+    for map_path in sorted(set(maps)):
+        try:
+            if is_library(map_path):
+                library = PuzzleLibrary(map_path)
+                offsets = [None] * len(library)
+                library.close()
+            else:
+                offsets = get_level_offsets(map_path)
+        except Exception:
+            offsets = []
+        if not offsets:
+            offsets = [None]
+        levels.extend((map_path, level, offset) for level, offset in enumerate(offsets))
+    return levels
+
+
+def get_result(map_path, level, strategy, status, solver=None):
+    """Get the result dictionary of a job"""
+    solution = solver.get_solution() if solver is not None else None
+    return {
+        "map": map_path,
+        "level": level,
+        "strategy": strategy,
+        "status": status,
+        "solution": "".join(solution) if solution is not None else None,
+        "num_of_moves": len(solution) if solution is not None else None,
+        "num_of_expanded": solver.num_of_expanded if solver is not None else None,
+        "num_of_generated": solver.num_of_generated if solver is not None else None,
+        "time": solver.time if solver is not None else None,
+        "cpu_time": None,
+        "peak_memory": None,
+        "cached": solver.cached if solver is not None else False,
+    }
+
+
+def solve_job(map_path, level, strategy, offset, options, cache_path=None):
+    """Solve one job in a worker process and get its result"""
+    reset_peak_memory()
+    solver = None
+    start_time = time.process_time()
+    try:
+        cache = SolutionCache(cache_path) if cache_path else None
+        solver = Solver(
+            GameState(load_map(map_path, level, offset)),
+            strategy,
+            cache=cache,
+            **options
+        )
+        solver.solve()
+        if cache is not None:
+            cache.close()
+        result = get_result(map_path, level, strategy, solver.get_status(), solver)
+        result["cpu_time"] = time.process_time() - start_time
+        result["peak_memory"] = get_peak_memory()
+    except MemoryError:
+        solver = None  # Free the search before building the result
+        result = get_result(map_path, level, strategy, "out_of_memory")
+    except Exception as exception:
+        result = get_result(map_path, level, strategy, "error")
+        result["error"] = str(exception)
+    return result
+
+
+def run_worker(connection, options, memory_limit=None, cache_path=None):
+    """Run the loop of a worker process: solve the jobs received through the connection until None is received"""
+    # A Ctrl+C in the terminal also reaches the workers: run_batch stops them itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if memory_limit and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    while True:
+        try:
+            job = connection.recv()
+        except EOFError:
+            break  # The batch stopped
+        if job is None:
+            break
+        connection.send(solve_job(*job, options, cache_path))
+    connection.close()
+
+
+def start_worker(context, options, memory_limit=None, cache_path=None):
+    """Start a worker process connected by a duplex pipe and get its (process, connection)"""
+    connection, child = context.Pipe()
+    process = context.Process(
+        target=run_worker,
+        args=(child, options, memory_limit, cache_path),
+        daemon=True,
+    )
+    process.start()
+    child.close()  # Only the worker process uses its end of the pipe
+    return process, connection
+
+
+def stop_worker(process, connection, timeout=1.0):
+    """Stop a worker process, terminating it if it does not stop within the timeout"""
+    try:
+        connection.send(None)
+    except OSError:
+        pass  # The process already stopped
+    process.join(timeout)
+    if process.is_alive():
+        process.terminate()
+        process.join()
+    connection.close()
+
+
+def run_batch(
+    jobs,
+    num_of_workers=1,
+    timeout=None,
+    memory_limit=None,
+    options=None,
+    cache_path=None,
+):
+    """Run the (map, level, strategy, offset) jobs and yield their results as soon as they finish
+    Note: the memory limit is in bytes, the timeout in seconds (None for no limit)
+    """
+    options = dict(options or {}, time_limit=timeout)
+    context = multiprocessing.get_context()
+    pending = list(jobs)
+    pending.reverse()  # Jobs are popped from the end
+    idle = []  # (process, connection) of the workers waiting for a job
+    running = {}  # Connection -> (process, map, level, strategy, start time)
+
+    try:
+        while pending or running:
+            # Start new jobs while there are free workers
+            while pending and len(running) < num_of_workers:
+                map_path, level, strategy, offset = pending.pop()
+                if idle:
+                    process, connection = idle.pop()
+                else:
+                    process, connection = start_worker(
+                        context, options, memory_limit, cache_path
+                    )
+                try:
+                    connection.send((map_path, level, strategy, offset))
+                except OSError:
+                    # The idle worker stopped (e.g. killed by the system): it is replaced
+                    stop_worker(process, connection)
+                    pending.append((map_path, level, strategy, offset))
+                    continue
+                running[connection] = (process, map_path, level, strategy, time.time())
+
+            # Collect the finished jobs
+            for connection in multiprocessing.connection.wait(
+                list(running), timeout=0.1
+            ):
+                process, map_path, level, strategy, _ = running.pop(connection)
+                try:
+                    result = connection.recv()
+                    idle.append((process, connection))
+                except EOFError:
+                    # The worker died without a result (killed or crashed): it is replaced by the next job
+                    result = get_result(map_path, level, strategy, "error")
+                    result["error"] = "The worker process stopped unexpectedly"
+                    stop_worker(process, connection)
+                yield result
+
+            # Terminate the workers of the jobs that did not stop at their time limit
+            if timeout is not None:
+                now = time.time()
+                for connection, (
+                    process,
+                    map_path,
+                    level,
+                    strategy,
+                    start_time,
+                ) in list(running.items()):
+                    if now - start_time > timeout + TIMEOUT_GRACE:
+                        process.terminate()
+                        stop_worker(process, connection)
+                        del running[connection]
+                        result = get_result(map_path, level, strategy, "timeout")
+                        result["time"] = now - start_time
+                        yield result
+    finally:
+        for process, connection in idle:
+            stop_worker(process, connection)
+        for connection, (process, *_) in running.items():
+            process.terminate()
+            stop_worker(process, connection)
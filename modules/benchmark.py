@@ -0,0 +1,194 @@
+"""
+Sokuban benchmark suite
+Runs every (map, strategy) pair a number of times on the batch solver (see modules/batch.py), one job at a time so
+that the runs do not compete for the cores, and summarizes the measured runs:
+- the runs of a pair are solved one after the other by the same worker process, so the first warmup runs, which are
+  discarded, warm it up (imported modules, memory allocator) for the measured ones
+- time and cpu_time are the medians of the measured runs, peak_memory is the largest one
+- num_of_expanded, num_of_generated and num_of_moves are taken from the first measured run (the search is
+  deterministic), nodes_per_second is num_of_expanded divided by the median time
+- status is the status of the first measured run that is not "solved", or "solved". The solution of every run is
+  replayed on its level, and a run whose solution does not solve the level (or has a blocked move) is reported with
+  the "invalid_solution" status
+The results are saved as a JSON file together with the machine and the options they were measured with, and can be
+compared against a saved baseline (the pairs are matched by the absolute path of their map): a metric that grew by more than the threshold (relative) is flagged as a
+regression (except the times of very short runs), as is a pair that was solved in the baseline but is not anymore.
+The module has the following functions:
+- run_benchmark(maps, strategies, repetitions, warmup, timeout, memory_limit, options): run the benchmark
+- check_solution(map_path, solution): check that the given solution solves the level of the given map
+- summarize(map_path, strategy, runs): summarize the measured runs of a pair
+- save_results(path, results, options): save the results to a JSON file
+- load_results(path): load the results of a JSON file
+- compare_results(results, baseline, threshold): get the regressions of the results against a baseline
+"""
+
+import json
+import os
+import platform
+import statistics
+import time
+
+from modules.batch import run_batch
+from modules.game_state import GameState
+from modules.loader import load_map
+from modules.solver import STRATEGIES
+
+# Maps of the benchmark, bundled with the project (found wherever the benchmark is run from)
+MAPS_DIRECTORY = os.path.normpath(
+    os.path.join(os.path.dirname(__file__), os.pardir, "maps")
+)
+BENCHMARK_MAPS = tuple(
+    os.path.join(MAPS_DIRECTORY, name)
+    for name in (
+        "sokoban1.txt",
+        "sokoban2.txt",
+        "sokoban3.txt",
+        "sokoban4.txt",
+        "sokoban_extra1.txt",
+        "sokoban_extra2.txt",
+        "sokoban_extra3.txt",
+    )
+)
+
+# Strategies of the benchmark ("custom" is a placeholder that does not search)
+BENCHMARK_STRATEGIES = tuple(
+    strategy for strategy in STRATEGIES if strategy != "custom"
+)
+
+# Metrics compared against the baseline (a larger value is worse)
+COMPARED_METRICS = (
+    "time",
+    "cpu_time",
+    "peak_memory",
+    "num_of_expanded",
+    "num_of_generated",
+    "num_of_moves",
+)
+
+# Runs shorter than this (seconds) are too noisy to compare their times
+MIN_COMPARED_TIME = 0.05
+
+
+def run_benchmark(
+    maps,
+    strategies,
+    repetitions=3,
+    warmup=1,
+    timeout=None,
+    memory_limit=None,
+    options=None,
+):
+    """Run every strategy on every map warmup + repetitions times and get the summary of every pair
+    Note: a pair that does not solve its warmup runs is only run once, since it would fail the same way again
+    """
+    results = []
+    for map_path in maps:
+        for strategy in strategies:
+            runs = []
+            jobs = [(map_path, 0, strategy, None)] * (warmup + repetitions)
+            # A single worker solves all the runs of the pair
+            batch = run_batch(jobs, 1, timeout, memory_limit, options)
+            for run in batch:
+                runs.append(run)
+                if run["status"] == "solved" and not check_solution(
+                    map_path, run["solution"]
+                ):
+                    run["status"] = "invalid_solution"
+                if run["status"] != "solved":
+                    break
+            batch.close()  # Stop the worker of the pair
+            if len(runs) > warmup:
+                runs = runs[warmup:]
+            results.append(summarize(map_path, strategy, runs))
+    return results
+
+
+def check_solution(map_path, solution):
+    """Check that the given solution (string of moves) solves the level of the given map, every move changing the
+    position of the player
+    """
+    return GameState(load_map(map_path)).check_solution(solution)
+
+
+def summarize(map_path, strategy, runs):
+    """Summarize the measured runs of a (map, strategy) pair"""
+    first = runs[0]
+    statuses = [run["status"] for run in runs if run["status"] != "solved"]
+    times = [run["time"] for run in runs if run["time"] is not None]
+    cpu_times = [run["cpu_time"] for run in runs if run["cpu_time"] is not None]
+    peak_memories = [
+        run["peak_memory"] for run in runs if run["peak_memory"] is not None
+    ]
+
+    median_time = statistics.median(times) if times else None
+    nodes_per_second = None
+    if median_time and first["num_of_expanded"] is not None:
+        nodes_per_second = first["num_of_expanded"] / median_time
+    return {
+        "map": map_path,
+        "strategy": strategy,
+        "status": statuses[0] if statuses else "solved",
+        "num_of_runs": len(runs),
+        "time": median_time,
+        "cpu_time": statistics.median(cpu_times) if cpu_times else None,
+        "peak_memory": max(peak_memories) if peak_memories else None,
+        "num_of_expanded": first["num_of_expanded"],
+        "num_of_generated": first["num_of_generated"],
+        "nodes_per_second": nodes_per_second,
+        "num_of_moves": first["num_of_moves"],
+        "times": times,
+    }
+
+
+def save_results(path, results, options=None):
+    """Save the results to a JSON file, with the machine and the options they were measured with"""
+    document = {
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "python": platform.python_version(),
+        },
+        "options": options or {},
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+
+
+def load_results(path):
+    """Load the results of a JSON file saved by save_results"""
+    with open(path, "r") as f:
+        return json.load(f)["results"]
+
+
+def compare_results(results, baseline, threshold=0.1):
+    """Get the regressions of the results against a baseline
+    Note: returns a list of (map, strategy, metric, baseline value, value); the metric is "status" for a pair that
+    is not solved anymore. Pairs missing from the baseline are not compared.
+    """
+    baseline = {
+        (os.path.abspath(result["map"]), result["strategy"]): result
+        for result in baseline
+    }
+    regressions = []
+    for result in results:
+        pair = (result["map"], result["strategy"])
+        old = baseline.get((os.path.abspath(result["map"]), result["strategy"]))
+        if old is None:
+            continue
+        if old["status"] == "solved" and result["status"] != "solved":
+            regressions.append(pair + ("status", old["status"], result["status"]))
+            continue
+        if result["status"] != "solved":
+            continue
+        for metric in COMPARED_METRICS:
+            old_value = old.get(metric)
+            value = result.get(metric)
+            if old_value is None or value is None:
+                continue
+            if metric in ("time", "cpu_time") and old_value < MIN_COMPARED_TIME:
+                continue
+            if value > old_value * (1 + threshold):
+                regressions.append(pair + (metric, old_value, value))
+    return regressions
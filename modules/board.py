@@ -0,0 +1,128 @@
+"""
+Sokuban static board class
+The board keeps the parts of a puzzle that never change during a search: the walls and the targets.
+It is built once per puzzle and shared by every game state generated from it, so a game state only has to
+keep track of the player and the boxes.
+The cells of the board are stored in a flat array that is padded with a border of walls. A cell is therefore a
+single integer index and moving to a direction is a single addition (no bound checks are needed).
+The board class has the following methods:
+- index(position): get the cell index of the given position (row, column)
+- position(cell): get the position (row, column) of the given cell index
+- is_wall(cell): check if the given cell is a wall
+- is_target(cell): check if the given cell is a target
+- get_key(player, boxes): get the Zobrist hash of the given player cell and box cells
+- find_dead_squares(): find the cells from which a box can never be pushed to any target
+"""
+
+import random
+
+from modules.heuristic import HeuristicEngine
+
+# The directions the player can move to, in the order they are tried by the search strategies
+DIRECTIONS = ("U", "D", "L", "R")
+# The opposite of every direction, used to turn pulls back into pushes
+OPPOSITE_DIRECTIONS = {"U": "D", "D": "U", "L": "R", "R": "L"}
+
+
+class Board(object):
+    def __init__(self, map):
+        self.height = len(map)
+        self.width = max(len(row) for row in map) if map else 0
+        # One extra column on each side so that the border of walls never wraps to the next row
+        self.stride = self.width + 2
+        self.size = self.stride * (self.height + 2)
+
+        # Every cell is a wall until the map says otherwise (this includes the padding and ragged rows)
+        self.walls = bytearray(b"\x01" * self.size)
+        self.target_cells = bytearray(self.size)
+        targets = []
+        for y, row in enumerate(map):
+            for x, cell in enumerate(row):
+                index = self.index((y, x))
+                if cell != "#":
+                    self.walls[index] = 0
+                if cell in (".", "*", "+"):  # Target, box on target or player on target
+                    self.target_cells[index] = 1
+                    targets.append(index)
+        # The cells are visited in row-major order, so the targets are already sorted
+        self.targets = tuple(targets)
+
+        # Offsets to add to a cell index to move to the given direction
+        self.offsets = {
+            "U": -self.stride,
+            "D": self.stride,
+            "L": -1,
+            "R": 1,
+            "N": 0,
+        }
+        # (direction, offset) pairs for the 4 directions the player can move to
+        self.moves = tuple(
+            (direction, self.offsets[direction]) for direction in DIRECTIONS
+        )
+
+        # Row and column of every cell, used for Manhattan distances without divisions
+        self.rows = [index // self.stride - 1 for index in range(self.size)]
+        self.cols = [index % self.stride - 1 for index in range(self.size)]
+
+        # Zobrist tables: one random 64-bit number per cell for a box and for the player.
+        # The key of a state is the XOR of the numbers of its boxes and its player, so moving
+        # a box or the player only takes two XORs. The seed keeps the keys reproducible.
+        generator = random.Random(self.size)
+        self.box_keys = [generator.getrandbits(64) for _ in range(self.size)]
+        self.player_keys = [generator.getrandbits(64) for _ in range(self.size)]
+
+        # Dead squares never change during a search, so they are computed once per puzzle
+        self.dead_squares = self.find_dead_squares()
+        # The push distances to the targets are precomputed the same way (see modules/heuristic.py)
+        self.heuristic = HeuristicEngine(self)
+
+    def index(self, position):
+        """Get the cell index of the given position (row, column)"""
+        return (position[0] + 1) * self.stride + position[1] + 1
+
+    def position(self, cell):
+        """Get the position (row, column) of the given cell index"""
+        return self.rows[cell], self.cols[cell]
+
+    def is_wall(self, cell):
+        """Check if the given cell is a wall"""
+        return self.walls[cell] == 1
+
+    def is_target(self, cell):
+        """Check if the given cell is a target"""
+        return self.target_cells[cell] == 1
+
+    def get_key(self, player, boxes):
+        """Get the Zobrist hash of the given player cell and box cells"""
+        key = self.player_keys[player] if player is not None else 0
+        for box in boxes:
+            key ^= self.box_keys[box]
+        return key
+
+    def find_dead_squares(self):
+        """Find the cells from which a box can never be pushed to any target
+        The boxes are pulled backwards from every target: a box can be pulled from a cell to a neighbor cell if
+        the neighbor and the cell behind it (where the player stands) are not walls. Every cell that is not
+        reached is a dead square (corners and wall edges without a target). The result is a flat array.
+        """
+        alive = bytearray(self.size)
+        stack = list(self.targets)
+        for target in self.targets:
+            alive[target] = 1
+        while stack:
+            cell = stack.pop()
+            for _, offset in self.moves:
+                pulled = cell + offset  # Cell the box is pulled to
+                if (
+                    not alive[pulled]
+                    and not self.walls[pulled]
+                    and not self.walls[pulled + offset]  # Cell the player pulls from
+                ):
+                    alive[pulled] = 1
+                    stack.append(pulled)
+
+        dead_squares = bytearray(self.size)
+        for cell in range(self.size):
+            if not self.walls[cell] and not alive[cell]:
+                dead_squares[cell] = 1
+        return dead_squares
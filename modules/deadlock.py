@@ -0,0 +1,91 @@
+"""
+Sokuban dynamic deadlock detector
+The dead squares of the board (see Board.find_dead_squares) only catch boxes that are stuck on their own.
+This detector catches the deadlocks created by boxes blocking each other:
+- 2x2 blocks: four cells forming a square that are all walls or boxes, with at least one box not on a target
+- frozen boxes: a box that cannot move horizontally nor vertically (because of walls, dead squares or other
+  frozen boxes) and is not on a target
+Only the box pushed by the last move can create a new deadlock, so the checks start from that box
+(GameState.pushed_box) instead of scanning the whole board.
+The detector is pluggable: the solver calls is_deadlocked() on every generated state when it is enabled, and the
+detector counts how many states it pruned.
+The deadlock detector class has the following methods:
+- is_deadlocked(state): check if the box pushed by the last move created a deadlock
+- has_blocked_square(state, box): check if the given box is part of a 2x2 block with a box not on a target
+- is_frozen(state, box, checked): check if the given box can never be moved again
+- is_axis_blocked(state, box, offset, checked): check if the given box cannot move along the given axis
+"""
+
+
+class DeadlockDetector(object):
+    def __init__(self):
+        self.num_of_pruned = 0
+
+    def is_deadlocked(self, state):
+        """Check if the box pushed by the last move created a deadlock"""
+        box = state.pushed_box
+        if box is None:
+            # Walking without pushing a box never creates a deadlock
+            return False
+
+        deadlocked = self.has_blocked_square(state, box)
+        if not deadlocked:
+            checked = []
+            if self.is_frozen(state, box, checked):
+                # The boxes left in checked are the frozen group around the pushed box
+                target_cells = state.board.target_cells
+                deadlocked = any(not target_cells[frozen] for frozen in checked)
+
+        if deadlocked:
+            self.num_of_pruned += 1
+        return deadlocked
+
+    def has_blocked_square(self, state, box):
+        """Check if the given box is part of a 2x2 block with a box not on a target"""
+        walls = state.board.walls
+        target_cells = state.board.target_cells
+        stride = state.board.stride
+        # The 4 squares containing the box, given by their top-left cell
+        for corner in (box, box - 1, box - stride, box - stride - 1):
+            square = (corner, corner + 1, corner + stride, corner + stride + 1)
+            if all(walls[cell] or cell in state.boxes for cell in square) and any(
+                cell in state.boxes and not target_cells[cell] for cell in square
+            ):
+                return True
+        return False
+
+    def is_frozen(self, state, box, checked):
+        """Check if the given box can never be moved again
+        The boxes in checked are treated as walls to avoid checking the same boxes in circles.
+        If the box turns out not to be frozen, it is removed from checked together with the boxes that were only
+        frozen because of it, so checked ends up holding the frozen group.
+        """
+        size = len(checked)
+        checked.append(box)
+        frozen = self.is_axis_blocked(state, box, 1, checked) and self.is_axis_blocked(
+            state, box, state.board.stride, checked
+        )
+        if not frozen:
+            del checked[size:]
+        return frozen
+
+    def is_axis_blocked(self, state, box, offset, checked):
+        """Check if the given box cannot move along the axis given by the offset (1: horizontal, stride: vertical)
+        The box is blocked if:
+        - there is a wall on either side
+        - there are dead squares on both sides
+        - there is a frozen box on either side
+        """
+        board = state.board
+        before = box - offset
+        after = box + offset
+        if board.walls[before] or board.walls[after]:
+            return True
+        if board.dead_squares[before] and board.dead_squares[after]:
+            return True
+        for side in (before, after):
+            if side in checked:
+                return True
+            if side in state.boxes and self.is_frozen(state, side, checked):
+                return True
+        return False
@@ -0,0 +1,201 @@
+"""
+Sokuban external-memory breadth-first search
+The breadth-first search keeps its frontier and its visited states on disk instead of in memory, one depth layer
+at a time, so that the memory used does not grow with the number of states:
+- a state is encoded as a fixed-size record: the player cell and the sorted box cells as big-endian 16-bit
+  integers, so that the records sort like the cells
+- layer d is a sorted file of records. It is read in order and its states are expanded; the neighbors are buffered,
+  and every CHUNK_SIZE records the buffer is sorted, deduplicated and written to a run file
+- the runs are merged into a sorted stream, and the duplicates are removed by merging it with the sorted file of
+  all the visited states (delayed duplicate detection). What is left is layer d + 1, and the visited file is
+  rebuilt by merging it with the new layer
+- the search stops when a solved state is generated. The path is then rebuilt by a backward pass over the layers:
+  the parent of a state of layer d is the first state of layer d - 1 that has it as a neighbor
+The files are written in a temporary directory, which is removed at the end of the search.
+The external search class has the following methods:
+- search(): run the search and get the solution path
+- get_path(directory, depth, goal): rebuild the path to the goal with a backward pass over the layers
+- encode(state): get the record of the given state
+- decode(record, cost): get the state of the given record
+- expand_layer(layer_path, depth, runs_directory): expand a layer, write the sorted runs of its neighbors
+- write_run(path, records): sort, deduplicate and write the given records
+- merge_layer(run_paths, visited_path, layer_path, new_visited_path): remove the visited states from the runs
+- find_parent(layer_path, depth, record): find the parent of the given state in the given layer
+- read_records(path): read the records of the given file in order
+"""
+
+import heapq
+import os
+import shutil
+import struct
+import tempfile
+
+# Number of records buffered in memory before they are sorted and written to a run file
+CHUNK_SIZE = 100000
+# Number of records read or written at once
+BLOCK_SIZE = 4096
+
+
+class ExternalSearch(object):
+    def __init__(self, solver, directory=None):
+        self.solver = solver
+        # Directory the temporary directory of the search is created in (None for the default one)
+        self.directory = directory
+        self.start_state = solver.get_start_state()
+        self.record = struct.Struct(">%dH" % (len(self.start_state.boxes) + 1))
+        self.num_of_layers = 0
+
+    def search(self):
+        """Run the search and get the solution path (moves, or pushes for the push-level search)"""
+        if self.start_state.check_solved():
+            return []
+        if self.start_state.board.size > 65536:
+            raise Exception("The board is too large for the external search")
+        directory = tempfile.mkdtemp(prefix="sokoban-", dir=self.directory)
+        try:
+            layer_path = os.path.join(directory, "layer-0")
+            visited_path = os.path.join(directory, "visited-0")
+            self.write_run(layer_path, [self.encode(self.start_state)])
+            shutil.copyfile(layer_path, visited_path)
+
+            depth = 0
+            while True:
+                runs_directory = os.path.join(directory, "runs")
+                os.mkdir(runs_directory)
+                run_paths, goal = self.expand_layer(layer_path, depth, runs_directory)
+                if goal is not None:
+                    return self.get_path(directory, depth, goal)
+
+                depth += 1
+                layer_path = os.path.join(directory, "layer-%d" % depth)
+                new_visited_path = os.path.join(directory, "visited-%d" % depth)
+                size = self.merge_layer(
+                    run_paths, visited_path, layer_path, new_visited_path
+                )
+                shutil.rmtree(runs_directory)
+                os.remove(visited_path)
+                visited_path = new_visited_path
+                self.num_of_layers = depth
+                if size == 0:
+                    return None
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def get_path(self, directory, depth, goal):
+        """Rebuild the path to the goal, generated from the given state of the given layer (backward pass)"""
+        record, moves = goal
+        path = moves[::-1]
+        while depth > 0:
+            layer_path = os.path.join(directory, "layer-%d" % (depth - 1))
+            record, moves = self.find_parent(layer_path, depth - 1, record)
+            path.extend(reversed(moves))
+            depth -= 1
+        path.reverse()
+        return path
+
+    def encode(self, state):
+        """Get the record of the given state"""
+        return self.record.pack(state.player, *state.boxes)
+
+    def decode(self, record, cost):
+        """Get the state of the given record, reached with the given cost"""
+        cells = self.record.unpack(record)
+        state = self.start_state.copy()
+        state.player = cells[0]
+        state.boxes = cells[1:]
+        state.key = state.board.get_key(state.player, state.boxes)
+        state.current_cost = cost
+        return state
+
+    def expand_layer(self, layer_path, depth, runs_directory):
+        """Expand the states of a layer and write the sorted runs of their neighbors
+        Note: returns the paths of the runs, and the (record, moves) of the parent of the first solved neighbor (None
+        if there is none)
+        """
+        run_paths = []
+        buffer = []
+        for record in self.read_records(layer_path):
+            state = self.decode(record, depth)
+            for n in self.solver.get_neighbors(state):
+                if n.check_solved():
+                    return run_paths, (record, self.solver.get_moves(n))
+                buffer.append(self.encode(n))
+            if len(buffer) >= CHUNK_SIZE:
+                run_paths.append(os.path.join(runs_directory, str(len(run_paths))))
+                self.write_run(run_paths[-1], buffer)
+                buffer = []
+        if buffer:
+            run_paths.append(os.path.join(runs_directory, str(len(run_paths))))
+            self.write_run(run_paths[-1], buffer)
+        return run_paths, None
+
+    def write_run(self, path, records):
+        """Sort, deduplicate and write the given records"""
+        records = sorted(set(records))
+        with open(path, "wb") as f:
+            for start in range(0, len(records), BLOCK_SIZE):
+                f.write(b"".join(records[start : start + BLOCK_SIZE]))
+
+    def merge_layer(self, run_paths, visited_path, layer_path, new_visited_path):
+        """Merge the runs into the new layer, without the visited states, and write the new visited file
+        Note: returns the number of states of the new layer
+        """
+        size = 0
+        runs = heapq.merge(*[self.read_records(path) for path in run_paths])
+        visited = self.read_records(visited_path)
+        current = next(visited, None)
+        previous = None
+        with open(layer_path, "wb") as layer, open(new_visited_path, "wb") as output:
+            layer_block = []
+            output_block = []
+            for record in runs:
+                if record == previous:
+                    continue  # Duplicate between two runs
+                previous = record
+                # Copy the visited states that come before the record
+                while current is not None and current < record:
+                    output_block.append(current)
+                    current = next(visited, None)
+                if current == record:
+                    continue  # Already visited
+                layer_block.append(record)
+                output_block.append(record)
+                size += 1
+                if len(layer_block) >= BLOCK_SIZE:
+                    layer.write(b"".join(layer_block))
+                    layer_block = []
+                if len(output_block) >= BLOCK_SIZE:
+                    output.write(b"".join(output_block))
+                    output_block = []
+            while current is not None:
+                output_block.append(current)
+                current = next(visited, None)
+                if len(output_block) >= BLOCK_SIZE:
+                    output.write(b"".join(output_block))
+                    output_block = []
+            layer.write(b"".join(layer_block))
+            output.write(b"".join(output_block))
+        return size
+
+    def find_parent(self, layer_path, depth, record):
+        """Find the first state of the given layer that has the given state as a neighbor
+        Note: returns the record of the parent and the moves from the parent to the state
+        """
+        for parent in self.read_records(layer_path):
+            state = self.decode(parent, depth)
+            # The neighbors are not counted as expansions, the backward pass only rebuilds the path
+            for n in self.solver.generate_neighbors(state):
+                if self.encode(n) == record:
+                    return parent, self.solver.get_moves(n)
+        raise Exception("The parent of a state was not found")
+
+    def read_records(self, path):
+        """Read the records of the given file in order"""
+        size = self.record.size
+        with open(path, "rb") as f:
+            while True:
+                block = f.read(size * BLOCK_SIZE)
+                if not block:
+                    return
+                for start in range(0, len(block), size):
+                    yield block[start : start + size]
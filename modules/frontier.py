@@ -0,0 +1,62 @@
+"""
+Sokuban search frontier
+A priority queue for the informed search strategies (UCS, A*, greedy) built directly on heapq, without the thread
+lock taken by queue.PriorityQueue on every put/get.
+Entries are tuples (f, -g, counter, key, item):
+- f is the priority of the entry (cost, total cost or heuristic depending on the strategy)
+- ties on f are broken by the larger g (equivalent to the smaller h for A*), then by insertion order
+- the counter is unique, so the key and the item are never compared
+Decrease-key is lazy: the best g found so far for every state key is kept in a table. Pushing a state that is
+already known with a cheaper or equal g is ignored, and pushing it with a cheaper g adds a new entry that makes
+the old ones stale. Stale entries are skipped when they reach the top of the heap. A state that was already
+expanded is reopened if a cheaper path to it is found later.
+The frontier class has the following methods:
+- push(key, item, f, g): add an item for the state with the given key, if its g is the best found so far
+- pop(): remove and get the item with the lowest priority
+- empty(): check if there are no more items to pop
+- get_best_cost(key): get the best g found so far for the given state key
+"""
+
+import heapq
+
+
+class Frontier(object):
+    def __init__(self):
+        self.heap = []
+        self.best_g = {}
+        self.counter = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, key, item, f, g):
+        """Add an item for the state with the given key, if its g is the best found so far
+        Note: returns False if the state is already known with a cheaper or equal g
+        """
+        best_g = self.best_g.get(key)
+        if best_g is not None and best_g <= g:
+            return False
+        self.best_g[key] = g
+        heapq.heappush(self.heap, (f, -g, self.counter, key, item))
+        self.counter += 1
+        return True
+
+    def discard_stale(self):
+        """Remove the stale entries from the top of the heap"""
+        heap = self.heap
+        while heap and -heap[0][1] != self.best_g[heap[0][3]]:
+            heapq.heappop(heap)
+
+    def pop(self):
+        """Remove and get the item with the lowest priority"""
+        self.discard_stale()
+        return heapq.heappop(self.heap)[4]
+
+    def empty(self):
+        """Check if there are no more items to pop"""
+        self.discard_stale()
+        return not self.heap
+
+    def get_best_cost(self, key):
+        """Get the best g found so far for the given state key"""
+        return self.best_g.get(key)
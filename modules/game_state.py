@@ -1,6 +1,6 @@
 """
 Sokuban game state class
-The state of the game consists the map which is a 2D array of characters. There are 6 types of characters:
+The map of a puzzle is a 2D array of characters. There are 7 types of characters:
 - ' ': empty space
 - '#': wall
 - '$': box
@@ -8,99 +8,165 @@ The state of the game consists the map which is a 2D array of characters. There
 - '@': player
 - '+': player on target
 - '*': box on target
-The game state class keeps track of the map.
-The game state also keeps track of the player and box positions, and whether the game is solved or not.
+The static part of the map (walls and targets) is kept once per puzzle in a shared Board (see modules/board.py).
+A game state only keeps track of the player cell and a sorted tuple of box cells, so creating a new state is cheap.
+Cells are integer indices on the board; the methods that take or return a position use tuples (row, column).
+Every game state also keeps a Zobrist hash of the player and the boxes (see Board.get_key). It is updated
+incrementally in move() and is used as the key of the state in the visited sets of the search strategies.
 The game state class has the following methods:
-- find_player(): find the player in the map and return its position
-- find_boxes(): find all the boxes in the map and return their positions
-- find_targets(): find all the targets in the map and return their positions
-- find_targets_without_box(): find all the targets without a box on top in the map and return their positions
+- get_key(): get the precomputed hash key of the game state
+
+- find_player(): get the position of the player
+- find_boxes(): get the positions of all the boxes
+- find_targets(): get the positions of all the targets
+- find_targets_without_box(): get the positions of all the targets without a box on top
 
 - is_wall(position): check if the given position is a wall
 - is_box(position): check if the given position is a box
 - is_target(position): check if the given position is a target
 - is_empty(position): check if the given position is empty
 
-- get_distance(position1, position2): get the distance between two positions using Manhattan distance
-- get_nearest_target(position): get the nearest target from the given position by exhaustive iteration
-- get_heuristic(): get the heuristic for the game state
-- get_total_cost(): get the sum of the current cost and the heuristic
+- get_distance(cell1, cell2): get the distance between two cells using Manhattan distance
+- get_nearest_target(cell): get the nearest target from the given cell by exhaustive iteration
+- get_heuristic(): get the heuristic for the game state (minimum-cost matching of boxes to targets)
+- get_total_cost(weight): get the sum of the current cost and the heuristic (multiplied by the weight)
 - get_current_cost(): get the current cost for the game state
 
-- new_position(position, direction): get the new position after moving to the given direction
-- is_stuck(box): check if a given box cannot be moved
+- new_position(cell, direction): get the new cell after moving to the given direction
+- is_stuck(box): check if a given box cannot be moved to any target
 - has_stuck_box(): check if the game state has a stuck box
 
+- copy(): get a new game state sharing the same board
 - move(direction): generate the next game state by moving the player to the given direction
+- push(box, direction): move the player behind the given box and push it to the given direction
+- pull(box, direction): move the player next to the given box and pull it to the given direction
+- undo(direction, player, pushed_box): undo a move or push in place
+
+- get_reachable(): get the cells the player can walk to without pushing a box
+- normalize(): move the player to the canonical cell of the region it can walk to
+- get_path(cell): get the moves for the player to walk to the given cell without pushing a box
+- expand_pushes(pushes): expand a sequence of pushes into the full list of moves
 
 - generate_neighbors(): generate the neighbors/successors of the game state by moving the player in all directions
+- generate_push_neighbors(): generate the neighbors/successors of the game state by pushing a box in all directions
+- generate_pull_neighbors(): generate the predecessors of the game state by pulling a box in all directions
+- get_legal_moves(): get the directions the player can move to, for a search walking a single mutable state
+- get_legal_pushes(): get the (box, direction) pushes the player can make, for a search walking a single mutable state
+- get_goal_states(): get the solved game states, one per region the player can be in after the last push
 - check_solved(): check if the game is solved
+- check_solution(moves): check if the given moves solve the game, every move changing the position of the player
 - print_state(): print the game state
 """
 
-from copy import deepcopy
+from modules.board import Board, DIRECTIONS
 
 
 class GameState:
+    __slots__ = (
+        "board",
+        "player",
+        "boxes",
+        "key",
+        "current_cost",
+        "compare_value",
+        "last_move",
+        "last_push",
+        "pushed_box",
+        "macro",
+    )
+
     def __init__(self, map, current_cost=0):
         self.set_state(map, current_cost)
 
     def set_state(self, map, current_cost=0):
-        self.map = map
+        self.board = Board(map)
         self.current_cost = current_cost
-        self.height = len(self.map)
-        self.width = len(self.map[0])
-        self.player = self.find_player()
-        self.boxes = self.find_boxes()
-        self.targets = self.find_targets()
-        self.targets_without_box = self.find_targets_without_box()
-        self.is_solved = self.check_solved()
+        self.player = None
+        boxes = []
+        for y, row in enumerate(map):
+            for x, cell in enumerate(row):
+                if cell in ("@", "+"):  # Player or player on target
+                    self.player = self.board.index((y, x))
+                elif cell in ("$", "*"):  # Box or box on target
+                    boxes.append(self.board.index((y, x)))
+        self.boxes = tuple(sorted(boxes))
+        self.key = self.board.get_key(self.player, self.boxes)
         self.compare_value = 0
         self.last_move = "N"
+        self.last_push = None
+        self.pushed_box = None
+        self.macro = None
 
     def __lt__(self, other):
         return self.compare_value < other.compare_value
 
+    def get_key(self):
+        """Get the precomputed hash key of the game state
+        Note: two game states with the same player and box cells have the same key
+        """
+        return self.key
+
+    @property
+    def height(self):
+        return self.board.height
+
+    @property
+    def width(self):
+        return self.board.width
+
+    @property
+    def targets(self):
+        return self.board.targets
+
+    @property
+    def targets_without_box(self):
+        return [target for target in self.board.targets if target not in self.boxes]
+
+    @property
+    def is_solved(self):
+        return self.check_solved()
+
+    @property
+    def map(self):
+        """Render the game state as a 2D array of characters"""
+        map = []
+        for y in range(self.board.height):
+            row = []
+            for x in range(self.board.width):
+                cell = self.board.index((y, x))
+                if self.board.walls[cell]:
+                    row.append("#")
+                elif cell in self.boxes:
+                    row.append("*" if self.board.target_cells[cell] else "$")
+                elif cell == self.player:
+                    row.append("+" if self.board.target_cells[cell] else "@")
+                else:
+                    row.append("." if self.board.target_cells[cell] else " ")
+            map.append(row)
+        return map
+
     # ------------------------------------------------------------------------------------------------------------------
     # The following methods are used to find the player, boxes, and targets in the map
     # The positions are tuples (row, column)
     # ------------------------------------------------------------------------------------------------------------------
 
     def find_player(self):
-        """Find the player in the map and return its position"""
-        for y, row in enumerate(self.map):
-            for x, cell in enumerate(row):
-                if cell in ("@", "+"):  # Player or player on target
-                    return y, x
-        return None
+        """Get the position of the player"""
+        if self.player is None:
+            return None
+        return self.board.position(self.player)
 
     def find_boxes(self):
-        """Find all the boxes in the map and return their positions"""
-        boxes = []
-        for y, row in enumerate(self.map):
-            for x, cell in enumerate(row):
-                if self.is_box((y, x)):  # Box or box on target
-                    boxes.append((y, x))
-        return boxes
+        """Get the positions of all the boxes"""
+        return [self.board.position(box) for box in self.boxes]
 
     def find_targets(self):
-        """Find all the targets in the map and return their positions"""
-        """Find all the boxes in the map and return their positions"""
-        targets = []
-        for y, row in enumerate(self.map):
-            for x, cell in enumerate(row):
-                if self.is_target((y, x)):  # Target or box on target
-                    targets.append((y, x))
-        return targets
+        """Get the positions of all the targets"""
+        return [self.board.position(target) for target in self.board.targets]
 
     def find_targets_without_box(self):
-        """Find all the targets without a box on top in the map and return their positions"""
-        targets = []
-        for y, row in enumerate(self.map):
-            for x, cell in enumerate(row):
-                if self.is_target((y, x)) and not self.is_box((y, x)):
-                    targets.append((y, x))
-        return targets
+        """Get the positions of all the targets without a box on top"""
+        return [self.board.position(target) for target in self.targets_without_box]
 
     # ------------------------------------------------------------------------------------------------------------------
     # The following methods are used to check if a position is a wall, box, target, or empty space
@@ -109,51 +175,47 @@ class GameState:
 
     def is_wall(self, position):
         """Check if the given position is a wall"""
-        x, y = position
-        if self.map[x][y] == "#":
-            return True
-        return False
+        return self.board.is_wall(self.board.index(position))
 
     def is_box(self, position):
         """Check if the given position is a box
-        Note: the box can be on "$" or "*" (box on target)
+        Note: the box can be on an empty space or on a target
         """
-        x, y = position
-        if self.map[x][y] in ("$", "*"):
-            return True
-        return False
+        return self.board.index(position) in self.boxes
 
     def is_target(self, position):
         """Check if the given position is a target
-        Note: the target can be "." or "*" (box on target)
+        Note: the target can have a box on top
         """
-        x, y = position
-        if self.map[x][y] in (".", "*"):
-            return True
-        return False
+        return self.board.is_target(self.board.index(position))
 
     def is_empty(self, position):
         """Check if the given position is empty"""
-        x, y = position
-        if self.map[x][y] == " ":
-            return True
-        return False
+        cell = self.board.index(position)
+        return (
+            not self.board.walls[cell]
+            and not self.board.target_cells[cell]
+            and cell not in self.boxes
+            and cell != self.player
+        )
 
     # ------------------------------------------------------------------------------------------------------------------
     # The following methods get heuristics for the game state (for informed search strategies)
     # ------------------------------------------------------------------------------------------------------------------
 
-    def get_distance(self, position1, position2):
-        """Get the distance between two positions using Manhattan distance"""
-        return abs(position1[0] - position2[0]) + abs(position1[1] - position2[1])
+    def get_distance(self, cell1, cell2):
+        """Get the distance between two cells using Manhattan distance"""
+        rows = self.board.rows
+        cols = self.board.cols
+        return abs(rows[cell1] - rows[cell2]) + abs(cols[cell1] - cols[cell2])
 
-    def get_nearest_target(self, position):
-        """Get the nearest target from the given position by exhaustive iteration"""
+    def get_nearest_target(self, cell):
+        """Get the nearest target from the given cell by exhaustive iteration"""
         nearest_target = None
         nearest_distance = self.height + self.width
 
         for target in self.targets:
-            distance = self.get_distance(position, target)
+            distance = self.get_distance(cell, target)
             if distance < nearest_distance:
                 nearest_target = target
                 nearest_distance = distance
@@ -161,24 +223,17 @@ class GameState:
         return nearest_target
 
     def get_heuristic(self):
-        heuristic_value = 0
-        for box in self.boxes:
-            distances = [
-                # Get all distances from this box to all targets without a box on top
-                self.get_distance(box, target)
-                for target in self.targets_without_box
-            ]
-            if distances:
-                # Add the minimum distance to the heuristic value
-                heuristic_value += min(distances)
-
-        return heuristic_value
-
-    def get_total_cost(self):
+        """Get the heuristic for the game state
+        Note: the minimum total push distance of matching every box to a different target (see modules/heuristic.py)
+        """
+        return self.board.heuristic.get_heuristic(self.boxes)
+
+    def get_total_cost(self, weight=1):
         """Get the cost for the game state
-        Note: the cost is the number of moves from the initial state to the current state + the heuristic
+        Note: the cost is the number of moves from the initial state to the current state + the heuristic,
+        multiplied by the weight for the weighted searches (wastar, arastar)
         """
-        return self.current_cost + self.get_heuristic()
+        return self.current_cost + weight * self.get_heuristic()
 
     def get_current_cost(self):
         """Get the current cost for the game state
@@ -190,70 +245,45 @@ class GameState:
     # The following methods are used to generate the next game state and check if the game is solved
     # ------------------------------------------------------------------------------------------------------------------
 
-    def new_position(self, position, direction):
-        """Get the new position after moving to the given direction"""
-        # Check if out of bound
-        if (
-            position[0] < 0
-            or position[0] >= self.height
-            or position[1] < 0
-            or position[1] >= self.width
-        ):
-            return position
-        if direction == "U":
-            return (position[0] - 1, position[1])
-        elif direction == "D":
-            return (position[0] + 1, position[1])
-        elif direction == "L":
-            return (position[0], position[1] - 1)
-        elif direction == "R":
-            return (position[0], position[1] + 1)
-        elif direction == "N":
-            return position
-        else:
+    def new_position(self, cell, direction):
+        """Get the new cell after moving to the given direction"""
+        if direction not in self.board.offsets:
             raise Exception("Invalid direction")
+        return cell + self.board.offsets[direction]
 
     def is_stuck(self, box):
-        """Check if a given box cannot be moved
-        by checking whether it is adjacent to 2 diagonally opposite walls
+        """Check if a given box cannot be moved to any target
+        by looking it up in the dead squares of the board (see Board.find_dead_squares)
         """
-        # Make sure the box is not on target
-        if self.map[box[0]][box[1]] == "$":
-            # Get adjacent horizontal and vertical cells coordinates
-            adjacent_cells = [
-                (box[0] - 1, box[1]),  # Left
-                (box[0] + 1, box[1]),  # Right
-                (box[0], box[1] - 1),  # Up
-                (box[0], box[1] + 1),  # Down
-            ]
-            # Check if the box is adjacent to 2 diagonally opposite walls
-            # Iterate through all horizontal and vertical adjacent cells
-            for i in range(len(adjacent_cells)):
-                # For each adjacent cell, check if there is another adjacent cell that is diagonally opposite
-                for j in range(i + 1, len(adjacent_cells)):
-                    # The cell is diagonally opposite if the row and column differences are both 2
-                    if (
-                        self.is_wall(adjacent_cells[i])
-                        and self.is_wall(adjacent_cells[j])
-                        and (
-                            (i == 0 and j == 2)  # Left and Up
-                            or (i == 0 and j == 3)  # Left and Down
-                            or (i == 1 and j == 2)  # Right and Down
-                            or (i == 1 and j == 3)  # Right and Up
-                        )
-                    ):
-                        return True
-        return False
+        return self.board.dead_squares[box] == 1
 
     def has_stuck_box(self):
         """Check if the game state has a deadlock box
         (a box that cannot be pushed to a target because it is in a deadlock position)
         """
+        dead_squares = self.board.dead_squares
         for box in self.boxes:
-            if self.is_stuck(box):
+            if dead_squares[box]:
                 return True
         return False
 
+    def copy(self):
+        """Get a new game state sharing the same board
+        Note: the player and the boxes are immutable, so nothing else has to be copied
+        """
+        state = GameState.__new__(GameState)
+        state.board = self.board
+        state.player = self.player
+        state.boxes = self.boxes
+        state.key = self.key
+        state.current_cost = self.current_cost
+        state.compare_value = self.compare_value
+        state.last_move = self.last_move
+        state.last_push = self.last_push
+        state.pushed_box = self.pushed_box
+        state.macro = self.macro
+        return state
+
     def move(self, direction):
         """Generate the next game state by moving the player to the given direction.
         The rules are as follows:
@@ -266,129 +296,362 @@ class GameState:
         - The player cannot push two boxes at the same time
         """
         self.last_move = direction
-        new_pos = self.new_position(self.player, direction)
-
-        if self.is_empty(new_pos):
-            # Check if player is on target
-            if self.map[self.player[0]][self.player[1]] == "+":
-                self.map[self.player[0]][self.player[1]] = "."
-            else:
-                self.map[self.player[0]][self.player[1]] = " "
-            self.map[new_pos[0]][new_pos[1]] = "@"
-            self.player = new_pos
-
-            self.current_cost += 1
+        self.pushed_box = None  # Cell the box was pushed to, if the move pushes a box
+        self.macro = None  # Path entries of the macro move that led to the state, if any (see modules/macros.py)
+        offset = self.new_position(0, direction)
+        if offset == 0:
             return self
 
-        # Check if player is on target and not on box-on-target
-        if self.is_target(new_pos) and not self.is_box(new_pos):
-            if self.map[self.player[0]][self.player[1]] == "+":
-                self.map[self.player[0]][self.player[1]] = "."
-            else:
-                self.map[self.player[0]][self.player[1]] = " "
-            self.map[new_pos[0]][new_pos[1]] = "+"
-            self.player = new_pos
-
-            self.current_cost += 1
-            return self
+        new_pos = self.player + offset
+        walls = self.board.walls
 
-        if self.is_wall(new_pos):
+        # If the player walks into a wall
+        if walls[new_pos]:
             self.current_cost += 1
             return self
 
-        if self.is_box(new_pos):
-            new_box_pos = self.new_position(
-                new_pos, direction
-            )  # Position where the box is pushed to
-
-            # If the box is pushed to an empty space
-            if self.is_empty(new_box_pos):
-                # If box currently on target, set current position to target
-                if self.map[new_pos[0]][new_pos[1]] == "*":
-                    self.map[new_pos[0]][new_pos[1]] = "."
-                else:
-                    self.map[new_pos[0]][new_pos[1]] = " "
-                # Update the box position
-                self.map[new_box_pos[0]][new_box_pos[1]] = "$"
-                self.boxes.remove(new_pos)
-                self.boxes.append(new_box_pos)
-
-                # If player currently on target, set current position to target
-                if self.map[self.player[0]][self.player[1]] == "+":
-                    self.map[self.player[0]][self.player[1]] = "."
-                else:
-                    self.map[self.player[0]][self.player[1]] = " "
-                # Update the player position
-                # If position where box was pushed from is target, set player position to be on target
-                if self.map[new_pos[0]][new_pos[1]] == ".":
-                    self.map[new_pos[0]][new_pos[1]] = "+"
-                else:
-                    self.map[new_pos[0]][new_pos[1]] = "@"
-                self.player = new_pos
+        if new_pos in self.boxes:
+            new_box_pos = new_pos + offset  # Position where the box is pushed to
 
+            # If the box is pushed to a wall or to another box
+            if walls[new_box_pos] or new_box_pos in self.boxes:
                 self.current_cost += 1
                 return self
 
-            # If the box is pushed to a target
-            if self.is_target(new_box_pos) and not self.is_box(new_box_pos):
-                # Update the box position
-                if self.map[new_pos[0]][new_pos[1]] == "*":
-                    self.map[new_pos[0]][new_pos[1]] = "."
-                else:
-                    self.map[new_pos[0]][new_pos[1]] = " "
-                self.map[new_box_pos[0]][new_box_pos[1]] = "*"
-                self.boxes.remove(new_pos)
-                self.boxes.append(new_box_pos)
-
-                # Update the player position
-                if self.map[self.player[0]][self.player[1]] == "+":
-                    self.map[self.player[0]][self.player[1]] = "."
-                else:
-                    self.map[self.player[0]][self.player[1]] = " "
-                if self.map[new_pos[0]][new_pos[1]] == ".":
-                    self.map[new_pos[0]][new_pos[1]] = "+"
-                else:
-                    self.map[new_pos[0]][new_pos[1]] = "@"
-                self.player = new_pos
+            # Update the box position, keeping the boxes sorted
+            self.boxes = tuple(
+                sorted(new_box_pos if box == new_pos else box for box in self.boxes)
+            )
+            self.key ^= self.board.box_keys[new_pos] ^ self.board.box_keys[new_box_pos]
+            self.pushed_box = new_box_pos
 
-                self.current_cost += 1
-                return self
+        # Update the player position
+        self.key ^= (
+            self.board.player_keys[self.player] ^ self.board.player_keys[new_pos]
+        )
+        self.player = new_pos
+        self.current_cost += 1
+        return self
 
-            # If the box is pushed to a wall
-            if self.is_wall(new_box_pos):
-                self.current_cost += 1
-                return self
+    def push(self, box, direction):
+        """Move the player behind the given box and push it to the given direction
+        Note: the player is assumed to be able to walk behind the box, so the walk is not counted in the cost
+        """
+        behind = box - self.board.offsets[direction]
+        self.key ^= self.board.player_keys[self.player] ^ self.board.player_keys[behind]
+        self.player = behind
+        self.move(direction)
+        self.last_push = box
+        return self
 
-            # If the box is pushed to another box
-            if self.is_box(new_box_pos):
-                self.current_cost += 1
-                return self
+    def pull(self, box, direction):
+        """Move the player next to the given box and pull it to the given direction
+        The player stands on the cell the box is pulled to and steps back one more cell in the same direction.
+        Note: used by the backward search, the walk of the player is not counted in the cost
+        """
+        offset = self.board.offsets[direction]
+        new_box_pos = box + offset
+        new_player = new_box_pos + offset
+        self.boxes = tuple(
+            sorted(new_box_pos if other == box else other for other in self.boxes)
+        )
+        self.key ^= self.board.box_keys[box] ^ self.board.box_keys[new_box_pos]
+        self.key ^= (
+            self.board.player_keys[self.player] ^ self.board.player_keys[new_player]
+        )
+        self.player = new_player
+        self.current_cost += 1
+        self.last_move = direction
+        self.last_push = box
+        self.pushed_box = new_box_pos
+        self.macro = None
+        return self
 
+    def undo(self, direction, player, pushed_box):
+        """Undo a move or push to the given direction in place
+        The player is put back on the given cell (where it was before the move, or before the push and the
+        normalization), and the box pushed to pushed_box (the value left in pushed_box by the move, None if no box
+        was pushed) is moved back. The boxes, the current cost and the hash key are restored incrementally.
+        Note: the information about the last move (last_move, last_push, pushed_box, macro) is cleared
+        """
+        board = self.board
+        if pushed_box is not None:
+            box = pushed_box - board.offsets[direction]
+            self.boxes = tuple(
+                sorted(box if other == pushed_box else other for other in self.boxes)
+            )
+            self.key ^= board.box_keys[pushed_box] ^ board.box_keys[box]
+        self.key ^= board.player_keys[self.player] ^ board.player_keys[player]
+        self.player = player
+        self.current_cost -= 1
+        self.last_move = "N"
+        self.last_push = None
+        self.pushed_box = None
+        self.macro = None
         return self
 
+    # ------------------------------------------------------------------------------------------------------------------
+    # The following methods are used by the push-level search, where only box pushes are search edges and the player
+    # can be anywhere in the region it can walk to
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def get_reachable(self):
+        """Get the cells the player can walk to without pushing a box
+        Note: returns a flat array marking the reachable cells and the smallest reachable cell
+        """
+        blocked = bytearray(self.board.walls)
+        for box in self.boxes:
+            blocked[box] = 1
+        reachable = bytearray(self.board.size)
+        reachable[self.player] = 1
+        normalized = self.player
+        stack = [self.player]
+        moves = self.board.moves
+        while stack:
+            cell = stack.pop()
+            for _, offset in moves:
+                next_cell = cell + offset
+                if not reachable[next_cell] and not blocked[next_cell]:
+                    reachable[next_cell] = 1
+                    stack.append(next_cell)
+                    if next_cell < normalized:
+                        normalized = next_cell
+        return reachable, normalized
+
+    def normalize(self):
+        """Move the player to the canonical cell of the region it can walk to
+        Two states with the same boxes and the same player region then have the same key
+        """
+        _, normalized = self.get_reachable()
+        self.key ^= (
+            self.board.player_keys[self.player] ^ self.board.player_keys[normalized]
+        )
+        self.player = normalized
+        return self
+
+    def get_path(self, cell):
+        """Get the moves for the player to walk to the given cell without pushing a box
+        Note: returns None if the cell cannot be reached
+        """
+        walls = self.board.walls
+        parents = {self.player: None}
+        queue = [self.player]
+        for current in queue:  # The queue grows while it is iterated (breadth-first)
+            if current == cell:
+                path = []
+                while parents[current] is not None:
+                    current, direction = parents[current]
+                    path.append(direction)
+                path.reverse()
+                return path
+            for direction, offset in self.board.moves:
+                next_cell = current + offset
+                if (
+                    next_cell not in parents
+                    and not walls[next_cell]
+                    and next_cell not in self.boxes
+                ):
+                    parents[next_cell] = (current, direction)
+                    queue.append(next_cell)
+        return None
+
+    def expand_pushes(self, pushes):
+        """Expand a sequence of pushes into the full list of moves
+        Each push is a tuple (box, direction) with the cell of the box before the push
+        """
+        state = self.copy()
+        moves = []
+        for box, direction in pushes:
+            path = state.get_path(box - self.board.offsets[direction])
+            if path is None:
+                raise Exception("Invalid push sequence")
+            for step in path + [direction]:
+                state.move(step)
+            moves.extend(path)
+            moves.append(direction)
+        return moves
+
     def generate_neighbors(self):
         """Generate the neighbors of the game state by moving the player in all directions"""
         neighbors = []
-        for direction in ["U", "D", "L", "R"]:
-            neighbor = deepcopy(self)
+        walls = self.board.walls
+        for direction in DIRECTIONS:
+            # Walking into a wall never changes the state, so skip it before copying
+            if walls[self.player + self.board.offsets[direction]]:
+                continue
+            neighbor = self.copy()
             neighbor.move(direction)
             # neighbor.print_state()
 
-            # If generated neighbor does not have a deadlock box and is not have the same map as the current state
-            if not neighbor.has_stuck_box() and str(neighbor.map) != str(self.map):
+            # If generated neighbor does not have a deadlock box and is not the same state as the current state
+            if not neighbor.has_stuck_box() and neighbor.key != self.key:
                 if neighbor.check_solved():
                     return [neighbor]
                 else:
                     neighbors.append(neighbor)
         return neighbors
 
+    def generate_push_neighbors(self):
+        """Generate the neighbors of the game state by pushing every box the player can reach in all directions
+        The player of every neighbor is normalized, and the pushed box is kept in last_push for expand_pushes()
+        """
+        neighbors = []
+        reachable, _ = self.get_reachable()
+        walls = self.board.walls
+        for box in self.boxes:
+            for direction, offset in self.board.moves:
+                new_box_pos = box + offset
+                # The player must be able to walk behind the box, and the box must be pushed to a free cell
+                if (
+                    not reachable[box - offset]
+                    or walls[new_box_pos]
+                    or new_box_pos in self.boxes
+                ):
+                    continue
+                neighbor = self.copy().push(box, direction)
+                if not neighbor.has_stuck_box():
+                    if neighbor.check_solved():
+                        return [neighbor]
+                    neighbors.append(neighbor.normalize())
+        return neighbors
+
+    def generate_pull_neighbors(self):
+        """Generate the predecessors of the game state by pulling every box the player can reach in all directions
+        The player of every neighbor is normalized, and the pulled box is kept in last_push
+        """
+        neighbors = []
+        reachable, _ = self.get_reachable()
+        walls = self.board.walls
+        for box in self.boxes:
+            for direction, offset in self.board.moves:
+                # The player must be able to walk next to the box and step back from it
+                new_player = box + 2 * offset
+                if (
+                    not reachable[box + offset]
+                    or walls[new_player]
+                    or new_player in self.boxes
+                ):
+                    continue
+                neighbors.append(self.copy().pull(box, direction).normalize())
+        return neighbors
+
+    def get_legal_moves(self):
+        """Get the directions the player can move to without pushing a box into a wall, a box or a dead square
+        Same moves as generate_neighbors(), without creating the neighbors: a move that solves the game is returned
+        alone
+        """
+        moves = []
+        walls = self.board.walls
+        dead_squares = self.board.dead_squares
+        for direction, offset in self.board.moves:
+            new_pos = self.player + offset
+            if walls[new_pos]:
+                continue
+            if new_pos in self.boxes:
+                new_box_pos = new_pos + offset
+                if (
+                    walls[new_box_pos]
+                    or new_box_pos in self.boxes
+                    or dead_squares[new_box_pos]
+                ):
+                    continue
+                if self.board.target_cells[new_box_pos]:
+                    # Only a push onto a target can solve the game
+                    player = self.player
+                    solved = self.move(direction).check_solved()
+                    self.undo(direction, player, new_box_pos)
+                    if solved:
+                        return [direction]
+            moves.append(direction)
+        return moves
+
+    def get_legal_pushes(self):
+        """Get the (box, direction) pushes the player can make without pushing a box into a dead square
+        Same pushes as generate_push_neighbors(), without creating the neighbors: a push that solves the game is
+        returned alone
+        """
+        pushes = []
+        reachable, _ = self.get_reachable()
+        walls = self.board.walls
+        dead_squares = self.board.dead_squares
+        for box in self.boxes:
+            for direction, offset in self.board.moves:
+                new_box_pos = box + offset
+                if (
+                    not reachable[box - offset]
+                    or walls[new_box_pos]
+                    or new_box_pos in self.boxes
+                    or dead_squares[new_box_pos]
+                ):
+                    continue
+                if self.board.target_cells[new_box_pos]:
+                    player = self.player
+                    solved = self.push(box, direction).check_solved()
+                    self.undo(direction, player, new_box_pos)
+                    if solved:
+                        return [(box, direction)]
+                pushes.append((box, direction))
+        return pushes
+
+    def get_goal_states(self):
+        """Get the solved game states, one per region the player can be in once all the boxes are on targets
+        The player stands next to the box it pushed last, so only the regions touching a box are kept (not the
+        regions the last push cannot end in, nor the floor outside of the level).
+        """
+        if len(self.boxes) != len(self.board.targets):
+            raise Exception("The number of boxes and targets must be equal")
+        goal = self.copy()
+        goal.boxes = self.board.targets
+        goal.current_cost = 0
+        goal.last_move = "N"
+        goal.last_push = None
+        goal.pushed_box = None
+        goal.macro = None
+
+        goal_states = []
+        covered = bytearray(self.board.walls)
+        for box in goal.boxes:
+            covered[box] = 1
+        seeds = sorted(
+            {box - offset for box in goal.boxes for _, offset in self.board.moves}
+        )
+        for cell in seeds:
+            if covered[cell]:
+                continue
+            state = goal.copy()
+            state.player = cell
+            reachable, normalized = state.get_reachable()
+            for reachable_cell, is_reachable in enumerate(reachable):
+                if is_reachable:
+                    covered[reachable_cell] = 1
+            # The player is put on the smallest cell of its region, like a normalized state
+            state.player = normalized
+            state.key = self.board.get_key(normalized, state.boxes)
+            goal_states.append(state)
+        return goal_states
+
     def check_solved(self):
         """Check if the game is solved"""
-        for target in self.targets:
-            if self.map[target[0]][target[1]] != "*":
+        if len(self.boxes) == len(self.board.targets):
+            # The boxes and the targets are both sorted, so a single comparison is enough
+            return self.boxes == self.board.targets
+        for target in self.board.targets:
+            if target not in self.boxes:
                 return False
         return True
 
+    def check_solution(self, moves):
+        """Check if the given moves solve the game, every move changing the position of the player
+        Note: the moves are replayed on a copy, the game state itself does not change
+        """
+        state = self.copy()
+        for direction in moves:
+            player = state.player
+            state.move(direction)
+            if state.player == player:
+                return False
+        return state.check_solved()
+
     def print_state(self):
         """Print the game state"""
         print(
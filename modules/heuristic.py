@@ -0,0 +1,138 @@
+"""
+Sokuban heuristic engine
+The heuristic of a game state is a lower bound on the number of pushes needed to solve it:
+- The push distance from every cell to every target is precomputed once per puzzle, by pulling a box backwards
+  from the target over the static board (walls only). Unlike the Manhattan distance, it goes around walls.
+- Every box is matched to a different target with a minimum-cost bipartite matching (Hungarian algorithm), so two
+  boxes can never count the same target and boxes already on targets cost nothing.
+Every push moves one box by one cell, so the value changes by at most 1 per move: the heuristic is admissible and
+consistent both for the move-level and the push-level search.
+The results are memoized in a bounded LRU cache keyed by the box configuration (the player does not matter).
+The engine can also be built in reverse for the backward search of the bidirectional strategy, where the boxes are
+pulled back to other "targets" (the initial box cells): the distances are then pull distances, computed by pushing
+a box away from every target.
+The heuristic engine class has the following methods:
+- find_distances(target): get the push distance from every cell to the given target
+- get_heuristic(boxes): get the heuristic for the given box cells
+- get_matching_cost(costs): get the minimum cost of matching every row to a different column
+"""
+
+from collections import OrderedDict
+
+# Distance used for cells from which a box can never reach a target
+INFINITY = 10**9
+
+
+class HeuristicEngine(object):
+    def __init__(self, board, targets=None, reverse=False, cache_size=100000):
+        self.board = board
+        self.targets = board.targets if targets is None else targets
+        self.reverse = reverse
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.num_of_hits = 0
+        self.num_of_misses = 0
+        # distances[i][cell] is the push (or pull if reverse) distance from the cell to the i-th target
+        self.distances = [self.find_distances(target) for target in self.targets]
+
+    def find_distances(self, target):
+        """Get the push distance from every cell to the given target
+        by pulling a box from the target with a breadth-first search
+        Note: if reverse, get the pull distance by pushing a box from the target instead
+        """
+        walls = self.board.walls
+        distances = [INFINITY] * self.board.size
+        distances[target] = 0
+        queue = [target]
+        for cell in queue:  # The queue grows while it is iterated (breadth-first)
+            for _, offset in self.board.moves:
+                moved = cell + offset  # Cell the box is pulled (or pushed) to
+                # Cell the player pulls from, or pushes from if reverse
+                player = cell - offset if self.reverse else moved + offset
+                if (
+                    distances[moved] == INFINITY
+                    and not walls[moved]
+                    and not walls[player]
+                ):
+                    distances[moved] = distances[cell] + 1
+                    queue.append(moved)
+        return distances
+
+    def get_heuristic(self, boxes):
+        """Get the heuristic for the given box cells
+        Note: returns infinity if the boxes cannot all be matched to a target (the state is a deadlock)
+        """
+        value = self.cache.get(boxes)
+        if value is not None:
+            self.num_of_hits += 1
+            self.cache.move_to_end(boxes)
+            return value
+
+        self.num_of_misses += 1
+        costs = [[distances[box] for distances in self.distances] for box in boxes]
+        value = self.get_matching_cost(costs)
+        if value >= INFINITY:
+            value = float("inf")
+
+        self.cache[boxes] = value
+        if len(self.cache) > self.cache_size:
+            # Evict the least recently used configuration
+            self.cache.popitem(last=False)
+        return value
+
+    def get_matching_cost(self, costs):
+        """Get the minimum cost of matching every row to a different column (Hungarian algorithm)
+        Note: the number of rows (boxes) must not be greater than the number of columns (targets)
+        """
+        num_of_rows = len(costs)
+        if num_of_rows == 0:
+            return 0
+        num_of_columns = len(costs[0])
+        if num_of_rows > num_of_columns:
+            return INFINITY
+
+        # Potentials of the rows (u) and columns (v), and the row matched to every column (1-indexed, 0 is free)
+        u = [0] * (num_of_rows + 1)
+        v = [0] * (num_of_columns + 1)
+        matched_row = [0] * (num_of_columns + 1)
+        previous_column = [0] * (num_of_columns + 1)
+        for row in range(1, num_of_rows + 1):
+            # Find an augmenting path for the new row with a Dijkstra-like search over the columns
+            matched_row[0] = row
+            column = 0
+            min_slack = [float("inf")] * (num_of_columns + 1)
+            used = [False] * (num_of_columns + 1)
+            while True:
+                used[column] = True
+                current_row = matched_row[column]
+                delta = float("inf")
+                next_column = 0
+                for j in range(1, num_of_columns + 1):
+                    if not used[j]:
+                        slack = costs[current_row - 1][j - 1] - u[current_row] - v[j]
+                        if slack < min_slack[j]:
+                            min_slack[j] = slack
+                            previous_column[j] = column
+                        if min_slack[j] < delta:
+                            delta = min_slack[j]
+                            next_column = j
+                for j in range(num_of_columns + 1):
+                    if used[j]:
+                        u[matched_row[j]] += delta
+                        v[j] -= delta
+                    else:
+                        min_slack[j] -= delta
+                column = next_column
+                if matched_row[column] == 0:
+                    break
+            # Flip the augmenting path
+            while column:
+                previous = previous_column[column]
+                matched_row[column] = matched_row[previous]
+                column = previous
+
+        return sum(
+            costs[matched_row[j] - 1][j - 1]
+            for j in range(1, num_of_columns + 1)
+            if matched_row[j]
+        )
@@ -0,0 +1,60 @@
+"""
+Sokuban search limits
+The solver can be given budgets so that a solve always ends:
+- time_limit: wall-clock seconds since the start of the solve, reported with the "timeout" status
+- node_limit: number of expanded states, reported with the "out_of_budget" status
+- memory_limit: peak resident size of the process in bytes (approximate: it includes the memory used before the
+  solve and is only checked every MEMORY_CHECK_INTERVAL expansions), reported with the "out_of_budget" status
+The limits are checked every time a state is expanded; the search stops by raising SearchLimitReached, which the
+solver turns into its status. The solve service (see modules/service.py) raises it from the progress callback with
+the "cancelled" status when a client cancels a running job.
+The module has the following functions:
+- get_peak_memory(): get the peak resident size of the current process
+- reset_peak_memory(): reset the peak resident size of the current process to its current size (Linux only)
+"""
+
+import sys
+
+try:
+    import resource
+except ImportError:  # Not available on Windows: the memory is unknown
+    resource = None
+
+# Statuses of a solve
+SOLVED = "solved"
+NO_SOLUTION = "no_solution"
+TIMEOUT = "timeout"
+OUT_OF_BUDGET = "out_of_budget"
+CANCELLED = "cancelled"
+
+# Number of expansions between two checks of the memory limit (reading the memory is a system call)
+MEMORY_CHECK_INTERVAL = 1000
+
+
+class SearchLimitReached(Exception):
+    """Raised by the solver when a limit is reached, with the status to report"""
+
+    def __init__(self, status):
+        super().__init__("Search limit reached: " + status)
+        self.status = status
+
+
+def get_peak_memory():
+    """Get the peak resident size of the current process in bytes, None if unknown"""
+    if resource is None:
+        return None
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak_memory if sys.platform == "darwin" else peak_memory * 1024
+
+
+def reset_peak_memory():
+    """Reset the peak resident size of the current process to its current size, so that a process solving many
+    puzzles measures every solve on its own
+    Note: only possible on Linux, elsewhere the peak is kept until the process ends
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
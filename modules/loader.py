@@ -0,0 +1,272 @@
+"""
+Sokuban map loader
+The maps are loaded with plain functions so that they can be used from the command line, the batch mode
+and worker processes alike (main.py imports pygame, so it cannot be imported from a headless process).
+A map is a list of rows, every row a list of cells: "#" wall, " " floor, "." target, "$" box, "*" box on target,
+"@" player, "+" player on target. The rows are padded with floor to the width of the longest row, and the leading
+spaces of a row are kept (they are part of the level).
+Text files can hold a single level (the .txt maps of the project) or a collection of levels (.sok/.xsb files):
+- board lines only have cell characters, with "-" and "_" also used for floor and "p", "P", "b", "B" for the player
+  and the boxes; every other line (titles, comments, metadata) separates the levels
+- a board line can be run-length encoded: a count before a character repeats it, and "|" separates rows
+- the title of a level is the last text line before its board (or a "Title:" line after it)
+Parsed levels can be saved to a binary library, which is memory-mapped and only decodes the levels that are read:
+- header: magic b"SOKB", version (uint16), number of levels (uint32)
+- offsets: number of levels + 1 uint32, the position of every level record (the last one is the end of the file)
+- level record: height, width, title length (uint16 each), the UTF-8 title, then the cells packed two per byte
+  (4-bit codes, see CELLS)
+The module has the following functions:
+- load_map(map_path, level, offset): load the map of the given level from the given path (text or binary)
+- load_levels(path): load all the (title, map) levels of the given path (text or binary)
+- get_level_offsets(path): get the byte offset of the board of every level of a text file, in one pass
+- read_level(path, offset): read the map of the level whose board starts at the given offset of a text file
+- is_board_line(line): check if the given line is a board line
+- parse_levels(lines): parse the (title, map) levels of the given text lines
+- decode_row(line): decode a board line into rows of the standard cell characters
+- pad_map(rows): get the map of the given rows, padded to the width of the longest row
+- save_levels(path, levels): save the (title, map) levels to a binary library
+The puzzle library class (a binary library opened with memory mapping) has the following methods:
+- get_map(index): decode the map of the given level
+- get_title(index): get the title of the given level
+- close(): close the library
+"""
+
+import mmap
+import re
+import struct
+import sys
+from array import array
+
+# Cells of the standard format, in the order of their 4-bit codes in the binary library
+CELLS = " #.$*@+"
+# Characters of a board line: the cells, their alternative characters and the run-length encoding
+BOARD_CHARACTERS = CELLS + "-_pPbB0123456789|"
+# Alternative characters of the cells in collections
+ALTERNATIVE_CELLS = str.maketrans("-_pPbB", "  @+$*")
+# Characters only found in run-length encoded lines
+RUN_LENGTH_CHARACTERS = re.compile("[0-9|]")
+
+LIBRARY_MAGIC = b"SOKB"
+LIBRARY_VERSION = 1
+LIBRARY_HEADER = struct.Struct("<4sHI")
+LEVEL_HEADER = struct.Struct("<HHH")
+
+# Cell code of every character, and the two characters of every packed byte
+CELL_CODES = {cell: code for code, cell in enumerate(CELLS)}
+UNPACKED_BYTES = [
+    (CELLS[byte >> 4] if byte >> 4 < len(CELLS) else " ")
+    + (CELLS[byte & 15] if byte & 15 < len(CELLS) else " ")
+    for byte in range(256)
+]
+
+
+def load_map(map_path, level=0, offset=None):
+    """Load the map of the given level (0 for the first one) from the given path
+    If the offset of the level in a text file is given (see get_level_offsets), only that level is read, instead of
+    parsing the whole collection.
+    Note: the path can be a single map, a collection of levels or a binary library
+    """
+    if offset is not None:
+        return read_level(map_path, offset)
+    if is_library(map_path):
+        library = PuzzleLibrary(map_path)
+        try:
+            return library.get_map(level)
+        finally:
+            library.close()
+    levels = load_levels(map_path)
+    if not levels:
+        raise Exception("No level found in " + map_path)
+    return levels[level][1]
+
+
+def load_levels(path):
+    """Load all the (title, map) levels of the given path (text collection or binary library)"""
+    if is_library(path):
+        library = PuzzleLibrary(path)
+        try:
+            return [
+                (library.get_title(index), library.get_map(index))
+                for index in range(len(library))
+            ]
+        finally:
+            library.close()
+    with open(path, "r") as f:
+        return parse_levels(f.read().splitlines())
+
+
+def get_level_offsets(path):
+    """Get the byte offset of the first board line of every level of a text file (single map or collection)
+    The file is read once without decoding the boards, so that the levels of a large collection can be indexed
+    before reading them one at a time (see read_level).
+    """
+    offsets = []
+    position = 0
+    in_board = False
+    with open(path, "rb") as f:
+        for line in f:
+            board = is_board_line(line.decode("utf-8", "replace").rstrip())
+            if board and not in_board:
+                offsets.append(position)
+            in_board = board
+            position += len(line)
+    return offsets
+
+
+def read_level(path, offset):
+    """Read the map of the level whose board starts at the given byte offset of a text file"""
+    rows = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            line = line.decode("utf-8", "replace").rstrip()
+            if not is_board_line(line):
+                break
+            rows.extend(decode_row(line))
+    if not rows:
+        raise Exception("No level found at offset {} of {}".format(offset, path))
+    return pad_map(rows)
+
+
+def is_board_line(line):
+    """Check if the given line (without its line break) is a board line"""
+    # A board line only has board characters (strip removes them all) and at least one wall
+    return bool(line) and not line.strip(BOARD_CHARACTERS) and "#" in line
+
+
+def is_library(path):
+    """Check if the given file is a binary library"""
+    with open(path, "rb") as f:
+        return f.read(len(LIBRARY_MAGIC)) == LIBRARY_MAGIC
+
+
+def parse_levels(lines):
+    """Parse the (title, map) levels of the given text lines"""
+    levels = []
+    rows = []
+    title = None  # Last text line seen before the current board
+    for line in lines:
+        line = line.rstrip()
+        if is_board_line(line):
+            rows.extend(decode_row(line))
+            continue
+        if rows:
+            levels.append([title, pad_map(rows)])
+            rows = []
+            title = None
+        text = line.strip().lstrip(";").strip()
+        if text.lower().startswith("title:"):
+            text = text[len("title:") :].strip()
+            # A title after a board names that board, unless it already has one
+            if title is None and levels and levels[-1][0] is None:
+                levels[-1][0] = text
+                continue
+        if text:
+            title = text
+    if rows:
+        levels.append([title, pad_map(rows)])
+    return [
+        (title if title is not None else str(index + 1), map)
+        for index, (title, map) in enumerate(levels)
+    ]
+
+
+def decode_row(line):
+    """Decode a board line into rows of the standard cell characters
+    Note: a run-length encoded line can hold several rows separated by "|"
+    """
+    line = line.translate(ALTERNATIVE_CELLS)
+    if RUN_LENGTH_CHARACTERS.search(line) is None:
+        return [line]
+    rows = []
+    row = []
+    count = ""
+    for c in line:
+        if c.isdigit():
+            count += c
+        elif c == "|":
+            rows.append("".join(row))
+            row = []
+            count = ""
+        else:
+            row.append(c * int(count) if count else c)
+            count = ""
+    rows.append("".join(row))
+    return rows
+
+
+def pad_map(rows):
+    """Get the map of the given rows, padded with floor to the width of the longest row"""
+    width = max(len(row) for row in rows) if rows else 0
+    return [list(row.ljust(width)) for row in rows]
+
+
+def save_levels(path, levels):
+    """Save the (title, map) levels to a binary library"""
+    records = []
+    for title, map in levels:
+        title = title.encode("utf-8")
+        height = len(map)
+        width = max(len(row) for row in map) if map else 0
+        codes = bytearray()
+        for row in map:
+            codes.extend(CELL_CODES[cell] for cell in row)
+            codes.extend(bytes(width - len(row)))  # Floor padding
+        if len(codes) % 2:
+            codes.append(0)
+        packed = bytes((codes[i] << 4) | codes[i + 1] for i in range(0, len(codes), 2))
+        records.append(LEVEL_HEADER.pack(height, width, len(title)) + title + packed)
+
+    offsets = array("I")
+    position = LIBRARY_HEADER.size + 4 * (len(records) + 1)
+    for record in records:
+        offsets.append(position)
+        position += len(record)
+    offsets.append(position)
+    if sys.byteorder == "big":
+        offsets.byteswap()
+
+    with open(path, "wb") as f:
+        f.write(LIBRARY_HEADER.pack(LIBRARY_MAGIC, LIBRARY_VERSION, len(records)))
+        f.write(offsets.tobytes())
+        for record in records:
+            f.write(record)
+
+
+class PuzzleLibrary(object):
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = LIBRARY_HEADER.unpack_from(self.data, 0)
+        if magic != LIBRARY_MAGIC or version != LIBRARY_VERSION:
+            raise Exception("Invalid puzzle library")
+        self.offsets = array("I")
+        start = LIBRARY_HEADER.size
+        self.offsets.frombytes(self.data[start : start + 4 * (count + 1)])
+        if sys.byteorder == "big":
+            self.offsets.byteswap()
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def get_title(self, index):
+        """Get the title of the given level"""
+        offset = self.offsets[index]
+        _, _, title_length = LEVEL_HEADER.unpack_from(self.data, offset)
+        start = offset + LEVEL_HEADER.size
+        return self.data[start : start + title_length].decode("utf-8")
+
+    def get_map(self, index):
+        """Decode the map of the given level"""
+        offset = self.offsets[index]
+        height, width, title_length = LEVEL_HEADER.unpack_from(self.data, offset)
+        start = offset + LEVEL_HEADER.size + title_length
+        cells = "".join(
+            map(UNPACKED_BYTES.__getitem__, self.data[start : self.offsets[index + 1]])
+        )
+        return [list(cells[y * width : (y + 1) * width]) for y in range(height)]
+
+    def close(self):
+        """Close the library"""
+        self.data.close()
+        self.file.close()
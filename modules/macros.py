@@ -0,0 +1,273 @@
+"""
+Sokuban macro moves
+A push moves a box by one cell, so a box pushed down a corridor costs one search node per cell. Macro moves
+replace such sequences by a single search edge, on top of the neighbors of GameState:
+- tunnel macros: after a push that leaves the box and the player in a one-wide corridor along the push (walls on
+  both sides of both cells), the only useful continuation is to keep pushing, so the box is pushed on until it
+  leaves the tunnel, reaches a target or a room entrance, or is blocked
+- goal-room macros: a goal room is an area with targets that the rest of the level can only reach through a
+  single entrance cell. Its packing order is the order its targets must be filled in so that no box blocks the
+  next one. A box pushed onto the entrance from outside is pushed straight to the next free target of the order
+The tunnels and the goal rooms (with their packing orders) are analyzed once per puzzle, from the initial state:
+- a cell is an entrance if removing it disconnects the floor; a goal room is one of the parts it leaves, with
+  targets but without the initial boxes nor the initial player. The largest disjoint rooms are kept
+- the packing order is found backwards: with all the targets of the room filled, the target whose box can be
+  pushed out of the room (checked as a push in from the entrance, with the other boxes in place) is filled last
+A macro is recorded in GameState.macro as the list of the path entries it replaces (moves, or (box, direction)
+pushes for the push-level search), so the node tables and the solvers expand it back into plain moves.
+Note: macros skip the states in between, so the solutions found are not guaranteed to be the shortest ones.
+The macro moves class has the following methods:
+- apply(state, push_level, records): replace the given neighbor by the macro move it starts, if any
+- find_tunnels(): find the cells where a box pushed along a direction is in a tunnel
+- find_goal_rooms(state): find the goal rooms of the given initial state with their entrances
+- find_packing_order(room, entrance): get the order the targets of the given room must be filled in
+- find_push_path(boxes, box, player, goal, allowed): get the moves pushing a box to the goal
+"""
+
+from modules.board import DIRECTIONS
+
+
+class MacroMoves(object):
+    def __init__(self, initial_state):
+        self.board = initial_state.board
+        # tunnels[direction][cell]: a box on the cell, pushed along the direction, is in a tunnel
+        self.tunnels = self.find_tunnels()
+        # Entrance cell -> (room cells, packing order) of every goal room
+        self.rooms = {}
+        for room, entrance in self.find_goal_rooms(initial_state):
+            order = self.find_packing_order(room, entrance)
+            if order is not None:
+                self.rooms[entrance] = (room, order)
+        self.num_of_tunnel_macros = 0
+        self.num_of_room_macros = 0
+
+    def apply(self, state, push_level, records=None):
+        """Replace the given neighbor by the macro move it starts, if any
+        The neighbor is changed in place; the pushes of the macro are not counted as expanded states.
+        If a list of records is given, the (direction, player, pushed box) of every move or push of the macro is
+        added to it, so that the macro can be undone (see GameState.undo).
+        """
+        box = state.pushed_box
+        if box is None:
+            return state
+        board = self.board
+        direction = state.last_move
+        offset = board.offsets[direction]
+        # The first entry is the push that generated the neighbor. The player of a push-level neighbor may already be
+        # normalized (see GameState.generate_push_neighbors), so the macro only relies on the box: the player pushing
+        # it stands on box - offset
+        entries = [(state.last_push, direction) if push_level else direction]
+
+        # Tunnel macro: keep pushing the box along the tunnel
+        tunnel = self.tunnels[direction]
+        while (
+            tunnel[box]
+            and box not in self.rooms
+            and not board.walls[box + offset]
+            and not board.dead_squares[box + offset]
+            and box + offset not in state.boxes
+        ):
+            player = state.player
+            if push_level:
+                state.push(box, direction)
+                entries.append((box, direction))
+            else:
+                state.move(direction)
+                entries.append(direction)
+            if records is not None:
+                records.append((direction, player, state.pushed_box))
+            box += offset
+        if len(entries) > 1:
+            self.num_of_tunnel_macros += 1
+
+        # Goal-room macro: push a box that enters a room straight to its next target
+        if box in self.rooms:
+            room, order = self.rooms[box]
+            player = box - offset
+            if player not in room:
+                filled = [other for other in state.boxes if other in room]
+                if len(filled) < len(order) and sorted(filled) == sorted(
+                    order[: len(filled)]
+                ):
+                    moves = self.find_push_path(
+                        state.boxes, box, player, order[len(filled)], room
+                    )
+                    if moves is not None:
+                        self.num_of_room_macros += 1
+                        for move in moves:
+                            pushed = player + board.offsets[move] == box
+                            player += board.offsets[move]
+                            previous_player = state.player
+                            if not push_level:
+                                state.move(move)
+                                entries.append(move)
+                            elif pushed:
+                                state.push(box, move)
+                                entries.append((box, move))
+                            if records is not None and (pushed or not push_level):
+                                records.append(
+                                    (move, previous_player, state.pushed_box)
+                                )
+                            if pushed:
+                                box += board.offsets[move]
+
+        if len(entries) > 1:
+            if push_level:
+                state.normalize()
+            state.macro = entries
+        return state
+
+    def find_tunnels(self):
+        """Find the cells where a box pushed along a direction is in a tunnel
+        The box cell and the cell of the player behind it must both have walls on the two sides across the push,
+        and the box cell must not be a target (a box in a tunnel may have to stay on its target).
+        Note: returns a flat array per direction
+        """
+        board = self.board
+        walls = board.walls
+        tunnels = {}
+        for direction, offset in board.moves:
+            side = board.offsets["L"] if direction in ("U", "D") else board.offsets["U"]
+            tunnel = bytearray(board.size)
+            for cell in range(board.size):
+                player = cell - offset
+                if (
+                    not walls[cell]
+                    and not walls[player]
+                    and not board.target_cells[cell]
+                    and walls[cell - side]
+                    and walls[cell + side]
+                    and walls[player - side]
+                    and walls[player + side]
+                ):
+                    tunnel[cell] = 1
+            tunnels[direction] = tunnel
+        return tunnels
+
+    def find_goal_rooms(self, state):
+        """Find the goal rooms of the given initial state
+        Note: returns a list of (room cells, entrance cell), the rooms being disjoint sets of cells
+        """
+        board = self.board
+        walls = board.walls
+        floor = [cell for cell in range(board.size) if not walls[cell]]
+        boxes = set(state.boxes)
+        candidates = []
+        for entrance in floor:
+            if board.target_cells[entrance] or entrance in boxes:
+                continue
+            neighbors = [
+                entrance + offset
+                for _, offset in board.moves
+                if not walls[entrance + offset]
+            ]
+            if len(neighbors) < 2:
+                continue
+            # Split the floor around the entrance into the parts it connects
+            seen = {entrance}
+            parts = []
+            for start in neighbors:
+                if start in seen:
+                    continue
+                part = [start]
+                seen.add(start)
+                for cell in part:  # The list grows while it is iterated (breadth-first)
+                    for _, offset in board.moves:
+                        next_cell = cell + offset
+                        if next_cell not in seen and not walls[next_cell]:
+                            seen.add(next_cell)
+                            part.append(next_cell)
+                parts.append(part)
+            if len(parts) < 2:
+                continue  # Not an entrance: the floor stays connected
+            for part in parts:
+                room = set(part)
+                if (
+                    any(board.target_cells[cell] for cell in part)
+                    and not room & boxes
+                    and state.player not in room
+                ):
+                    candidates.append((room, entrance))
+
+        # Keep the largest rooms that do not overlap
+        rooms = []
+        used = set()
+        for room, entrance in sorted(candidates, key=lambda item: -len(item[0])):
+            if not room & used and entrance not in used:
+                rooms.append((room, entrance))
+                used |= room
+                used.add(entrance)
+        return rooms
+
+    def find_packing_order(self, room, entrance):
+        """Get the order the targets of the given room must be filled in, None if there is none
+        The order is built backwards: among the targets still filled, the one whose box can be pushed in from the
+        entrance while the other targets are filled is the last one to fill. Removing boxes never blocks a push,
+        so the first target found is always a safe choice.
+        """
+        board = self.board
+        targets = [cell for cell in sorted(room) if board.target_cells[cell]]
+        # The player pushes the box onto the entrance from any floor cell outside the room
+        players = [
+            entrance - offset
+            for _, offset in board.moves
+            if not board.walls[entrance - offset] and entrance - offset not in room
+        ]
+        order = []
+        while targets:
+            for target in targets:
+                others = [other for other in targets if other != target]
+                if any(
+                    self.find_push_path(others, entrance, player, target, room)
+                    is not None
+                    for player in players
+                ):
+                    break
+            else:
+                return None
+            targets.remove(target)
+            order.append(target)
+        order.reverse()
+        return order
+
+    def find_push_path(self, boxes, box, player, goal, allowed):
+        """Get the moves pushing the box from its cell to the goal, with the player starting from the given cell
+        The other boxes do not move, and the box only moves through the allowed cells (and its starting cell).
+        Note: returns the shortest list of moves (walks and pushes), None if the goal cannot be reached
+        """
+        board = self.board
+        walls = board.walls
+        dead_squares = board.dead_squares
+        obstacles = set(boxes)
+        obstacles.discard(box)
+        parents = {(box, player): None}
+        queue = [(box, player)]
+        for current in queue:  # The queue grows while it is iterated (breadth-first)
+            current_box, current_player = current
+            if current_box == goal:
+                moves = []
+                while parents[current] is not None:
+                    current, direction = parents[current]
+                    moves.append(direction)
+                moves.reverse()
+                return moves
+            for direction in DIRECTIONS:
+                offset = board.offsets[direction]
+                next_player = current_player + offset
+                next_box = current_box
+                if walls[next_player] or next_player in obstacles:
+                    continue
+                if next_player == current_box:
+                    next_box = current_box + offset
+                    if (
+                        walls[next_box]
+                        or dead_squares[next_box]
+                        or next_box in obstacles
+                        or next_box not in allowed
+                    ):
+                        continue
+                item = (next_box, next_player)
+                if item not in parents:
+                    parents[item] = (current, direction)
+                    queue.append(item)
+        return None
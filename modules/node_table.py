@@ -0,0 +1,65 @@
+"""
+Sokuban search node table
+Instead of every search node keeping its own copy of the path from the initial state, the nodes are stored in a
+table of parent pointers: node i has a parent index and the move that led to it. The path is only rebuilt once,
+by walking the parent pointers back from the goal node.
+- parents: array of parent indices (-1 for the root)
+- moves: byte array of moves, as indices in DIRECTIONS (4 for the root)
+- cells: array of pushed box cells, only filled by the push-level search (the box each push started from)
+- macros: path entries of the nodes reached by a macro move (see modules/macros.py), which replace their move
+The node table class has the following methods:
+- add(parent, state): add a node for the given state, reached from the given parent node, and get its index
+- get_path(index): get the path from the root to the given node
+"""
+
+from array import array
+
+from modules.board import DIRECTIONS
+
+# Move code of the root node (no move led to it)
+ROOT_MOVE = len(DIRECTIONS)
+
+
+class NodeTable(object):
+    def __init__(self, push_level=False):
+        self.push_level = push_level
+        self.parents = array("l")
+        self.moves = bytearray()
+        self.cells = array("l")
+        self.macros = {}
+        self.move_codes = {direction: code for code, direction in enumerate(DIRECTIONS)}
+        self.move_codes["N"] = ROOT_MOVE
+
+    def __len__(self):
+        return len(self.parents)
+
+    def add(self, parent, state):
+        """Add a node for the given state, reached from the given parent node (-1 for the root), and get its index"""
+        self.parents.append(parent)
+        self.moves.append(
+            self.move_codes[state.last_move] if parent >= 0 else ROOT_MOVE
+        )
+        if self.push_level:
+            self.cells.append(state.last_push if parent >= 0 else -1)
+        if state.macro is not None and parent >= 0:
+            self.macros[len(self.parents) - 1] = state.macro
+        return len(self.parents) - 1
+
+    def get_path(self, index):
+        """Get the path from the root to the given node
+        Note: the path is a list of directions, or of (box, direction) tuples for the push-level search
+        """
+        path = []
+        while self.parents[index] >= 0:
+            if index in self.macros:
+                path.extend(reversed(self.macros[index]))
+                index = self.parents[index]
+                continue
+            direction = DIRECTIONS[self.moves[index]]
+            if self.push_level:
+                path.append((self.cells[index], direction))
+            else:
+                path.append(direction)
+            index = self.parents[index]
+        path.reverse()
+        return path
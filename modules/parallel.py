@@ -0,0 +1,365 @@
+"""
+Sokuban parallel search (hash-distributed A*, HDA*)
+The states are distributed over a pool of worker processes by hashing their key: the worker key % N owns the state.
+Every worker owns its share of the visited states (best cost, parent key and moves of every state) and its own open
+list, expands its states and sends the generated neighbors to their owners in batches.
+The bfs strategy runs as a uniform cost search (the cost of every move is equal) and the astar strategy adds the
+heuristic, so both find an optimal solution:
+- a worker that expands a solved state reports its cost to the coordinator, which broadcasts it as the incumbent
+- a worker is idle when its open list is empty or only holds states with a priority not lower than the incumbent
+- a worker that reaches the time or memory limit of the solver reports it to the coordinator, which stops the
+  workers, collects their counters and stops the search with the limit status
+- the node limit is global: with a node limit, every worker reports its number of expanded states after every round,
+  and the coordinator stops the search the same way when their sum reaches the limit (it can be exceeded by at most
+  a round of expansions per worker)
+- the search terminates when all the workers are idle and no batch is in flight. The coordinator checks this by
+  probing the workers for their sent/received batch counts, and only terminates after two consecutive probe rounds
+  with all the workers idle, balanced counts and no change in between
+The solution is then rebuilt by asking the owner of every state on the path for its parent.
+The parallel search class has the following methods:
+- search(): run the search on the worker pool and get the solution path
+- probe(inboxes): ask all the workers for their status
+- trace(inboxes, control, workers, key): rebuild the path to the given state from the parent pointers of the workers
+- receive(control, workers): get the next message for the coordinator
+The parallel worker class has the following methods:
+- run(): handle the messages and expand the states until the coordinator stops the worker
+- handle(message): handle a message from the coordinator or another worker
+- send_stats(): send the counters of the worker to the coordinator before it stops
+- add(item): add a state to the open list, if it is the cheapest path found to it
+- expand(): expand a round of states and send their neighbors to their owners
+- is_idle(): check if the worker has no state worth expanding
+"""
+
+import heapq
+import multiprocessing
+import queue
+
+from modules.limits import OUT_OF_BUDGET, SearchLimitReached
+
+# Number of states a worker expands before reading its messages and sending its batches
+EXPANSIONS_PER_ROUND = 64
+
+
+def run_worker(worker_id, solver, informed, inboxes, control):
+    """Entry point of a worker process"""
+    ParallelWorker(worker_id, solver, informed, inboxes, control).run()
+
+
+class ParallelSearch(object):
+    def __init__(self, solver, num_of_workers, informed):
+        self.solver = solver
+        self.num_of_workers = num_of_workers
+        self.informed = informed
+
+    def search(self):
+        """Run the search on the worker pool and get the solution path"""
+        context = multiprocessing.get_context()
+        inboxes = [context.Queue() for _ in range(self.num_of_workers)]
+        control = context.Queue()
+        workers = [
+            context.Process(
+                target=run_worker,
+                args=(worker_id, self.solver, self.informed, inboxes, control),
+                daemon=True,
+            )
+            for worker_id in range(self.num_of_workers)
+        ]
+        for worker in workers:
+            worker.start()
+
+        try:
+            # The start state is sent to its owner as the first batch
+            start_state = self.solver.get_start_state()
+            item = (
+                start_state.key,
+                start_state.player,
+                start_state.boxes,
+                0,
+                None,
+                None,
+            )
+            inboxes[start_state.key % self.num_of_workers].put(("states", [item]))
+            num_of_sent = 1
+
+            incumbent = float("inf")
+            goal_key = None
+            idle = [False] * self.num_of_workers
+            # Replies of the current probe round, None if no round is running
+            replies = None
+            previous_counts = None
+
+            limit_status = None
+            expanded = [0] * self.num_of_workers  # Last count reported by every worker
+            while True:
+                message = self.receive(control, workers)
+                kind = message[0]
+                if kind == "solution":
+                    _, cost, key = message
+                    if cost < incumbent:
+                        incumbent = cost
+                        goal_key = key
+                        for inbox in inboxes:
+                            inbox.put(("incumbent", cost))
+                elif kind == "limit":
+                    # The workers are still stopped below, so that their counters are collected
+                    limit_status = message[1]
+                    break
+                elif kind == "expanded":
+                    expanded[message[1]] = message[2]
+                    if sum(expanded) >= self.solver.node_limit:
+                        limit_status = OUT_OF_BUDGET
+                        break
+                elif kind == "idle":
+                    idle[message[1]] = True
+                elif kind == "probe":
+                    _, worker_id, sent, received, worker_idle = message
+                    replies[worker_id] = (sent, received, worker_idle)
+                    # The messages of a worker arrive in order, so a later "idle" message still wins
+                    idle[worker_id] = worker_idle
+                    if len(replies) < self.num_of_workers:
+                        continue
+                    counts = [replies[worker_id][:2] for worker_id in range(len(idle))]
+                    all_idle = all(reply[2] for reply in replies.values())
+                    balanced = num_of_sent + sum(sent for sent, _ in counts) == sum(
+                        received for _, received in counts
+                    )
+                    replies = None
+                    if all_idle and balanced:
+                        if counts == previous_counts:
+                            break
+                        previous_counts = counts
+                    else:
+                        previous_counts = None
+
+                # Start a probe round when all the workers claim to be idle
+                if replies is None and all(idle):
+                    replies = {}
+                    self.probe(inboxes)
+
+            path = None
+            if goal_key is not None and limit_status is None:
+                path = self.trace(inboxes, control, workers, goal_key)
+
+            # Stop the workers and collect their counters
+            for inbox in inboxes:
+                inbox.put(("stop",))
+            num_of_stopped = 0
+            while num_of_stopped < self.num_of_workers:
+                # The stopped workers exit, so only wait a bounded time for the others
+                try:
+                    message = control.get(timeout=10)
+                except queue.Empty:
+                    # A worker died or hangs: its counters are lost, and it is terminated below
+                    break
+                if message[0] == "stats":
+                    _, expanded, generated, pruned = message
+                    self.solver.num_of_expanded += expanded
+                    self.solver.num_of_generated += generated
+                    if self.solver.deadlock_detector is not None:
+                        self.solver.deadlock_detector.num_of_pruned += pruned
+                    num_of_stopped += 1
+            if limit_status is not None:
+                raise SearchLimitReached(limit_status)
+            return path
+        finally:
+            for worker in workers:
+                worker.join(timeout=1)
+                if worker.is_alive():
+                    worker.terminate()
+
+    def probe(self, inboxes):
+        """Ask all the workers for their status"""
+        for inbox in inboxes:
+            inbox.put(("probe",))
+
+    def trace(self, inboxes, control, workers, key):
+        """Rebuild the path to the given state from the parent pointers of the workers"""
+        path = []
+        while True:
+            inboxes[key % self.num_of_workers].put(("trace", key))
+            message = self.receive(control, workers)
+            while message[0] != "parent":
+                # Late status messages are not needed anymore
+                message = self.receive(control, workers)
+            _, parent_key, moves = message
+            if parent_key is None:
+                break
+            path.extend(reversed(moves))
+            key = parent_key
+        path.reverse()
+        return path
+
+    def receive(self, control, workers):
+        """Get the next message for the coordinator
+        Note: raises an exception if a worker process stopped, instead of waiting forever
+        """
+        while True:
+            try:
+                return control.get(timeout=1)
+            except queue.Empty:
+                if not all(worker.is_alive() for worker in workers):
+                    raise Exception("A worker process stopped unexpectedly")
+
+
+class ParallelWorker(object):
+    def __init__(self, worker_id, solver, informed, inboxes, control):
+        self.worker_id = worker_id
+        self.solver = solver
+        self.informed = informed
+        self.inboxes = inboxes
+        self.inbox = inboxes[worker_id]
+        self.control = control
+        self.heuristic = solver.initial_state.board.heuristic
+        # The progress is not reported from the workers, the callback belongs to the coordinator process
+        solver.progress_callback = None
+        # The node budget is shared: the coordinator checks it from the counts the workers report (see expand)
+        self.reports_expanded = solver.node_limit is not None
+        solver.node_limit = None
+
+        self.heap = []  # Entries (f, -g, counter, key, player, boxes)
+        self.counter = 0
+        self.best_g = {}  # Best cost of every state owned by the worker
+        self.records = {}  # Parent key and moves of every state owned by the worker
+        self.outboxes = [[] for _ in inboxes]
+        self.incumbent = float("inf")
+        self.num_of_sent = 0
+        self.num_of_received = 0
+        self.reported_idle = False
+
+    def run(self):
+        """Handle the messages and expand the states until the coordinator stops the worker"""
+        while True:
+            if self.is_idle():
+                if not self.reported_idle:
+                    self.control.put(("idle", self.worker_id))
+                    self.reported_idle = True
+                # Nothing to expand: wait for the next message
+                if not self.handle(self.inbox.get()):
+                    return
+                continue
+
+            # Read all the pending messages without waiting
+            while True:
+                try:
+                    message = self.inbox.get_nowait()
+                except queue.Empty:
+                    break
+                if not self.handle(message):
+                    return
+            try:
+                self.expand()
+            except SearchLimitReached as limit:
+                self.control.put(("limit", limit.status))
+                self.send_stats()
+                return
+
+    def handle(self, message):
+        """Handle a message from the coordinator or another worker
+        Note: returns False if the worker must stop
+        """
+        kind = message[0]
+        if kind == "states":
+            self.num_of_received += 1
+            for item in message[1]:
+                if self.add(item):
+                    self.reported_idle = False
+        elif kind == "incumbent":
+            self.incumbent = min(self.incumbent, message[1])
+        elif kind == "probe":
+            self.control.put(
+                (
+                    "probe",
+                    self.worker_id,
+                    self.num_of_sent,
+                    self.num_of_received,
+                    self.is_idle(),
+                )
+            )
+        elif kind == "trace":
+            parent_key, moves = self.records[message[1]]
+            self.control.put(("parent", parent_key, moves))
+        elif kind == "stop":
+            self.send_stats()
+            return False
+        return True
+
+    def send_stats(self):
+        """Send the counters of the worker to the coordinator before it stops"""
+        detector = self.solver.deadlock_detector
+        self.control.put(
+            (
+                "stats",
+                self.solver.num_of_expanded,
+                self.solver.num_of_generated,
+                detector.num_of_pruned if detector is not None else 0,
+            )
+        )
+
+    def add(self, item):
+        """Add a state to the open list, if it is the cheapest path found to it
+        The item is a tuple (key, player, boxes, g, parent key, moves)
+        """
+        key, player, boxes, g, parent_key, moves = item
+        if g >= self.best_g.get(key, float("inf")):
+            return False
+        f = g + self.heuristic.get_heuristic(boxes) if self.informed else g
+        if f == float("inf"):
+            return False
+        self.best_g[key] = g
+        self.records[key] = (parent_key, moves)
+        heapq.heappush(self.heap, (f, -g, self.counter, key, player, boxes))
+        self.counter += 1
+        return True
+
+    def expand(self):
+        """Expand a round of states and send their neighbors to their owners"""
+        state = self.solver.initial_state.copy()
+        for _ in range(EXPANSIONS_PER_ROUND):
+            if self.is_idle():
+                break
+            _, negative_g, _, key, player, boxes = heapq.heappop(self.heap)
+            state = state.copy()
+            state.key = key
+            state.player = player
+            state.boxes = boxes
+            state.current_cost = -negative_g
+
+            # The goal is checked when the state is expanded, so the incumbent is always an optimal candidate
+            if state.check_solved():
+                self.incumbent = state.current_cost
+                self.control.put(("solution", state.current_cost, key))
+                continue
+
+            neighbors = self.solver.get_neighbors(state)
+            for n in neighbors:
+                item = (
+                    n.key,
+                    n.player,
+                    n.boxes,
+                    n.current_cost,
+                    key,
+                    self.solver.get_moves(n),
+                )
+                owner = n.key % len(self.inboxes)
+                if owner == self.worker_id:
+                    self.add(item)
+                else:
+                    self.outboxes[owner].append(item)
+
+        # Send the batches
+        for owner, items in enumerate(self.outboxes):
+            if items:
+                self.inboxes[owner].put(("states", items))
+                self.num_of_sent += 1
+                self.outboxes[owner] = []
+        if self.reports_expanded:
+            self.control.put(("expanded", self.worker_id, self.solver.num_of_expanded))
+
+    def is_idle(self):
+        """Check if the worker has no state worth expanding
+        Stale entries (states since reached with a cheaper cost) are removed from the top of the open list
+        """
+        heap = self.heap
+        while heap and -heap[0][1] != self.best_g[heap[0][3]]:
+            heapq.heappop(heap)
+        return not heap or heap[0][0] >= self.incumbent
@@ -0,0 +1,282 @@
+"""
+Sokuban pattern database
+The heuristic engine matches every box to a target on its own, so it misses the pushes caused by boxes getting in
+each other's way. A pattern database stores the exact number of pushes needed to put a small group of boxes (a
+pattern: one, two or three boxes) on targets, with the other boxes removed:
+- the costs are computed once per puzzle with a backward breadth-first search over the static board: the pattern
+  boxes start on every combination of targets and are pulled away. The player is relaxed (it can stand on any free
+  cell), so the costs are lower bounds of the pushes of the pattern boxes in the real puzzle
+- a box can only be on a live cell (a floor cell that is not a dead square), so a pattern is a combination of live
+  cells and its cost is stored at the rank of the combination in a flat byte array per pattern size
+- the bound of a state is additive: the boxes are split into disjoint patterns, and the costs of the patterns are
+  summed (different boxes never share a push). The patterns that gain the most over their single boxes are chosen
+  greedily, for every pattern size, and the largest sum is kept
+- the pattern heuristic is the max of the bound and of the matching of the heuristic engine (which accounts for the
+  targets the boxes compete for), so it stays admissible
+The databases are built offline (see build_pdb.py) and saved to a file that is memory-mapped at solve time, so the
+worker processes of a parallel search share the same pages:
+- header: magic b"SPDB", version (uint16), number of tables (uint16), number of live cells (uint32)
+- signature of the board (SHA-1 of the walls and the targets), to check the database matches the puzzle
+- live cells: number of live cells uint32
+- table directory: pattern size, offset and length (uint32 each) of every table
+- tables: one cost per pattern (uint8, UNREACHABLE if the pattern boxes can never all reach targets)
+The module has the following functions:
+- get_signature(board): get the signature of the static board
+- get_binomials(num_of_cells, max_size): get the table of binomial coefficients
+- get_rank(binomials, indices): get the rank of a combination of live cell indices
+- build_tables(board, sizes): compute the costs of the patterns of the given sizes
+- save_database(path, board, sizes): build the tables of the given board and save them
+The pattern database class (a file opened with memory mapping) has the following methods:
+- open(): map the file and read its directory (again in every worker process)
+- get_cost(size, indices): get the cost of the pattern of the given live cell indices
+- get_bound(boxes): get the additive lower bound of the given box cells
+- close(): close the file
+The pattern heuristic class (used in place of the heuristic engine of the board) has the following methods:
+- get_heuristic(boxes): get the heuristic for the given box cells
+"""
+
+import hashlib
+import itertools
+import mmap
+import struct
+import sys
+from array import array
+from collections import OrderedDict
+
+DATABASE_MAGIC = b"SPDB"
+DATABASE_VERSION = 1
+DATABASE_HEADER = struct.Struct("<4sHHI")
+TABLE_HEADER = struct.Struct("<III")
+SIGNATURE_SIZE = 20
+# Cost of a pattern whose boxes can never all reach targets (the costs above are capped to MAX_COST)
+UNREACHABLE = 255
+MAX_COST = 254
+
+
+def get_signature(board):
+    """Get the signature of the static board: the walls and the targets decide the costs"""
+    data = struct.pack("<II", board.height, board.width)
+    data += bytes(board.walls) + bytes(board.target_cells)
+    return hashlib.sha1(data).digest()
+
+
+def get_binomials(num_of_cells, max_size):
+    """Get the table of binomial coefficients binomials[n][k] for n up to num_of_cells and k up to max_size"""
+    binomials = [[1] + [0] * max_size for _ in range(num_of_cells + 1)]
+    for n in range(1, num_of_cells + 1):
+        for k in range(1, max_size + 1):
+            binomials[n][k] = binomials[n - 1][k - 1] + binomials[n - 1][k]
+    return binomials
+
+
+def get_rank(binomials, indices):
+    """Get the rank of a combination of sorted live cell indices (combinatorial number system)"""
+    rank = 0
+    for k, index in enumerate(indices):
+        rank += binomials[index][k + 1]
+    return rank
+
+
+def build_tables(board, sizes):
+    """Compute the costs of the patterns of the given sizes
+    Note: returns the live cells and a dictionary from pattern size to the byte array of the costs
+    """
+    live_cells = [
+        cell
+        for cell in range(board.size)
+        if not board.walls[cell] and not board.dead_squares[cell]
+    ]
+    live_index = {cell: index for index, cell in enumerate(live_cells)}
+    max_size = max(sizes)
+    binomials = get_binomials(len(live_cells), max_size)
+    walls = board.walls
+
+    tables = {}
+    for size in sizes:
+        table = bytearray([UNREACHABLE] * binomials[len(live_cells)][size])
+        tables[size] = table
+        if size > len(board.targets):
+            continue
+        # Multi-source breadth-first search from every combination of targets, by pulling one box at a time
+        queue = list(itertools.combinations(board.targets, size))
+        for pattern in queue:
+            table[get_rank(binomials, [live_index[cell] for cell in pattern])] = 0
+        for pattern in queue:  # The queue grows while it is iterated (breadth-first)
+            cost = table[get_rank(binomials, [live_index[cell] for cell in pattern])]
+            for box in pattern:
+                for _, offset in board.moves:
+                    pulled = box + offset  # Cell the box is pulled to
+                    player = pulled + offset  # Cell the player pulls from
+                    if (
+                        walls[pulled]
+                        or walls[player]
+                        or pulled in pattern
+                        or player in pattern
+                    ):
+                        continue
+                    new_pattern = tuple(
+                        sorted(pulled if other == box else other for other in pattern)
+                    )
+                    rank = get_rank(
+                        binomials, [live_index[cell] for cell in new_pattern]
+                    )
+                    if table[rank] == UNREACHABLE:
+                        table[rank] = min(cost + 1, MAX_COST)
+                        queue.append(new_pattern)
+    return live_cells, tables
+
+
+def save_database(path, board, sizes=(2,)):
+    """Build the tables of the given board for the given pattern sizes (single boxes are always included) and save
+    them to the given path
+    """
+    sizes = sorted(set(sizes) | {1})
+    live_cells, tables = build_tables(board, sizes)
+    cells = array("I", live_cells)
+    if sys.byteorder == "big":
+        cells.byteswap()
+
+    position = (
+        DATABASE_HEADER.size
+        + SIGNATURE_SIZE
+        + 4 * len(live_cells)
+        + TABLE_HEADER.size * len(sizes)
+    )
+    directory = []
+    for size in sizes:
+        directory.append(TABLE_HEADER.pack(size, position, len(tables[size])))
+        position += len(tables[size])
+
+    with open(path, "wb") as f:
+        f.write(
+            DATABASE_HEADER.pack(
+                DATABASE_MAGIC, DATABASE_VERSION, len(sizes), len(live_cells)
+            )
+        )
+        f.write(get_signature(board))
+        f.write(cells.tobytes())
+        for entry in directory:
+            f.write(entry)
+        for size in sizes:
+            f.write(tables[size])
+
+
+class PatternDatabase(object):
+    def __init__(self, path, board):
+        self.path = path
+        self.board = board
+        self.open()
+
+    def open(self):
+        """Map the file of the database and read its directory"""
+        self.file = open(self.path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, num_of_tables, num_of_cells = DATABASE_HEADER.unpack_from(
+            self.data, 0
+        )
+        if magic != DATABASE_MAGIC or version != DATABASE_VERSION:
+            raise Exception("Invalid pattern database")
+        start = DATABASE_HEADER.size
+        if self.data[start : start + SIGNATURE_SIZE] != get_signature(self.board):
+            raise Exception("The pattern database was built for another level")
+        start += SIGNATURE_SIZE
+        cells = array("I")
+        cells.frombytes(self.data[start : start + 4 * num_of_cells])
+        if sys.byteorder == "big":
+            cells.byteswap()
+        start += 4 * num_of_cells
+        # Live cell index of every cell of the board (-1 for the walls and the dead squares)
+        self.live_index = [-1] * self.board.size
+        for index, cell in enumerate(cells):
+            self.live_index[cell] = index
+        # Pattern size -> offset of its table in the file
+        self.tables = {}
+        for i in range(num_of_tables):
+            size, offset, _ = TABLE_HEADER.unpack_from(
+                self.data, start + i * TABLE_HEADER.size
+            )
+            self.tables[size] = offset
+        self.sizes = sorted(size for size in self.tables if size > 1)
+        self.binomials = get_binomials(num_of_cells, max(self.tables))
+
+    def __getstate__(self):
+        # The memory map cannot be pickled: the worker processes map the file again
+        return {"path": self.path, "board": self.board}
+
+    def __setstate__(self, state):
+        self.path = state["path"]
+        self.board = state["board"]
+        self.open()
+
+    def get_cost(self, size, indices):
+        """Get the cost of the pattern of the given sorted live cell indices (UNREACHABLE if it cannot be solved)"""
+        return self.data[self.tables[size] + get_rank(self.binomials, indices)]
+
+    def get_bound(self, boxes):
+        """Get the additive lower bound of the given box cells on the number of pushes
+        Note: returns infinity if a box or a pattern of boxes can never reach targets
+        """
+        indices = [self.live_index[box] for box in boxes]
+        if -1 in indices:
+            return float("inf")
+        singles = [self.get_cost(1, [index]) for index in indices]
+        if UNREACHABLE in singles:
+            return float("inf")
+        base = sum(singles)
+        best = base
+        for size in self.sizes:
+            gains = []
+            for pattern in itertools.combinations(range(len(indices)), size):
+                cost = self.get_cost(size, [indices[i] for i in pattern])
+                if cost == UNREACHABLE:
+                    return float("inf")
+                gain = cost - sum(singles[i] for i in pattern)
+                if gain > 0:
+                    gains.append((gain, pattern))
+            # Greedy choice of disjoint patterns, the largest gains first
+            gains.sort(reverse=True)
+            used = set()
+            total = base
+            for gain, pattern in gains:
+                if used.isdisjoint(pattern):
+                    used.update(pattern)
+                    total += gain
+            best = max(best, total)
+        return best
+
+    def close(self):
+        """Close the file"""
+        self.data.close()
+        self.file.close()
+
+
+class PatternHeuristic(object):
+    def __init__(self, engine, database, cache_size=100000):
+        self.engine = engine
+        self.database = database
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.num_of_hits = 0
+        self.num_of_misses = 0
+        # The push distances of the engine are still used by the vectorized search
+        self.targets = engine.targets
+        self.distances = engine.distances
+
+    def get_heuristic(self, boxes):
+        """Get the heuristic for the given box cells: the max of the matching cost and of the pattern bound"""
+        value = self.cache.get(boxes)
+        if value is not None:
+            self.num_of_hits += 1
+            self.cache.move_to_end(boxes)
+            return value
+
+        self.num_of_misses += 1
+        value = self.engine.get_heuristic(boxes)
+        if value != float("inf"):
+            value = max(value, self.database.get_bound(boxes))
+
+        self.cache[boxes] = value
+        if len(self.cache) > self.cache_size:
+            # Evict the least recently used configuration
+            self.cache.popitem(last=False)
+        return value
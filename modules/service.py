@@ -0,0 +1,522 @@
+"""
+Sokuban solve service
+A local server that solves puzzles for other programs, so that they do not pay the start-up of the solver for every
+puzzle:
+- clients connect to a Unix socket or to a localhost TCP port and talk in JSON lines (one JSON object per line)
+- the jobs run on a bounded pool of worker processes, in the order they were submitted; the other jobs wait in a
+  queue until a worker is free
+- the workers are started once and stay warm: the solver modules are imported, and the precomputation of the last
+  puzzles they solved (board, dead squares, push distances and heuristic cache, Zobrist keys) is kept in an LRU cache
+  keyed by the map, so that a puzzle solved again skips it
+- a worker streams the progress of its job (at most one sample every progress_period seconds), the improved
+  solutions of arastar and the result
+- a worker found stopped when a job is sent to it (e.g. killed for its memory while idle) is replaced, and the job
+  is sent again
+- a job is cancelled by its client, or when its client disconnects: a queued job is dropped, and a running job is
+  stopped by its worker at the next progress callback (arastar then returns the best solution found so far). A
+  worker that does not stop within cancel_timeout seconds (e.g. while it precomputes a large puzzle) is terminated
+  and replaced by a new one
+Requests (from the client):
+- {"type": "solve", "id", "map", "map_path", "level", "strategy", "options"}: solve a puzzle given either as the text
+  of a level ("map") or as a map file ("map_path"), "level" being the index of the level in a collection. The id is
+  optional (one is assigned if missing) and cannot be the id of a job that has not finished. The options are keyword
+  arguments of the solver (see JOB_OPTIONS). The map file and the pattern database file are paths relative to the
+  data directory of the service and cannot leave it; without a data directory, only the text of a level is accepted
+- {"type": "cancel", "id"}: cancel a queued or running job
+Replies (to the client), all with the "id" of their job:
+- {"type": "queued", "position"}: the job is queued behind position other jobs
+- {"type": "started", "puzzle_cached"}: a worker started the job, with the precomputation of its cache or not
+- {"type": "progress", ...}: a progress sample of the search (see SearchStats.add_sample in modules/stats.py)
+- {"type": "solution", ...}: an improved solution of arastar (see Solver.report_solution)
+- {"type": "result", ...}: the result of the job, with the fields of the batch results (see modules/batch.py) and
+  the "cancelled" status if it was cancelled
+- {"type": "error", "error"}: the request was invalid (the id is None if it could not be read)
+The module has the following functions:
+- get_initial_state(puzzles, map): get the initial state of the given map, from the puzzle cache if possible
+- solve_job(connection, job, puzzles, cache, progress_period): solve a job in a worker process
+- run_worker(connection, cache_path, memory_limit, progress_period): run the loop of a worker process
+The worker class (a warm worker process) has the following methods:
+- start(): start the process
+- stop(): stop the process
+- restart(): replace the process by a new one
+- receive(executor): wait for the next message of the process, None if it stopped
+The solve service class has the following methods:
+- serve(path, host, port): run the server until it is cancelled
+- handle_client(reader, writer): read the requests of a client
+- submit(request, writer): queue a solve job
+- get_path(path): get the real path of a file of the data directory given by a client
+- cancel(job_id): cancel a queued or running job
+- schedule(): start the queued jobs on the free workers
+- run_job(worker, job): forward the messages of a running job to its client
+- kill(job): terminate the worker of a cancelled job that did not stop
+- send(writer, message): send a reply to a client
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Not available on Windows: the memory limit is ignored
+    resource = None
+
+from modules.batch import get_result
+from modules.game_state import GameState
+from modules.limits import CANCELLED, SearchLimitReached, get_peak_memory
+from modules.loader import load_map, parse_levels
+from modules.solution_cache import SolutionCache
+from modules.solver import STRATEGIES, Solver
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Keyword arguments of the solver that a job can set
+# Note: the parallel search cannot run in a worker process, and the memory limit of the solver is the peak memory of
+# the process, which a warm worker keeps from its previous jobs (see the memory limit of the service instead). The
+# external search writes to the disk, so it is not available to the clients either
+JOB_OPTIONS = (
+    "push_level",
+    "deadlock_detection",
+    "macro_moves",
+    "pattern_database",
+    "table_size",
+    "depth_limit",
+    "time_limit",
+    "node_limit",
+    "weight",
+    "weight_step",
+    "vectorized",
+)
+# Number of puzzles whose precomputation a worker keeps
+PUZZLE_CACHE_SIZE = 32
+# Number of expansions between two progress callbacks, which also check the cancellation of the job
+PROGRESS_INTERVAL = 1000
+# Maximum length of a request line in bytes
+MAX_REQUEST_SIZE = 1 << 20
+
+
+def get_initial_state(puzzles, map):
+    """Get the initial state of the given map, from the puzzle cache if possible
+    Note: returns a copy of the cached state (sharing its board) and whether it was in the cache
+    """
+    key = "\n".join("".join(row) for row in map)
+    state = puzzles.get(key)
+    cached = state is not None
+    if cached:
+        puzzles.move_to_end(key)
+    else:
+        state = GameState(map)
+        puzzles[key] = state
+        if len(puzzles) > PUZZLE_CACHE_SIZE:
+            # Evict the least recently solved puzzle
+            puzzles.popitem(last=False)
+    return state.copy(), cached
+
+
+def solve_job(connection, job, puzzles, cache, progress_period):
+    """Solve a job in a worker process and send its messages through the connection"""
+    job_id = job["id"]
+    last_report = time.time()
+
+    def report_progress(sample):
+        nonlocal last_report
+        # While the worker solves, the service only sends it cancellations, or None when it stops
+        while connection.poll():
+            message = connection.recv()
+            if message is None:
+                raise SystemExit()
+            if message == ("cancel", job_id):
+                raise SearchLimitReached(CANCELLED)
+        now = time.time()
+        if now - last_report >= progress_period:
+            last_report = now
+            connection.send(("progress", job_id, sample))
+
+    def report_solution(report):
+        report = dict(report, solution="".join(report["solution"]))
+        connection.send(("solution", job_id, report))
+
+    solver = None
+    start_time = time.process_time()
+    try:
+        state, cached = get_initial_state(puzzles, job["map"])
+        connection.send(("started", job_id, {"puzzle_cached": cached}))
+        solver = Solver(
+            state,
+            job["strategy"],
+            progress_callback=report_progress,
+            progress_interval=PROGRESS_INTERVAL,
+            solution_callback=report_solution,
+            cache=cache,
+            **job["options"]
+        )
+        solver.solve()
+        result = get_result(
+            job["map_path"], job["level"], job["strategy"], solver.get_status(), solver
+        )
+        result["cpu_time"] = time.process_time() - start_time
+        result["peak_memory"] = get_peak_memory()
+    except MemoryError:
+        # Free the search and the cached puzzles before building the result
+        solver = None
+        puzzles.clear()
+        result = get_result(
+            job["map_path"], job["level"], job["strategy"], "out_of_memory"
+        )
+    except Exception as exception:
+        result = get_result(job["map_path"], job["level"], job["strategy"], "error")
+        result["error"] = str(exception)
+    connection.send(("result", job_id, result))
+
+
+def run_worker(connection, cache_path=None, memory_limit=None, progress_period=0.5):
+    """Run the loop of a worker process: solve the jobs received through the connection until None is received"""
+    # A Ctrl+C in the terminal also reaches the workers: the service stops them itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if memory_limit and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    cache = SolutionCache(cache_path) if cache_path else None
+    puzzles = OrderedDict()  # Map -> initial state of the cached puzzles
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break  # The service stopped
+        if message is None:
+            break
+        kind, job = message
+        if kind == "solve":
+            solve_job(connection, job, puzzles, cache, progress_period)
+        # Otherwise the message cancels a job that already finished
+    if cache is not None:
+        cache.close()
+    connection.close()
+
+
+class Worker(object):
+    def __init__(
+        self, context, cache_path=None, memory_limit=None, progress_period=0.5
+    ):
+        self.context = context
+        self.cache_path = cache_path
+        self.memory_limit = memory_limit
+        self.progress_period = progress_period
+        self.process = None
+        self.connection = None
+
+    def start(self):
+        """Start the process of the worker, connected by a duplex pipe"""
+        self.connection, child = self.context.Pipe()
+        self.process = self.context.Process(
+            target=run_worker,
+            args=(child, self.cache_path, self.memory_limit, self.progress_period),
+            daemon=True,
+        )
+        self.process.start()
+        child.close()  # Only the worker process uses its end of the pipe
+
+    def stop(self, timeout=1.0):
+        """Stop the process of the worker, terminating it if it does not stop within the timeout"""
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass  # The process already stopped
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.connection.close()
+
+    def restart(self):
+        """Replace the process of the worker (after it stopped or was terminated) by a new one"""
+        self.process.join()
+        self.connection.close()
+        self.start()
+
+    async def receive(self, executor):
+        """Wait for the next message of the process in a thread of the executor
+        Note: returns None if the process stopped
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(executor, self.connection.recv)
+        except (EOFError, OSError):
+            return None
+
+
+class SolveService(object):
+    def __init__(
+        self,
+        num_of_workers=1,
+        cache_path=None,
+        memory_limit=None,
+        progress_period=0.5,
+        cancel_timeout=2.0,
+        data_directory=None,
+    ):
+        # The workers are spawned rather than forked: a worker replaced while the service runs would otherwise be
+        # forked from a process with running threads
+        context = multiprocessing.get_context("spawn")
+        self.workers = [
+            Worker(context, cache_path, memory_limit, progress_period)
+            for _ in range(num_of_workers)
+        ]
+        # Seconds a worker has to stop a cancelled job before it is terminated
+        self.cancel_timeout = cancel_timeout
+        # Directory of the map and pattern database files the clients can use (None: none)
+        self.data_directory = (
+            os.path.realpath(data_directory) if data_directory is not None else None
+        )
+        self.idle = []
+        self.pending = deque()  # Queued jobs, the oldest first
+        self.jobs = {}  # Id -> job, for the queued and running jobs
+        self.num_of_jobs = 0
+        # Tasks of the running jobs (the loop only keeps weak references)
+        self.tasks = set()
+        # One thread per worker waits for its messages
+        self.executor = ThreadPoolExecutor(num_of_workers)
+
+    async def serve(self, path=None, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Start the workers and serve the clients on the Unix socket of the given path (or on the given host and
+        port) until the server is cancelled
+        """
+        for worker in self.workers:
+            worker.start()
+        self.idle = list(self.workers)
+        try:
+            if path is not None:
+                server = await asyncio.start_unix_server(
+                    self.handle_client, path, limit=MAX_REQUEST_SIZE
+                )
+            else:
+                server = await asyncio.start_server(
+                    self.handle_client, host, port, limit=MAX_REQUEST_SIZE
+                )
+            async with server:
+                await server.serve_forever()
+        finally:
+            for worker in self.workers:
+                worker.stop()
+            self.executor.shutdown(wait=False)
+
+    async def handle_client(self, reader, writer):
+        """Read the requests of a client until it disconnects, then cancel its jobs"""
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    self.send(
+                        writer,
+                        {"type": "error", "id": None, "error": "Request too long"},
+                    )
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    request = None
+                if not isinstance(request, dict):
+                    self.send(
+                        writer,
+                        {"type": "error", "id": None, "error": "Invalid request"},
+                    )
+                elif request.get("type") == "solve":
+                    self.submit(request, writer)
+                elif request.get("type") == "cancel":
+                    if not self.cancel(request.get("id")):
+                        self.send(
+                            writer,
+                            {
+                                "type": "error",
+                                "id": request.get("id"),
+                                "error": "No queued or running job with this id",
+                            },
+                        )
+                else:
+                    self.send(
+                        writer,
+                        {
+                            "type": "error",
+                            "id": request.get("id"),
+                            "error": "Invalid request type",
+                        },
+                    )
+                await writer.drain()
+        except ConnectionError:
+            pass  # The client disconnected
+        finally:
+            for job in list(self.jobs.values()):
+                if job["writer"] is writer:
+                    self.cancel(job["id"])
+            writer.close()
+
+    def submit(self, request, writer):
+        """Queue the solve job of the given request
+        Note: returns the id of the job, None if the request is invalid
+        """
+        job_id = request.get("id")
+        if job_id is None:
+            while job_id is None or job_id in self.jobs:
+                self.num_of_jobs += 1
+                job_id = "job-%d" % self.num_of_jobs
+        error = None
+        if not isinstance(job_id, (str, int)):
+            job_id, error = None, "The id must be a string or an integer"
+        elif job_id in self.jobs:
+            error = "A job with this id is already queued or running"
+        strategy = request.get("strategy", "bfs")
+        options = request.get("options") or {}
+        if error is None and strategy not in STRATEGIES:
+            error = "Invalid strategy"
+        elif error is None and not isinstance(options, dict):
+            error = "The options must be an object"
+        elif error is None:
+            invalid = [name for name in options if name not in JOB_OPTIONS]
+            if invalid:
+                error = "Invalid options: " + ", ".join(invalid)
+        if error is None:
+            try:
+                if request.get("map") is not None:
+                    levels = parse_levels(str(request["map"]).splitlines())
+                    if not levels:
+                        raise Exception("No level found in the map")
+                    map = levels[request.get("level", 0)][1]
+                elif request.get("map_path") is not None:
+                    map = load_map(
+                        self.get_path(request["map_path"]), request.get("level", 0)
+                    )
+                else:
+                    raise Exception("The request has no map nor map path")
+                if options.get("pattern_database") is not None:
+                    options = dict(
+                        options,
+                        pattern_database=self.get_path(options["pattern_database"]),
+                    )
+            except Exception as exception:
+                error = str(exception)
+        if error is not None:
+            self.send(writer, {"type": "error", "id": job_id, "error": error})
+            return None
+
+        job = {
+            "id": job_id,
+            "map": map,
+            "map_path": request.get("map_path"),
+            "level": request.get("level", 0),
+            "strategy": strategy,
+            "options": options,
+            "writer": writer,
+            "worker": None,
+            "cancelled": False,
+            "killed": False,
+            "timer": None,
+        }
+        self.jobs[job_id] = job
+        self.pending.append(job)
+        self.send(
+            writer, {"type": "queued", "id": job_id, "position": len(self.pending) - 1}
+        )
+        self.schedule()
+        return job_id
+
+    def get_path(self, path):
+        """Get the real path of a file of the data directory given by a client
+        Note: raises an exception if the service has no data directory or if the path leaves it
+        """
+        if self.data_directory is None:
+            raise Exception("The service does not accept file paths")
+        real_path = os.path.realpath(os.path.join(self.data_directory, str(path)))
+        if os.path.commonpath([real_path, self.data_directory]) != self.data_directory:
+            raise Exception("The path is outside of the data directory")
+        return real_path
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job
+        Note: returns False if there is no such job
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return False
+        if job["worker"] is None:
+            self.pending.remove(job)
+            del self.jobs[job_id]
+            result = get_result(
+                job["map_path"], job["level"], job["strategy"], CANCELLED
+            )
+            self.send(job["writer"], dict(result, type="result", id=job_id))
+        elif not job["cancelled"]:
+            # The worker stops the job at its next progress callback, or is terminated
+            job["cancelled"] = True
+            try:
+                job["worker"].connection.send(("cancel", job_id))
+            except OSError:
+                pass  # The worker already stopped
+            loop = asyncio.get_running_loop()
+            job["timer"] = loop.call_later(self.cancel_timeout, self.kill, job)
+        return True
+
+    def schedule(self):
+        """Start the queued jobs on the free workers"""
+        while self.pending and self.idle:
+            job = self.pending.popleft()
+            worker = self.idle.pop()
+            keys = ("id", "map", "map_path", "level", "strategy", "options")
+            try:
+                worker.connection.send(("solve", {key: job[key] for key in keys}))
+            except OSError:
+                # The worker stopped while it was idle (e.g. killed for its memory): replace it and queue the job again
+                worker.restart()
+                self.idle.append(worker)
+                self.pending.appendleft(job)
+                continue
+            job["worker"] = worker
+            task = asyncio.get_running_loop().create_task(self.run_job(worker, job))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def run_job(self, worker, job):
+        """Forward the messages of a running job to its client until its result, then free its worker"""
+        job_id = job["id"]
+        while True:
+            message = await worker.receive(self.executor)
+            if message is None:
+                # The worker was terminated (cancelled job) or crashed: it is replaced by a new one
+                status = CANCELLED if job["cancelled"] else "error"
+                result = get_result(
+                    job["map_path"], job["level"], job["strategy"], status
+                )
+                if not job["cancelled"]:
+                    result["error"] = "The worker process stopped unexpectedly"
+                break
+            kind, _, data = message
+            if kind == "result":
+                result = data
+                break
+            self.send(job["writer"], dict(data, type=kind, id=job_id))
+        if job["timer"] is not None:
+            job["timer"].cancel()
+        if message is None or job["killed"]:
+            # The worker may have been terminated after it sent the result
+            worker.restart()
+        del self.jobs[job_id]
+        self.idle.append(worker)
+        self.send(job["writer"], dict(result, type="result", id=job_id))
+        self.schedule()
+
+    def kill(self, job):
+        """Terminate the worker of a cancelled job that did not stop in time"""
+        if self.jobs.get(job["id"]) is job:
+            job["killed"] = True
+            job["worker"].process.terminate()
+
+    def send(self, writer, message):
+        """Send a reply to a client, unless it disconnected"""
+        if not writer.is_closing():
+            writer.write((json.dumps(message) + "\n").encode())
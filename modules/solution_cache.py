@@ -0,0 +1,236 @@
+"""
+Sokuban solution cache
+A persistent cache of solutions, so that a level that was already solved (even rotated, mirrored, with a different
+padding or with the player elsewhere in the same region) is not solved again.
+The key of a level is a canonical hash of the puzzle:
+- only the cells inside the level matter: the cells the player could walk to if there were no boxes, cropped to
+  their bounding box (walls and the outside of the level are the same)
+- every inside cell is encoded as floor, target and box flags, and the player as the first cell (in row-major order)
+  of the region it can walk to, so any player cell in the same region gives the same key
+- with symmetries, the level is encoded under the 8 symmetries of the board (transposed or not, rows and columns
+  flipped or not) and the smallest encoding is kept, with the symmetry that produced it
+The solutions are stored in the canonical orientation, with the player cell they start from. A cached solution is
+turned back to the orientation of the level, and starts with the walk of the player to that cell.
+The entries are stored in an SQLite database with a bounded number of entries; the least recently used entries
+are evicted first. The strategy is part of the key, since the strategies give solutions of different quality, along
+with the solver options that change the solution found (see Solver.get_cache_key): a push-level or macro solution is
+never served to a plain move-level search.
+The module has the following functions:
+- transform_position(transform, position, height, width): get the position after the given symmetry
+- inverse_position(transform, position, height, width): get the position before the given symmetry
+- transform_direction(transform, direction): get the direction after the given symmetry
+- inverse_direction(transform, direction): get the direction before the given symmetry
+The solution cache class has the following methods:
+- get(state, strategy): get the cached solution of the given initial state and strategy key, None if there is none
+- put(state, strategy, solution): store the solution of the given initial state and strategy key
+- get_canonical(state): get the canonical key of the given state, with its symmetry and bounding box
+- close(): close the database
+"""
+
+import hashlib
+import sqlite3
+import struct
+import time
+
+# Number of symmetries of a board: transposed or not, rows flipped or not, columns flipped or not
+NUM_OF_TRANSFORMS = 8
+# (row, column) vector of every direction
+DIRECTION_VECTORS = {"U": (-1, 0), "D": (1, 0), "L": (0, -1), "R": (0, 1)}
+VECTOR_DIRECTIONS = {
+    vector: direction for direction, vector in DIRECTION_VECTORS.items()
+}
+
+
+def transform_position(transform, position, height, width):
+    """Get the position after the given symmetry of a board of the given size
+    The board is transposed first (bit 4), then its rows (bit 2) and its columns (bit 1) are flipped
+    """
+    row, col = position
+    if transform & 4:
+        row, col = col, row
+        height, width = width, height
+    if transform & 2:
+        row = height - 1 - row
+    if transform & 1:
+        col = width - 1 - col
+    return row, col
+
+
+def inverse_position(transform, position, height, width):
+    """Get the position before the given symmetry of a board of the given size (before the symmetry)"""
+    row, col = position
+    if transform & 4:
+        height, width = width, height
+    if transform & 1:
+        col = width - 1 - col
+    if transform & 2:
+        row = height - 1 - row
+    if transform & 4:
+        row, col = col, row
+    return row, col
+
+
+def transform_direction(transform, direction):
+    """Get the direction after the given symmetry"""
+    row, col = DIRECTION_VECTORS[direction]
+    if transform & 4:
+        row, col = col, row
+    if transform & 2:
+        row = -row
+    if transform & 1:
+        col = -col
+    return VECTOR_DIRECTIONS[(row, col)]
+
+
+def inverse_direction(transform, direction):
+    """Get the direction before the given symmetry"""
+    row, col = DIRECTION_VECTORS[direction]
+    if transform & 1:
+        col = -col
+    if transform & 2:
+        row = -row
+    if transform & 4:
+        row, col = col, row
+    return VECTOR_DIRECTIONS[(row, col)]
+
+
+class SolutionCache(object):
+    def __init__(self, path, max_entries=10000, symmetries=True):
+        self.path = path
+        self.max_entries = max_entries
+        self.symmetries = symmetries
+        self.num_of_hits = 0
+        self.num_of_misses = 0
+        self.connection = sqlite3.connect(path, timeout=30)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS solutions ("
+            "puzzle TEXT, strategy TEXT, player_row INTEGER, player_col INTEGER, "
+            "solution TEXT, last_used REAL, PRIMARY KEY (puzzle, strategy))"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS solutions_last_used ON solutions (last_used)"
+        )
+        self.connection.commit()
+
+    def get(self, state, strategy):
+        """Get the cached solution (list of moves) of the given initial state, None if there is none"""
+        key, transform, origin, size = self.get_canonical(state)
+        row = self.connection.execute(
+            "SELECT player_row, player_col, solution FROM solutions "
+            "WHERE puzzle = ? AND strategy = ?",
+            (key, strategy),
+        ).fetchone()
+        if row is None:
+            self.num_of_misses += 1
+            return None
+        self.connection.execute(
+            "UPDATE solutions SET last_used = ? WHERE puzzle = ? AND strategy = ?",
+            (time.time(), key, strategy),
+        )
+        self.connection.commit()
+
+        # The cached player cell, back in the orientation and the coordinates of the level
+        player_row, player_col, solution = row
+        row, col = inverse_position(
+            transform, (player_row, player_col), size[0], size[1]
+        )
+        path = state.get_path(state.board.index((row + origin[0], col + origin[1])))
+        if path is None:
+            # Cannot happen for the same key (same player region), unless the database was changed
+            self.num_of_misses += 1
+            return None
+        self.num_of_hits += 1
+        return path + [
+            inverse_direction(transform, direction) for direction in solution
+        ]
+
+    def put(self, state, strategy, solution):
+        """Store the solution (list of moves) of the given initial state
+        Note: the solution is replayed first, so that a wrong solution is never cached
+        """
+        replayed = state.copy()
+        for direction in solution:
+            replayed.move(direction)
+        if not replayed.check_solved():
+            return
+        key, transform, origin, size = self.get_canonical(state)
+        row, col = state.board.position(state.player)
+        player_row, player_col = transform_position(
+            transform, (row - origin[0], col - origin[1]), size[0], size[1]
+        )
+        moves = "".join(
+            transform_direction(transform, direction) for direction in solution
+        )
+        self.connection.execute(
+            "INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?, ?, ?)",
+            (key, strategy, player_row, player_col, moves, time.time()),
+        )
+        # Evict the least recently used entries above the maximum number of entries
+        self.connection.execute(
+            "DELETE FROM solutions WHERE rowid IN (SELECT rowid FROM solutions "
+            "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self.connection.commit()
+
+    def get_canonical(self, state):
+        """Get the canonical key of the given state
+        Note: returns the key, the symmetry of the canonical encoding, and the origin (row, column) and the size
+        (height, width) of the bounding box of the level, before the symmetry
+        """
+        board = state.board
+        # Cells inside the level: reachable by the player if there were no boxes
+        inside = [state.player]
+        seen = {state.player}
+        for cell in inside:  # The list grows while it is iterated (breadth-first)
+            for _, offset in board.moves:
+                next_cell = cell + offset
+                if next_cell not in seen and not board.walls[next_cell]:
+                    seen.add(next_cell)
+                    inside.append(next_cell)
+        positions = {cell: board.position(cell) for cell in inside}
+        top = min(row for row, _ in positions.values())
+        left = min(col for _, col in positions.values())
+        height = max(row for row, _ in positions.values()) - top + 1
+        width = max(col for _, col in positions.values()) - left + 1
+
+        boxes = set(state.boxes)
+        reachable, _ = state.get_reachable()
+        cells = (
+            []
+        )  # (row, col, code) of every inside cell, relative to the bounding box
+        region = []  # (row, col) of the cells of the player region
+        for cell, (row, col) in positions.items():
+            code = (
+                1 | (2 if board.target_cells[cell] else 0) | (4 if cell in boxes else 0)
+            )
+            cells.append((row - top, col - left, code))
+            if reachable[cell]:
+                region.append((row - top, col - left))
+
+        best = None
+        for transform in range(NUM_OF_TRANSFORMS if self.symmetries else 1):
+            new_height, new_width = (
+                (width, height) if transform & 4 else (height, width)
+            )
+            grid = bytearray(new_height * new_width)
+            for row, col, code in cells:
+                row, col = transform_position(transform, (row, col), height, width)
+                grid[row * new_width + col] = code
+            player = min(
+                row * new_width + col
+                for row, col in (
+                    transform_position(transform, position, height, width)
+                    for position in region
+                )
+            )
+            encoding = struct.pack("<HHI", new_height, new_width, player) + bytes(grid)
+            if best is None or encoding < best[0]:
+                best = (encoding, transform)
+
+        key = hashlib.sha1(best[0]).hexdigest()
+        return key, best[1], (top, left), (height, width)
+
+    def close(self):
+        """Close the database"""
+        self.connection.close()
@@ -1,201 +1,988 @@
+import cProfile
+import heapq
+import pstats
 import time
 from collections import deque
-from queue import Queue, PriorityQueue
 
+from modules.board import OPPOSITE_DIRECTIONS
+from modules.deadlock import DeadlockDetector
+from modules.external_search import ExternalSearch
+from modules.frontier import Frontier
 from modules.game_state import GameState
+from modules.heuristic import HeuristicEngine
+from modules.limits import (
+    MEMORY_CHECK_INTERVAL,
+    NO_SOLUTION,
+    OUT_OF_BUDGET,
+    SOLVED,
+    TIMEOUT,
+    SearchLimitReached,
+    get_peak_memory,
+)
+from modules.macros import MacroMoves
+from modules.node_table import NodeTable
+from modules.parallel import ParallelSearch
+from modules.pattern_database import PatternDatabase, PatternHeuristic
+from modules.stats import (
+    SearchStats,
+    TimedDeque,
+    TimedDict,
+    TimedFrontier,
+    TimedHeuristic,
+    TimedSet,
+    TimedTranspositionTable,
+)
+from modules.transposition_table import TranspositionTable
+from modules.vector_board import VectorSearch
+
+# Strategies accepted by Solver.solve
+STRATEGIES = (
+    "bfs",
+    "dfs",
+    "astar",
+    "wastar",
+    "arastar",
+    "ucs",
+    "greedy",
+    "idastar",
+    "iddfs",
+    "bidirectional",
+    "custom",
+)
 
 
 class Solver(object):
-    def __init__(self, initial_state, strategy):
+    def __init__(
+        self,
+        initial_state,
+        strategy,
+        push_level=False,
+        deadlock_detection=False,
+        table_size=None,
+        depth_limit=None,
+        num_of_workers=None,
+        instrument=False,
+        progress_callback=None,
+        progress_interval=1000,
+        profile=False,
+        time_limit=None,
+        node_limit=None,
+        memory_limit=None,
+        weight=2.0,
+        weight_step=0.5,
+        solution_callback=None,
+        cache=None,
+        vectorized=False,
+        external=False,
+        temp_directory=None,
+        macro_moves=False,
+        pattern_database=None,
+    ):
         self.initial_state = initial_state
         self.strategy = strategy
+        # If True, the search edges are box pushes instead of single player moves
+        # Note: the bidirectional search always works on pushes (forward) and pulls (backward)
+        self.push_level = push_level or strategy == "bidirectional"
+        # If enabled, boxes are pushed through tunnels and into goal rooms in a single step (see modules/macros.py)
+        self.macros = MacroMoves(initial_state) if macro_moves else None
+        # Pattern database file (see modules/pattern_database.py) whose bound replaces the heuristic, if any
+        self.pattern_database = pattern_database
+        # If enabled, states with frozen boxes or 2x2 blocks are pruned (see modules/deadlock.py)
+        self.deadlock_detector = DeadlockDetector() if deadlock_detection else None
+        # Number of slots of the transposition table of idastar/iddfs (None: no table, only the current path is checked)
+        self.table_size = table_size
+        # Maximum depth of the depth-first strategies (dfs, iddfs), None for no limit
+        self.depth_limit = depth_limit
+        # Number of worker processes of the parallel bfs/astar (see modules/parallel.py), None to run on one core
+        self.num_of_workers = num_of_workers
+        # If True, the move-level bfs processes whole layers with NumPy (see modules/vector_board.py)
+        self.vectorized = vectorized
+        # If True, the bfs keeps its layers on disk, in a temporary directory created in temp_directory (see
+        # modules/external_search.py)
+        self.external = external
+        self.temp_directory = temp_directory
+        # If True, the time spent in every part of the hot path is measured (see modules/stats.py)
+        self.instrument = instrument
+        # Function called with a progress sample every progress_interval expansions, if any
+        self.progress_callback = progress_callback
+        if progress_interval < 1:
+            raise Exception("The progress interval must be at least 1")
+        self.progress_interval = progress_interval
+        # If True, the solve runs under cProfile (see print_profile)
+        self.profile = profile
+        self.profiler = None
+        self.stats = SearchStats(keep_samples=instrument)
+        # Budgets of the search (see modules/limits.py), None for no limit
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.memory_limit = memory_limit
+        # Weight of the heuristic of wastar, and first weight of arastar, lowered by weight_step after every solution
+        # Note: a weight below 1 acts as plain A* (weight 1)
+        if weight <= 0:
+            raise Exception("The weight must be positive")
+        self.weight = weight
+        self.weight_step = weight_step
+        # Function called with every improved solution of arastar, if any (see report_solution)
+        self.solution_callback = solution_callback
+        self.solutions = []
+        # Solution cache checked before searching and filled with the solutions found (see modules/solution_cache.py)
+        self.cache = cache
+        self.cached = False
+        # Status of the solve: solved, no_solution, timeout or out_of_budget (None before solving)
+        self.status = None
+        # Best partial state of the greedy and weighted searches (lowest heuristic), with its parent node to rebuild its path
+        self.best_state = None
+        self.best_heuristic = float("inf")
+        self.best_nodes = None
+        self.best_parent = -1
+        # Frontiers and visited sets of the running strategy, measured by the progress samples
+        self.frontiers = []
+        self.visited_sets = []
         self.solution = None
+        # A state is expanded when its neighbors are generated, the same way for every strategy
         self.num_of_expanded = 0
         self.num_of_generated = 0
+        self.start_time = None
         self.time = None
 
     def solve(self):
         start_time = time.time()
-        if self.strategy == "bfs":
-            self.solution = self.bfs()
+        self.start_time = start_time
+        if self.cache is not None:
+            solution = self.cache.get(self.initial_state, self.get_cache_key())
+            if solution is not None:
+                self.solution = solution
+                self.status = SOLVED
+                self.cached = True
+                self.time = time.time() - start_time
+                return
+        board = self.initial_state.board
+        heuristic = board.heuristic
+        database = None
+        if self.pattern_database is not None:
+            database = PatternDatabase(self.pattern_database, board)
+            board.heuristic = PatternHeuristic(heuristic, database)
+        if self.instrument:
+            board.heuristic = TimedHeuristic(board.heuristic, self.stats)
+        if self.profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        try:
+            self.solution = self.search()
+            self.status = None
+        except SearchLimitReached as limit:
+            self.solution = None
+            self.status = limit.status
+        finally:
+            if self.profiler is not None:
+                self.profiler.disable()
+            board.heuristic = heuristic
+            if database is not None:
+                database.close()
+        if self.push_level and self.solution is not None:
+            # Expand the pushes into the full list of moves expected by the visualization
+            self.solution = self.initial_state.expand_pushes(self.solution)
+        if self.status is None:
+            # The solution is replayed, so a path that does not solve the level (such as the fixed moves of the
+            # custom strategy) is never reported as solved
+            if self.solution is not None and not self.initial_state.check_solution(
+                self.solution
+            ):
+                self.solution = None
+            self.status = SOLVED if self.solution is not None else NO_SOLUTION
+        if self.cache is not None and self.solution is not None:
+            self.cache.put(self.initial_state, self.get_cache_key(), self.solution)
+        self.time = time.time() - start_time
+
+    def search(self):
+        """Run the search of the strategy and get its path (moves, or pushes if push_level)"""
+        parallel = self.num_of_workers is not None and self.num_of_workers > 1
+        if parallel and self.strategy in ("bfs", "astar"):
+            search = ParallelSearch(
+                self, self.num_of_workers, informed=self.strategy == "astar"
+            )
+            return search.search()
+        elif self.strategy == "bfs" and self.external:
+            return ExternalSearch(self, self.temp_directory).search()
+        elif (
+            self.strategy == "bfs"
+            and self.vectorized
+            and not self.push_level
+            and self.macros is None  # The vectorized moves have no macros
+        ):
+            return VectorSearch(self).search()
+        elif self.strategy == "bfs":
+            return self.bfs()
         elif self.strategy == "dfs":
-            self.solution = self.dfs()
+            return self.dfs()
         elif self.strategy == "astar":
-            self.solution = self.astar()
+            return self.astar()
+        elif self.strategy == "wastar":
+            return self.wastar()
+        elif self.strategy == "arastar":
+            return self.arastar()
         elif self.strategy == "ucs":
-            self.solution = self.ucs()
+            return self.ucs()
         elif self.strategy == "greedy":
-            self.solution = self.greedy()
+            return self.greedy()
+        elif self.strategy == "idastar":
+            return self.idastar()
+        elif self.strategy == "iddfs":
+            return self.iddfs()
+        elif self.strategy == "bidirectional":
+            return self.bidirectional()
         elif self.strategy == "custom":
-            self.solution = self.custom()
+            return self.custom()
         else:
             raise Exception("Invalid strategy")
-        self.time = time.time() - start_time
+
+    def get_cache_key(self):
+        """Get the key of the solutions of the solve in the solution cache: the strategy, with the options that change
+        the solution it finds (a solution found with pushes, macros or a weight must not be served to a plain search)
+        """
+        options = []
+        if self.push_level and self.strategy != "bidirectional":
+            options.append("push_level")
+        if self.macros is not None:
+            options.append("macro_moves")
+        if self.deadlock_detector is not None:
+            options.append("deadlock_detection")
+        if self.pattern_database is not None:
+            options.append("pattern_database=" + self.pattern_database)
+        if self.strategy in ("wastar", "arastar"):
+            options.append("weight=" + str(self.weight))
+        if self.strategy == "arastar":
+            options.append("weight_step=" + str(self.weight_step))
+        if self.strategy in ("dfs", "iddfs") and self.depth_limit is not None:
+            options.append("depth_limit=" + str(self.depth_limit))
+        if self.strategy in ("idastar", "iddfs") and self.table_size is not None:
+            options.append("table_size=" + str(self.table_size))
+        return ",".join([self.strategy] + options)
+
+    def get_start_state(self):
+        """Get the state the search starts from"""
+        if self.push_level:
+            return self.initial_state.copy().normalize()
+        return self.initial_state
+
+    def get_neighbors(self, state, backward=False):
+        """Expand the given state: get its neighbors, either by moves, by pushes or by pulls if backward
+        Note: every strategy expands its states through this method, so it counts the expanded and generated states
+        """
+        if self.instrument:
+            start = time.perf_counter()
+        neighbors = self.generate_neighbors(state, backward)
+        if self.instrument:
+            now = time.perf_counter()
+            self.stats.add_time("successors", now - start)
+            start = now
+        if self.deadlock_detector is not None and not backward:
+            neighbors = [
+                n for n in neighbors if not self.deadlock_detector.is_deadlocked(n)
+            ]
+            if self.instrument:
+                self.stats.add_time("deadlock", time.perf_counter() - start)
+        self.count_expansion(len(neighbors))
+        return neighbors
+
+    def get_legal_moves(self, state, evaluate=None):
+        """Expand the given state without creating its neighbors: get its legal moves (or pushes if push_level)
+        Used by the depth-first strategies, which walk a single mutable state (see apply_move and undo_moves).
+        If an evaluate function is given, it is called on the state every move leads to (applied in place, with the
+        player not normalized), and (value, move) tuples are returned.
+        Note: counts the expanded and generated states like get_neighbors
+        """
+        if self.instrument:
+            start = time.perf_counter()
+        if self.push_level:
+            moves = state.get_legal_pushes()
+        else:
+            moves = state.get_legal_moves()
+        if self.instrument:
+            self.stats.add_time("successors", time.perf_counter() - start)
+        if self.deadlock_detector is not None or evaluate is not None:
+            legal_moves = []
+            for move in moves:
+                records = self.apply_move(state, move, normalize=False)
+                if self.deadlock_detector is not None:
+                    if self.instrument:
+                        start = time.perf_counter()
+                    deadlocked = self.deadlock_detector.is_deadlocked(state)
+                    if self.instrument:
+                        self.stats.add_time("deadlock", time.perf_counter() - start)
+                    if deadlocked:
+                        self.undo_moves(state, records)
+                        continue
+                legal_moves.append(
+                    move if evaluate is None else (evaluate(state), move)
+                )
+                self.undo_moves(state, records)
+            moves = legal_moves
+        self.count_expansion(len(moves))
+        return moves
+
+    def apply_move(self, state, move, normalize=True):
+        """Apply a legal move (or push) to the given state in place, with the macro move it starts if enabled
+        If not normalize, the player of the push-level search stays behind the pushed box (the key is then not the
+        key of the search), which saves the walk of the player region when only the boxes are looked at.
+        Note: returns the records of the moves made, to undo them with undo_moves
+        """
+        player = state.player
+        if self.push_level:
+            box, direction = move
+            state.push(box, direction)
+            records = [(direction, player, state.pushed_box)]
+            if normalize:
+                state.normalize()
+        else:
+            state.move(move)
+            records = [(move, player, state.pushed_box)]
+        if self.macros is not None:
+            self.macros.apply(state, self.push_level, records)
+        return records
+
+    def undo_moves(self, state, records):
+        """Undo the moves of the given records in place, the last one first"""
+        for direction, player, pushed_box in reversed(records):
+            state.undo(direction, player, pushed_box)
+
+    def count_expansion(self, num_of_neighbors):
+        """Count an expanded state and its generated neighbors, report the progress and check the limits"""
+        self.num_of_expanded += 1
+        self.num_of_generated += num_of_neighbors
+        if self.num_of_expanded % self.progress_interval == 0:
+            self.report_progress()
+        if (
+            self.time_limit is not None
+            or self.node_limit is not None
+            or self.memory_limit is not None
+        ):
+            self.check_limits()
+
+    def generate_neighbors(self, state, backward=False):
+        """Generate the neighbors of the given state, with the macro moves if enabled, without counting them"""
+        if backward:
+            return state.generate_pull_neighbors()
+        elif self.push_level:
+            neighbors = state.generate_push_neighbors()
+        else:
+            neighbors = state.generate_neighbors()
+        if self.macros is not None:
+            neighbors = [self.macros.apply(n, self.push_level) for n in neighbors]
+        return neighbors
+
+    def check_limits(self):
+        """Stop the search by raising SearchLimitReached if a limit is reached"""
+        if self.node_limit is not None and self.num_of_expanded >= self.node_limit:
+            raise SearchLimitReached(OUT_OF_BUDGET)
+        if (
+            self.time_limit is not None
+            and time.time() - self.start_time >= self.time_limit
+        ):
+            raise SearchLimitReached(TIMEOUT)
+        if (
+            self.memory_limit is not None
+            and self.num_of_expanded % MEMORY_CHECK_INTERVAL == 0
+        ):
+            peak_memory = get_peak_memory()
+            if peak_memory is not None and peak_memory >= self.memory_limit:
+                raise SearchLimitReached(OUT_OF_BUDGET)
+
+    def update_best(self, state, heuristic, nodes, parent):
+        """Record the given state as the best partial state (lowest heuristic) of the search"""
+        self.best_state = state
+        self.best_heuristic = heuristic
+        self.best_nodes = nodes
+        self.best_parent = parent
+
+    def report_progress(self):
+        """Record a sample of the search progress and pass it to the progress callback, if any"""
+        frontier_size = None
+        if self.frontiers:
+            frontier_size = sum(len(frontier) for frontier in self.frontiers)
+        visited_size = None
+        if self.visited_sets:
+            visited_size = sum(len(visited) for visited in self.visited_sets)
+        sample = self.stats.add_sample(
+            self.num_of_expanded,
+            self.num_of_generated,
+            frontier_size,
+            visited_size,
+            time.time() - self.start_time,
+        )
+        if self.progress_callback is not None:
+            self.progress_callback(sample)
+
+    def track(self, frontiers, visited_sets):
+        """Set the frontiers and visited sets measured by the progress samples"""
+        self.frontiers = frontiers
+        self.visited_sets = visited_sets
+
+    def new_set(self):
+        """Get an empty set of visited states, timed if instrumented"""
+        return TimedSet(self.stats) if self.instrument else set()
+
+    def new_dict(self):
+        """Get an empty table of reached states, timed if instrumented"""
+        return TimedDict(self.stats) if self.instrument else {}
+
+    def new_queue(self, items):
+        """Get a breadth-first queue of the given items, timed if instrumented"""
+        return TimedDeque(self.stats, items) if self.instrument else deque(items)
+
+    def new_frontier(self):
+        """Get an empty priority queue, timed if instrumented"""
+        return TimedFrontier(self.stats) if self.instrument else Frontier()
+
+    def get_moves(self, state):
+        """Get the path entries of the move or push that generated the given state (several for a macro move)"""
+        if state.macro is not None:
+            return list(state.macro)
+        if self.push_level:
+            return [(state.last_push, state.last_move)]
+        return [state.last_move]
+
+    def join_moves(self, path):
+        """Join a path of move lists (one per search step) into a single list of moves"""
+        return [move for moves in path for move in moves]
 
     def bfs(self):
-        visited = set()  # Set to keep track of visited nodes
-        queue = deque(
-            [(self.initial_state, [])]
-        )  # Queue to keep track of states to explore. Initialize with the initial state.
+        visited = self.new_set()  # Set to keep track of visited nodes
+        nodes = NodeTable(self.push_level)  # Parent pointers of the expanded states
+        queue = self.new_queue(
+            [(self.get_start_state(), -1)]
+        )  # Queue of (state, parent node) to explore. Initialize with the initial state.
+        self.track([queue], [visited])
 
         # While there are states to explore
         while queue:
             # Get the next state to explore
-            state, path = queue.popleft()  # Pop the leftmost state from the queue.
-            self.num_of_expanded += 1
+            state, parent = queue.popleft()  # Pop the leftmost state from the queue.
+            node = nodes.add(parent, state)
 
             # If the state is solved, return the path
             if state.check_solved():
-                return path
+                return nodes.get_path(node)
 
             # Add the state to the visited set
-            visited.add(str(state.map))
+            visited.add(state.key)
 
             # Get list of neighbors of the state
-            neighbors = state.generate_neighbors()
-            self.num_of_generated += len(neighbors)
+            neighbors = self.get_neighbors(state)
 
             # Iterate through the neighbors
             for n in neighbors:
                 if n.check_solved():
-                    return path + [n.last_move]
+                    return nodes.get_path(nodes.add(node, n))
                 # If the neighbor has not been visited, add it to the back of the queue.
-                if str(n.map) not in visited:
-                    visited.add(str(n.map))
-                    queue.append((n, path + [n.last_move]))
+                if n.key not in visited:
+                    visited.add(n.key)
+                    queue.append((n, node))
 
         return None
 
     def dfs(self):
-        visited = set()
+        """Depth-first search with an explicit stack (no recursion limit)
+        The search walks a single mutable state: every move is applied in place and undone when backtracking, so
+        no state is created per node.
+        Note: states deeper than the depth limit (if any) are not expanded. With a depth limit, a state is searched
+        again when it is reached by a shorter path, since its subtree was cut earlier the first time.
+        """
+        visited = self.new_dict()  # Key -> depth the state was reached at
+        state = self.get_start_state().copy()
+        if state.check_solved():
+            return []
+        visited[state.key] = 0
+
+        path = []  # Moves of the current path, one less than the number of stack frames
+        records = []  # Undo records of the moves of the current path
+        stack = [
+            iter(self.get_legal_moves(state))
+        ]  # One iterator over the legal moves per state of the current path
+        self.track([stack], [visited])
+
+        while stack:
+            move = next(stack[-1], None)
+            if move is None:
+                # All the moves were searched, backtrack
+                stack.pop()
+                if path:
+                    path.pop()
+                    self.undo_moves(state, records.pop())
+                continue
 
-        def dfs_recursive(state, path, visited):
+            move_records = self.apply_move(state, move)
             if state.check_solved():
-                return path
+                return self.join_moves(path + [self.get_moves(state)])
+            depth = len(path) + 1
+            if state.key in visited and (
+                self.depth_limit is None or visited[state.key] <= depth
+            ):
+                self.undo_moves(state, move_records)
+                continue
+            visited[state.key] = depth
+            if self.depth_limit is not None and depth >= self.depth_limit:
+                self.undo_moves(state, move_records)
+                continue
 
-            visited.add(str(state.map))
+            path.append(self.get_moves(state))
+            records.append(move_records)
+            stack.append(iter(self.get_legal_moves(state)))
 
-            neighbors = state.generate_neighbors()
-            self.num_of_generated += len(neighbors)
+        return None
 
-            for n in neighbors:
-                if n.check_solved():
-                    return path + [n.last_move]
-                if str(n.map) not in visited:
-                    self.num_of_expanded += 1
-                    visited.add(str(n.map))
-                    result = dfs_recursive(n, path + [n.last_move], visited)
-                    if result:
-                        return result
+    def ucs(self):
+        frontier = self.new_frontier()
+        nodes = NodeTable(self.push_level)
+        start_state = self.get_start_state()
+        self.track([frontier], [frontier.best_g])
+        frontier.push(start_state.key, (start_state, -1), 0, 0)
 
-            return None
+        while not frontier.empty():
+            # UCS uses the cost for prioritizing the states
+            state, parent = frontier.pop()
+            node = nodes.add(parent, state)
 
-        return dfs_recursive(self.initial_state, [], visited)
+            # The goal is checked when the state is expanded, so a cheaper path found later is not missed
+            if state.check_solved():
+                return nodes.get_path(node)
 
-    def ucs(self):
-        visited = set()
-        priority_queue = PriorityQueue()
-        priority_queue.put((0, self.initial_state, []))
+            neighbors = self.get_neighbors(state)
 
-        while not priority_queue.empty():
-            (
-                cost,
-                state,
-                path,
-            ) = priority_queue.get()  # UCS uses the cost for prioritizing the states
+            for n in neighbors:
+                # The frontier ignores states already reached with a cheaper or equal cost
+                n.compare_value = n.get_current_cost()
+                frontier.push(n.key, (n, node), n.compare_value, n.compare_value)
 
-            self.num_of_expanded += 1
+        return None
 
-            if state.check_solved():
-                return path
+    def astar(self):
+        # Frontier is used for automatic sorting of the states based on their compare_value
+        frontier = self.new_frontier()
+        nodes = NodeTable(self.push_level)
+        start_state = self.get_start_state()
+        self.track([frontier], [frontier.best_g])
+        frontier.push(
+            start_state.key, (start_state, -1), start_state.get_total_cost(), 0
+        )
 
-            visited.add(str(state.map))
+        while not frontier.empty():
+            # Astar uses the compare_value for prioritizing the states
+            state, parent = frontier.pop()
+            node = nodes.add(parent, state)
 
-            neighbors = state.generate_neighbors()
-            self.num_of_generated += len(neighbors)
+            # The goal is checked when the state is expanded, so a cheaper path found later is not missed
+            if state.check_solved():
+                return nodes.get_path(node)
+
+            neighbors = self.get_neighbors(state)
 
             for n in neighbors:
-                if n.check_solved():
-                    return path + [n.last_move]
-                if str(n.map) not in visited:
-                    visited.add(str(n.map))
-                    n.compare_value = cost + 1
-                    priority_queue.put((n.compare_value, n, path + [n.last_move]))
+                # Compare value is the total cost of the state
+                n.compare_value = n.get_total_cost()
+                # The item (state, parent node) is added unless the state was reached with a cheaper cost
+                frontier.push(n.key, (n, node), n.compare_value, n.get_current_cost())
 
         return None
 
-    def astar(self):
-        visited = set()
-        priority_queue = (
-            PriorityQueue()
-        )  # Priority queue is used for automatic sorting of the states based on their compare_value
-        priority_queue.put((0, self.initial_state, []))
-
-        while not priority_queue.empty():
-            (
-                _,
-                state,
-                path,
-            ) = (
-                priority_queue.get()
-            )  # Astar uses the compare_value for prioritizing the states
-
-            self.num_of_expanded += 1
+    def wastar(self):
+        """Weighted A*: A* ordered by the current cost + weight * heuristic
+        Expands fewer states than A* for a weight above 1, and the cost of the solution is at most weight times the
+        optimal cost. A weight below 1 acts as plain A*.
+        """
+        weight = max(self.weight, 1)
+        frontier = self.new_frontier()
+        nodes = NodeTable(self.push_level)
+        start_state = self.get_start_state()
+        self.track([frontier], [frontier.best_g])
+        frontier.push(
+            start_state.key,
+            (start_state, -1),
+            start_state.get_total_cost(weight),
+            0,
+        )
+        self.update_best(start_state, start_state.get_heuristic(), nodes, -1)
+
+        while not frontier.empty():
+            state, parent = frontier.pop()
+            node = nodes.add(parent, state)
 
             if state.check_solved():
-                return path
+                return nodes.get_path(node)
 
-            visited.add(str(state.map))
+            neighbors = self.get_neighbors(state)
 
-            neighbors = state.generate_neighbors()
-            self.num_of_generated += len(neighbors)
+            for n in neighbors:
+                n.compare_value = n.get_total_cost(weight)
+                heuristic = (n.compare_value - n.current_cost) / weight
+                if heuristic < self.best_heuristic:
+                    self.update_best(n, heuristic, nodes, node)
+                frontier.push(n.key, (n, node), n.compare_value, n.get_current_cost())
+
+        return None
+
+    def arastar(self):
+        """Anytime repairing A* (ARA*): weighted A* searches with a decreasing weight that reuse the previous effort
+        - a first solution is found quickly with the first weight, then the weight is lowered by the weight step
+          after every search until it reaches 1 (the last solution is then optimal)
+        - the cost (g) of every state is kept between the searches. A state improved after it was expanded is not
+          expanded again in the same search, but kept aside (inconsistent) and put back in the open list for the next
+          one, whose priorities are recomputed with the new weight
+        - a search stops as soon as no state in the open list has a priority lower than the cost of the solution
+        Every improved solution is reported with its suboptimality bound (see report_solution). If a limit is
+        reached after a solution was found, the best solution so far is returned.
+        """
+        nodes = NodeTable(self.push_level)
+        start_state = self.get_start_state()
+        if start_state.check_solved():
+            return []
+        start_node = nodes.add(-1, start_state)
+        # Best cost, node and state of every state reached so far
+        costs = {start_state.key: 0}
+        records = {start_state.key: (start_node, start_state)}
+        heap = (
+            []
+        )  # Entries (f, -g, counter, key) of the open list, stale if g is not the best cost anymore
+        counter = 0
+        inconsistent = (
+            {}
+        )  # States improved after they were expanded in the current search
+        goal_cost = float("inf")
+        goal_node = None
+        reported_cost = float("inf")
+        self.update_best(start_state, start_state.get_heuristic(), nodes, -1)
+        weight = max(self.weight, 1)
+        heapq.heappush(
+            heap, (start_state.get_total_cost(weight), 0, counter, start_state.key)
+        )
+        self.track([heap], [costs])
+
+        try:
+            while True:
+                closed = set()
+                while heap and heap[0][0] < goal_cost:
+                    _, negative_g, _, key = heapq.heappop(heap)
+                    if -negative_g != costs[key] or key in closed:
+                        continue  # Stale entry
+                    closed.add(key)
+                    node, state = records[key]
+
+                    for n in self.get_neighbors(state):
+                        if n.current_cost >= costs.get(n.key, float("inf")):
+                            continue
+                        costs[n.key] = n.current_cost
+                        n_node = nodes.add(node, n)
+                        records[n.key] = (n_node, n)
+                        if n.check_solved():
+                            if n.current_cost < goal_cost:
+                                goal_cost = n.current_cost
+                                goal_node = n_node
+                            continue
+                        if n.key in closed:
+                            inconsistent[n.key] = n
+                            continue
+                        f = n.get_total_cost(weight)
+                        heuristic = (f - n.current_cost) / weight
+                        if heuristic < self.best_heuristic:
+                            self.update_best(n, heuristic, nodes, node)
+                        counter += 1
+                        heapq.heappush(heap, (f, -n.current_cost, counter, n.key))
+
+                if goal_node is None:
+                    # No solution with this weight means no solution at all
+                    return None
+                # Lowest cost + heuristic of the states left to search, a lower bound on the optimal cost
+                lower_bound = min(
+                    [goal_cost]
+                    + [
+                        records[key][1].get_total_cost()
+                        for key in self.get_open_keys(heap, costs, inconsistent)
+                    ]
+                )
+                bound = min(weight, goal_cost / lower_bound if lower_bound else 1)
+                bound = max(bound, 1)
+                # Only the improved solutions are reported, and the last one once it is proven optimal
+                if goal_cost < reported_cost or bound <= 1:
+                    reported_cost = goal_cost
+                    self.report_solution(
+                        nodes.get_path(goal_node), goal_cost, weight, bound
+                    )
+                if bound <= 1:
+                    return nodes.get_path(goal_node)
+
+                # Lower the weight and rebuild the open list with the inconsistent states
+                weight = max(weight - self.weight_step, 1)
+                open_keys = self.get_open_keys(heap, costs, inconsistent)
+                heap = []
+                for key in open_keys:
+                    counter += 1
+                    heap.append(
+                        (
+                            records[key][1].get_total_cost(weight),
+                            -costs[key],
+                            counter,
+                            key,
+                        )
+                    )
+                heapq.heapify(heap)
+                inconsistent = {}
+                self.track([heap], [costs])
+        except SearchLimitReached:
+            if goal_node is None:
+                raise
+            # Anytime: the best solution found before the limit is the result
+            return nodes.get_path(goal_node)
+
+    def get_open_keys(self, heap, costs, inconsistent):
+        """Get the keys of the states left to search by arastar: the open list (without stale entries) and the
+        inconsistent states
+        """
+        keys = {key for _, negative_g, _, key in heap if -negative_g == costs[key]}
+        keys.update(inconsistent)
+        return keys
+
+    def report_solution(self, path, cost, weight, bound):
+        """Record an improved solution of arastar and pass it to the solution callback, if any
+        The report has the solution (moves), its cost, the weight it was found with, its suboptimality bound (its cost
+        is at most bound times the optimal cost), and the number of expanded states and the time so far.
+        """
+        report = {
+            "solution": (
+                self.initial_state.expand_pushes(path) if self.push_level else path
+            ),
+            "cost": cost,
+            "weight": weight,
+            "bound": bound,
+            "num_of_expanded": self.num_of_expanded,
+            "time": time.time() - self.start_time,
+        }
+        self.solutions.append(report)
+        if self.solution_callback is not None:
+            self.solution_callback(report)
+
+    def greedy(self):
+        frontier = self.new_frontier()
+        nodes = NodeTable(self.push_level)
+        start_state = self.get_start_state()
+        self.track([frontier], [frontier.best_g])
+        frontier.push(start_state.key, (start_state, -1), 0, 0)
+        self.update_best(start_state, start_state.get_heuristic(), nodes, -1)
+
+        while not frontier.empty():
+            # Greedy search uses the heuristic value for prioritizing the states
+            state, parent = frontier.pop()
+            node = nodes.add(parent, state)
+
+            if state.check_solved():
+                return nodes.get_path(node)
+
+            neighbors = self.get_neighbors(state)
 
             for n in neighbors:
                 if n.check_solved():
-                    return path + [n.last_move]
-                if str(n.map) not in visited:
-                    visited.add(str(n.map))
-                    # Compare value is the total cost of the state
-                    n.compare_value = n.get_total_cost()
-                    # The object with format (compare_value, state, path) is added to the priority queue
-                    priority_queue.put((n.compare_value, n, path + [n.last_move]))
+                    return nodes.get_path(nodes.add(node, n))
+                # The cost does not matter for greedy search, so every state is only added once
+                n.compare_value = n.get_heuristic()
+                if n.compare_value < self.best_heuristic:
+                    self.update_best(n, n.compare_value, nodes, node)
+                frontier.push(n.key, (n, node), n.compare_value, 0)
 
         return None
 
-    def greedy(self):
-        visited = set()
-        priority_queue = PriorityQueue()
-        priority_queue.put((0, self.initial_state, []))
+    def idastar(self):
+        """Iterative deepening A*: repeated depth-first searches bounded by the total cost of the states.
+        The memory only holds the current path (and the fixed-size transposition table, if any).
+        """
+        return self.iterative_deepening(informed=True)
 
-        while not priority_queue.empty():
-            (
-                _,
-                state,
-                path,
-            ) = (
-                priority_queue.get()
-            )  # Greedy search uses the heuristic value for prioritizing the states
+    def iddfs(self):
+        """Iterative deepening DFS: repeated depth-first searches bounded by the depth of the states.
+        Finds a shortest solution with the memory of a depth-first search.
+        """
+        return self.iterative_deepening(informed=False)
 
-            self.num_of_expanded += 1
+    def iterative_deepening(self, informed):
+        """Run depth-first iterations with an increasing bound until a solution is found
+        The bound is on the total cost if informed, otherwise on the current cost (the depth).
+        """
+        start_state = self.get_start_state()
+        if start_state.check_solved():
+            return []
+        table = None
+        if self.table_size:
+            table = TranspositionTable(self.table_size)
+            if self.instrument:
+                table = TimedTranspositionTable(self.table_size, self.stats)
+        bound = start_state.get_total_cost() if informed else 1
+        iteration = 0
 
-            if state.check_solved():
+        while bound != float("inf") and (
+            self.depth_limit is None or informed or bound <= self.depth_limit
+        ):
+            iteration += 1
+            path, bound = self.depth_first_iteration(
+                start_state, bound, table, iteration, informed
+            )
+            if path is not None:
                 return path
 
-            visited.add(str(state.map))
+        return None
 
-            neighbors = state.generate_neighbors()
-            self.num_of_generated += len(neighbors)
+    def depth_first_iteration(self, start_state, bound, table, iteration, informed):
+        """Depth-first search of the states with a compare value within the bound
+        The search walks a single mutable copy of the start state, applying and undoing the moves in place.
+        Note: returns the path if a solution is found, and the smallest compare value above the bound for the next iteration
+        """
+        next_bound = float("inf")
+        state = start_state.copy()
+        path = []
+        records = []  # Undo records of the moves of the current path
+        on_path = self.new_set()  # States of the current path, to avoid cycles
+        on_path.add(state.key)
+        stack = [iter(self.get_bounded_moves(state, informed))]
+        self.track([stack], [on_path])
 
-            for n in neighbors:
-                if n.check_solved():
-                    return path + [n.last_move]
-                if str(n.map) not in visited:
-                    visited.add(str(n.map))
-                    n.compare_value = n.get_heuristic()
-                    priority_queue.put((n.compare_value, n, path + [n.last_move]))
+        while stack:
+            child = next(stack[-1], None)
+            if child is None:
+                # All the moves were searched, backtrack
+                stack.pop()
+                if path:
+                    on_path.discard(state.key)
+                    path.pop()
+                    self.undo_moves(state, records.pop())
+                continue
+
+            compare_value, move = child
+            if compare_value > bound:
+                next_bound = min(next_bound, compare_value)
+                continue
+            move_records = self.apply_move(state, move)
+            if state.key in on_path or (
+                table is not None
+                and not table.check(state.key, state.get_current_cost(), iteration)
+            ):
+                self.undo_moves(state, move_records)
+                continue
+            if state.check_solved():
+                return self.join_moves(path + [self.get_moves(state)]), bound
+
+            path.append(self.get_moves(state))
+            records.append(move_records)
+            on_path.add(state.key)
+            stack.append(iter(self.get_bounded_moves(state, informed)))
+
+        return None, next_bound
+
+    def get_bounded_moves(self, state, informed):
+        """Get the (compare value, move) of the legal moves of the given state for the bounded search
+        The compare value is the total cost of the state the move leads to if informed (the most promising moves then
+        come first), otherwise its current cost.
+        """
+        if informed:
+            children = self.get_legal_moves(state, GameState.get_total_cost)
+            children.sort(key=lambda child: child[0])
+            return children
+        return self.get_legal_moves(state, GameState.get_current_cost)
+
+    def bidirectional(self):
+        """Bidirectional search: pushes forward from the initial state and pulls backward from the goal states.
+        The search stops when a state (normalized player region and boxes) is reached from both sides.
+        Both halves are ordered by their total cost, with the heuristic of the backward half matching the boxes
+        to their initial cells.
+        """
+        start_state = self.get_start_state()
+        if start_state.check_solved():
+            return []
+        backward_heuristic = HeuristicEngine(
+            start_state.board, targets=start_state.boxes, reverse=True
+        )
+        if self.instrument:
+            backward_heuristic = TimedHeuristic(backward_heuristic, self.stats)
+
+        # For each half: the frontier, the node table and the node of every state reached so far
+        forward_frontier = self.new_frontier()
+        forward_nodes = NodeTable(push_level=True)
+        forward_reached = self.new_dict()
+        forward_reached[start_state.key] = forward_nodes.add(-1, start_state)
+        forward_frontier.push(
+            start_state.key,
+            (start_state, forward_reached[start_state.key]),
+            start_state.get_total_cost(),
+            0,
+        )
+        backward_frontier = self.new_frontier()
+        backward_nodes = NodeTable(push_level=True)
+        backward_reached = self.new_dict()
+        self.track(
+            [forward_frontier, backward_frontier], [forward_reached, backward_reached]
+        )
+        for goal_state in start_state.get_goal_states():
+            backward_reached[goal_state.key] = backward_nodes.add(-1, goal_state)
+            backward_frontier.push(
+                goal_state.key,
+                (goal_state, backward_reached[goal_state.key]),
+                backward_heuristic.get_heuristic(goal_state.boxes),
+                0,
+            )
+
+        while not forward_frontier.empty() and not backward_frontier.empty():
+            # Expand the half with the smaller frontier
+            if len(forward_frontier) <= len(backward_frontier):
+                state, node = forward_frontier.pop()
+                neighbors = self.get_neighbors(state)
+                for n in neighbors:
+                    if n.key in forward_reached:
+                        continue
+                    forward_reached[n.key] = forward_nodes.add(node, n)
+                    if n.check_solved():
+                        return forward_nodes.get_path(forward_reached[n.key])
+                    if n.key in backward_reached:
+                        return self.join_paths(
+                            forward_nodes,
+                            forward_reached[n.key],
+                            backward_nodes,
+                            backward_reached[n.key],
+                        )
+                    frontier_item = (n, forward_reached[n.key])
+                    forward_frontier.push(
+                        n.key, frontier_item, n.get_total_cost(), n.current_cost
+                    )
+            else:
+                state, node = backward_frontier.pop()
+                neighbors = self.get_neighbors(state, backward=True)
+                for n in neighbors:
+                    if n.key in backward_reached:
+                        continue
+                    backward_reached[n.key] = backward_nodes.add(node, n)
+                    if n.key in forward_reached:
+                        return self.join_paths(
+                            forward_nodes,
+                            forward_reached[n.key],
+                            backward_nodes,
+                            backward_reached[n.key],
+                        )
+                    frontier_item = (n, backward_reached[n.key])
+                    backward_frontier.push(
+                        n.key,
+                        frontier_item,
+                        n.current_cost + backward_heuristic.get_heuristic(n.boxes),
+                        n.current_cost,
+                    )
 
         return None
 
+    def join_paths(self, forward_nodes, forward_node, backward_nodes, backward_node):
+        """Join the forward pushes to the meeting state with the backward pulls from the meeting state
+        The pulls are turned into pushes: pulling a box from a cell to a direction is undone by pushing it back from
+        the next cell to the opposite direction.
+        """
+        path = forward_nodes.get_path(forward_node)
+        offsets = self.initial_state.board.offsets
+        for box, direction in reversed(backward_nodes.get_path(backward_node)):
+            path.append((box + offsets[direction], OPPOSITE_DIRECTIONS[direction]))
+        return path
+
     def custom(self):
         return [
             "U",
@@ -207,6 +994,28 @@ class Solver(object):
     def get_solution(self):
         return self.solution
 
+    def get_status(self):
+        """Get the status of the solve: solved, no_solution, timeout or out_of_budget"""
+        return self.status
+
+    def get_best_state(self):
+        """Get the best partial state found by the greedy or weighted searches (lowest heuristic), None if there is none
+        Note: in the push-level search, the player of the state is normalized (see GameState.normalize)
+        """
+        return self.best_state
+
+    def get_best_path(self):
+        """Get the moves from the initial state to the best partial state, None if there is none"""
+        if self.best_state is None:
+            return None
+        path = []
+        if self.best_parent >= 0:
+            path = self.best_nodes.get_path(self.best_parent)
+            path.extend(self.get_moves(self.best_state))
+        if self.push_level:
+            return self.initial_state.expand_pushes(path)
+        return path
+
     def print_solution(self):
         print("Solution: " + str(self.solution))
 
@@ -216,8 +1025,39 @@ class Solver(object):
     def print_num_of_generated(self):
         print("Number of states generated: " + str(self.num_of_generated))
 
+    def get_num_of_pruned(self):
+        """Get the number of states pruned by the deadlock detector"""
+        if self.deadlock_detector is None:
+            return 0
+        return self.deadlock_detector.num_of_pruned
+
+    def print_num_of_pruned(self):
+        print("Number of states pruned: " + str(self.get_num_of_pruned()))
+
+    def print_status(self):
+        print("Status: " + str(self.status))
+
     def print_number_of_moves(self):
         print("Number of moves: " + str(len(self.solution)))
 
     def print_time(self):
         print("Time taken: " + str(self.time))
+
+    def get_stats(self):
+        """Get the statistics of the solve (see modules/stats.py) with the counters"""
+        summary = self.stats.get_summary()
+        summary["num_of_expanded"] = self.num_of_expanded
+        summary["num_of_generated"] = self.num_of_generated
+        summary["num_of_pruned"] = self.get_num_of_pruned()
+        summary["time"] = self.time
+        return summary
+
+    def print_stats(self):
+        self.stats.print_stats()
+
+    def print_profile(self, limit=20):
+        """Print the functions with the most cumulative time, if the solve was profiled"""
+        if self.profiler is None:
+            print("The solve was not profiled")
+            return
+        pstats.Stats(self.profiler).sort_stats("cumulative").print_stats(limit)
@@ -0,0 +1,202 @@
+"""
+Sokuban search statistics
+Structured statistics of a solve, filled by the solver:
+- timings: seconds spent in every part of the hot path, and the number of calls to it
+  - successors: generating the neighbors of the expanded states
+  - deadlock: checking the generated states for deadlocks
+  - heuristic: evaluating the heuristic
+  - visited: looking up and adding states to the visited sets and tables
+  - frontier: pushing and popping states to and from the frontier
+- samples: every progress interval expansions, the number of expanded and generated states, the frontier size, the
+  visited size and the elapsed time (only the last sample is kept when the solver is not instrumented)
+The timings are only measured when the solver is instrumented. The solver then uses the timed containers of this
+module instead of the plain ones, so the plain search pays nothing for the instrumentation.
+The search stats class has the following methods:
+- add_time(name, seconds): add the time spent in one call to the given part
+- add_sample(num_of_expanded, num_of_generated, frontier_size, visited_size, time): record a sample
+- get_summary(): get the statistics as a dictionary
+- print_stats(): print the timings and the last sample
+The timed classes (TimedSet, TimedDict, TimedDeque, TimedFrontier, TimedTranspositionTable and TimedHeuristic) wrap
+the containers used by the solver and add the time of their operations to the stats.
+"""
+
+from collections import deque
+from time import perf_counter
+
+from modules.frontier import Frontier
+from modules.transposition_table import TranspositionTable
+
+# Parts of the hot path that are timed
+TIMED_PARTS = ("successors", "deadlock", "heuristic", "visited", "frontier")
+
+
+class SearchStats(object):
+    def __init__(self, keep_samples=False):
+        self.timings = {part: 0.0 for part in TIMED_PARTS}
+        self.num_of_calls = {part: 0 for part in TIMED_PARTS}
+        # If False, only the last sample is kept, so that a long search does not fill the memory with samples
+        self.keep_samples = keep_samples
+        self.samples = []
+
+    def add_time(self, name, seconds):
+        """Add the time spent in one call to the given part"""
+        self.timings[name] += seconds
+        self.num_of_calls[name] += 1
+
+    def add_sample(
+        self, num_of_expanded, num_of_generated, frontier_size, visited_size, time
+    ):
+        """Record a sample of the search progress and get it
+        Note: the sizes are None for strategies without a frontier or a visited set
+        """
+        sample = {
+            "num_of_expanded": num_of_expanded,
+            "num_of_generated": num_of_generated,
+            "frontier_size": frontier_size,
+            "visited_size": visited_size,
+            "time": time,
+        }
+        if self.keep_samples:
+            self.samples.append(sample)
+        else:
+            self.samples = [sample]
+        return sample
+
+    def get_summary(self):
+        """Get the statistics as a dictionary"""
+        return {
+            "timings": dict(self.timings),
+            "num_of_calls": dict(self.num_of_calls),
+            "samples": list(self.samples),
+        }
+
+    def print_stats(self):
+        for part in TIMED_PARTS:
+            print(
+                "Time in {}: {:.3f}s ({} calls)".format(
+                    part, self.timings[part], self.num_of_calls[part]
+                )
+            )
+        if self.samples:
+            sample = self.samples[-1]
+            print(
+                "Last sample: {} expanded, frontier size {}, visited size {}".format(
+                    sample["num_of_expanded"],
+                    sample["frontier_size"],
+                    sample["visited_size"],
+                )
+            )
+
+
+class TimedSet(set):
+    """Set of visited states timing its lookups and insertions"""
+
+    def __init__(self, stats):
+        super().__init__()
+        self.stats = stats
+
+    def __contains__(self, key):
+        start = perf_counter()
+        result = super().__contains__(key)
+        self.stats.add_time("visited", perf_counter() - start)
+        return result
+
+    def add(self, key):
+        start = perf_counter()
+        super().add(key)
+        self.stats.add_time("visited", perf_counter() - start)
+
+
+class TimedDict(dict):
+    """Table of reached states timing its lookups and insertions"""
+
+    def __init__(self, stats):
+        super().__init__()
+        self.stats = stats
+
+    def __contains__(self, key):
+        start = perf_counter()
+        result = super().__contains__(key)
+        self.stats.add_time("visited", perf_counter() - start)
+        return result
+
+    def __setitem__(self, key, value):
+        start = perf_counter()
+        super().__setitem__(key, value)
+        self.stats.add_time("visited", perf_counter() - start)
+
+
+class TimedDeque(deque):
+    """Breadth-first queue timing its appends and pops"""
+
+    def __init__(self, stats, items=()):
+        super().__init__(items)
+        self.stats = stats
+
+    def append(self, item):
+        start = perf_counter()
+        super().append(item)
+        self.stats.add_time("frontier", perf_counter() - start)
+
+    def popleft(self):
+        start = perf_counter()
+        item = super().popleft()
+        self.stats.add_time("frontier", perf_counter() - start)
+        return item
+
+
+class TimedFrontier(Frontier):
+    """Priority queue timing its pushes and pops (including the removal of stale entries)"""
+
+    def __init__(self, stats):
+        super().__init__()
+        self.stats = stats
+
+    def push(self, key, item, f, g):
+        start = perf_counter()
+        result = super().push(key, item, f, g)
+        self.stats.add_time("frontier", perf_counter() - start)
+        return result
+
+    def pop(self):
+        start = perf_counter()
+        item = super().pop()
+        self.stats.add_time("frontier", perf_counter() - start)
+        return item
+
+    def empty(self):
+        start = perf_counter()
+        result = super().empty()
+        self.stats.add_time("frontier", perf_counter() - start)
+        return result
+
+
+class TimedTranspositionTable(TranspositionTable):
+    """Transposition table timing its checks"""
+
+    def __init__(self, size, stats):
+        super().__init__(size)
+        self.stats = stats
+
+    def check(self, key, cost, iteration):
+        start = perf_counter()
+        result = super().check(key, cost, iteration)
+        self.stats.add_time("visited", perf_counter() - start)
+        return result
+
+
+class TimedHeuristic(object):
+    """Heuristic engine wrapper timing the heuristic evaluations, the other attributes are the engine's"""
+
+    def __init__(self, engine, stats):
+        self.engine = engine
+        self.stats = stats
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+    def get_heuristic(self, boxes):
+        start = perf_counter()
+        result = self.engine.get_heuristic(boxes)
+        self.stats.add_time("heuristic", perf_counter() - start)
+        return result
@@ -0,0 +1,43 @@
+"""
+Sokuban transposition table
+A fixed-size table used by the depth-first strategies (IDA*) to avoid searching the same state twice in an
+iteration, without letting the memory grow with the number of states.
+The table has a fixed number of slots; a state key is stored in slot key % size, with the cost (g) it was reached
+with and the iteration it was stored in. Entries of older iterations are considered empty.
+Replacement policy when two states fall in the same slot in the same iteration:
+- the entry with the smaller cost (closer to the initial state) is kept, because pruning near the root saves the
+  largest subtrees
+- on equal cost the newer entry replaces the older one
+The transposition table class has the following methods:
+- check(key, cost, iteration): check if a state must be searched, and record it in the table
+"""
+
+from array import array
+
+
+class TranspositionTable(object):
+    def __init__(self, size):
+        self.size = size
+        self.keys = array("Q", bytes(8 * size))
+        self.costs = array("l", bytes(array("l").itemsize * size))
+        # Iteration of every entry, 0 for empty slots (iterations start at 1)
+        self.iterations = array("l", bytes(array("l").itemsize * size))
+        self.num_of_hits = 0
+
+    def check(self, key, cost, iteration):
+        """Check if a state must be searched, and record it in the table
+        Note: returns False if the same state was already reached with a cheaper or equal cost in this iteration
+        """
+        slot = key % self.size
+        if self.iterations[slot] == iteration:
+            if self.keys[slot] == key:
+                if self.costs[slot] <= cost:
+                    self.num_of_hits += 1
+                    return False
+            elif self.costs[slot] < cost:
+                # Keep the entry closer to the initial state
+                return True
+        self.keys[slot] = key
+        self.costs[slot] = cost
+        self.iterations[slot] = iteration
+        return True
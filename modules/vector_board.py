@@ -0,0 +1,218 @@
+"""
+Sokuban vectorized board (optional, needs NumPy)
+The static board and many game states at once are stored as NumPy arrays, so that whole frontiers are processed
+in bulk instead of one Python call per state:
+- walls, targets and dead squares are boolean arrays over the flat cells of the board (see modules/board.py)
+- a batch of N states is an array of N player cells and an (N, number of boxes) array of sorted box cells
+- the Zobrist keys of a batch are computed with one XOR reduction
+- check_solved is a single comparison of the box cells with the target cells (or a lookup in the target array)
+- generate_neighbors tries the four directions for every state of the batch in one pass per direction
+The vectorized search runs the move-level breadth-first search one layer at a time: every layer is expanded in
+bulk, deduplicated with np.unique and checked against the visited keys with np.searchsorted. The visited keys are
+kept in sorted chunks: the new keys of a layer are a new chunk, merged with the last chunks while they are not
+larger, so that there are few chunks and every key is merged a logarithmic number of times (instead of copying all
+the visited keys at every layer). The parents and moves of every layer are kept to rebuild the path. A progress sample is recorded and the limits of the
+solver are checked after every layer. If the deadlock detection is enabled, the neighbors that push a box are checked
+one at a time by the deadlock detector of the solver (it works on single game states) and the deadlocked ones are
+dropped before they are counted, like in the plain breadth-first search.
+The vector board class has the following methods:
+- get_keys(players, boxes): get the Zobrist keys of a batch of states
+- check_solved(boxes): check which states of a batch are solved
+- generate_neighbors(players, boxes): generate the neighbors of every state of a batch
+The vector search class has the following methods:
+- search(): run the layered breadth-first search and get the solution path
+- is_visited(chunks, keys): check which keys are in the sorted chunks of visited keys
+- add_visited(chunks, keys): add sorted new keys to the sorted chunks of visited keys
+- find_deadlocks(boxes, pushed): check which neighbors are deadlocked by the box they pushed
+"""
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional: only the vectorized mode needs it
+    np = None
+
+from modules.board import DIRECTIONS
+
+
+class VectorBoard(object):
+    def __init__(self, board):
+        if np is None:
+            raise Exception("The vectorized mode needs NumPy")
+        self.board = board
+        self.walls = np.frombuffer(bytes(board.walls), dtype=np.uint8).astype(bool)
+        self.targets = np.frombuffer(bytes(board.target_cells), dtype=np.uint8).astype(
+            bool
+        )
+        self.dead_squares = np.frombuffer(
+            bytes(board.dead_squares), dtype=np.uint8
+        ).astype(bool)
+        self.target_cells = np.array(board.targets, dtype=np.int64)
+        self.offsets = [board.offsets[direction] for direction in DIRECTIONS]
+        self.box_keys = np.array(board.box_keys, dtype=np.uint64)
+        self.player_keys = np.array(board.player_keys, dtype=np.uint64)
+
+    def get_keys(self, players, boxes):
+        """Get the Zobrist keys of a batch of states (same keys as Board.get_key)"""
+        return self.player_keys[players] ^ np.bitwise_xor.reduce(
+            self.box_keys[boxes], axis=1
+        )
+
+    def check_solved(self, boxes):
+        """Check which states of a batch are solved"""
+        if boxes.shape[1] == len(self.target_cells):
+            # The boxes are sorted like the targets: solved states have exactly the target cells
+            return (boxes == self.target_cells).all(axis=1)
+        return self.targets[boxes].sum(axis=1) == len(self.target_cells)
+
+    def generate_neighbors(self, players, boxes):
+        """Generate the neighbors of every state of a batch
+        Moves into walls, pushes into walls, boxes or dead squares are dropped.
+        Note: returns the index of the parent state, the direction index, the player cells, the sorted box cells and
+        the cell of the pushed box (-1 if the move does not push a box) of every neighbor
+        """
+        parents = []
+        directions = []
+        new_players = []
+        new_boxes = []
+        pushed_boxes = []
+        indices = np.arange(len(players))
+        for direction, offset in enumerate(self.offsets):
+            moved = players + offset
+            # (states, boxes): the box the player walks into, if any
+            pushed = boxes == moved[:, None]
+            pushing = pushed.any(axis=1)
+            beyond = moved + offset  # Cell a pushed box moves to
+            blocked = pushing & (
+                self.walls[beyond]
+                | self.dead_squares[beyond]
+                | (boxes == beyond[:, None]).any(axis=1)
+            )
+            valid = ~self.walls[moved] & ~blocked
+            if not valid.any():
+                continue
+            moved_boxes = np.where(pushed, beyond[:, None], boxes)[valid]
+            moved_boxes.sort(axis=1)
+            parents.append(indices[valid])
+            directions.append(np.full(int(valid.sum()), direction, dtype=np.int8))
+            new_players.append(moved[valid])
+            new_boxes.append(moved_boxes)
+            pushed_boxes.append(np.where(pushing, beyond, -1)[valid])
+        if not parents:
+            empty = np.zeros(0, dtype=np.int64)
+            return (
+                empty,
+                empty,
+                empty,
+                np.zeros((0, boxes.shape[1]), dtype=np.int64),
+                empty,
+            )
+        return (
+            np.concatenate(parents),
+            np.concatenate(directions),
+            np.concatenate(new_players),
+            np.concatenate(new_boxes),
+            np.concatenate(pushed_boxes),
+        )
+
+
+class VectorSearch(object):
+    def __init__(self, solver):
+        self.solver = solver
+        self.board = VectorBoard(solver.initial_state.board)
+
+    def search(self):
+        """Run the layered breadth-first search and get the solution path (list of directions)"""
+        solver = self.solver
+        state = solver.initial_state
+        players = np.array([state.player], dtype=np.int64)
+        boxes = np.array([state.boxes], dtype=np.int64).reshape(1, len(state.boxes))
+        if self.board.check_solved(boxes)[0]:
+            return []
+        visited = [self.board.get_keys(players, boxes)]  # Sorted chunks of visited keys
+        layers = []  # (parents, directions) of every layer, to rebuild the path
+
+        while len(players):
+            solver.num_of_expanded += len(players)
+            parents, directions, players, boxes, pushed = self.board.generate_neighbors(
+                players, boxes
+            )
+            if solver.deadlock_detector is not None:
+                kept = ~self.find_deadlocks(boxes, pushed)
+                parents = parents[kept]
+                directions = directions[kept]
+                players = players[kept]
+                boxes = boxes[kept]
+            solver.num_of_generated += len(players)
+
+            # Keep the first occurrence of every new state
+            keys = self.board.get_keys(players, boxes)
+            keys, first = np.unique(keys, return_index=True)
+            new = ~self.is_visited(visited, keys)
+            first = first[new]
+            keys = keys[new]
+            first.sort()  # Keep the generation order, like the plain breadth-first search
+            parents = parents[first]
+            directions = directions[first]
+            players = players[first]
+            boxes = boxes[first]
+            layers.append((parents, directions))
+            self.add_visited(visited, keys)
+
+            solved = np.flatnonzero(self.board.check_solved(boxes))
+            if len(solved):
+                return self.get_path(layers, int(solved[0]))
+
+            solver.track([players], visited)
+            solver.report_progress()
+            if (
+                solver.time_limit is not None
+                or solver.node_limit is not None
+                or solver.memory_limit is not None
+            ):
+                solver.check_limits()
+
+        return None
+
+    def is_visited(self, chunks, keys):
+        """Check which keys are in the sorted chunks of visited keys"""
+        visited = np.zeros(len(keys), dtype=bool)
+        for chunk in chunks:
+            positions = np.searchsorted(chunk, keys)
+            positions[positions == len(chunk)] = 0
+            visited |= chunk[positions] == keys
+        return visited
+
+    def add_visited(self, chunks, keys):
+        """Add the sorted new keys (not visited yet) to the sorted chunks of visited keys, in place
+        Note: the chunks get smaller from the first to the last one. The new keys are merged with the last chunks
+        while they are not larger, so that the number of chunks stays logarithmic in the number of keys
+        """
+        if not len(keys):
+            return
+        while chunks and len(chunks[-1]) <= len(keys):
+            keys = np.concatenate((chunks.pop(), keys))
+            # Two sorted runs: the stable sort (timsort) merges them in linear time
+            keys.sort(kind="stable")
+        chunks.append(keys)
+
+    def find_deadlocks(self, boxes, pushed):
+        """Check which neighbors are deadlocked by the box they pushed, with the deadlock detector of the solver
+        Note: the detector works on single game states, so the neighbors that push a box are checked one at a time
+        """
+        detector = self.solver.deadlock_detector
+        deadlocked = np.zeros(len(boxes), dtype=bool)
+        state = self.solver.initial_state.copy()
+        for index in np.flatnonzero(pushed >= 0):
+            state.boxes = tuple(boxes[index].tolist())
+            state.pushed_box = int(pushed[index])
+            deadlocked[index] = detector.is_deadlocked(state)
+        return deadlocked
+
+    def get_path(self, layers, index):
+        """Rebuild the path to the state with the given index in the last layer"""
+        path = []
+        for parents, directions in reversed(layers):
+            path.append(DIRECTIONS[directions[index]])
+            index = parents[index]
+        path.reverse()
+        return path
@@ -0,0 +1,66 @@
+import argparse
+import asyncio
+import os
+
+from modules.service import DEFAULT_HOST, DEFAULT_PORT, SolveService
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--socket", help="The Unix socket to listen on (instead of a TCP port)"
+    )
+    parser.add_argument(
+        "--host", help="The address to listen on (localhost)", default=DEFAULT_HOST
+    )
+    parser.add_argument(
+        "--port", help="The TCP port to listen on", type=int, default=DEFAULT_PORT
+    )
+    parser.add_argument(
+        "--workers",
+        help="Number of worker processes (jobs solved at the same time)",
+        type=int,
+        default=os.cpu_count() or 1,
+    )
+    parser.add_argument(
+        "--memory-limit", help="Memory limit of every worker in megabytes", type=int
+    )
+    parser.add_argument(
+        "--progress-period",
+        help="Minimum number of seconds between two progress messages of a job",
+        type=float,
+        default=0.5,
+    )
+    parser.add_argument(
+        "--cancel-timeout",
+        help="Seconds a worker has to stop a cancelled job before it is terminated",
+        type=float,
+        default=2.0,
+    )
+    parser.add_argument(
+        "--data-directory",
+        help="Directory of the map and pattern database files the clients can use (default: none)",
+    )
+    parser.add_argument(
+        "--cache",
+        help="The solution cache database shared by the workers",
+        default=None,
+    )
+    args = parser.parse_args()
+
+    memory_limit = args.memory_limit * 1024 * 1024 if args.memory_limit else None
+    service = SolveService(
+        args.workers,
+        args.cache,
+        memory_limit,
+        args.progress_period,
+        args.cancel_timeout,
+        args.data_directory,
+    )
+    if args.socket:
+        print("Serving on " + args.socket)
+    else:
+        print("Serving on {}:{}".format(args.host, args.port))
+    try:
+        asyncio.run(service.serve(args.socket, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,27 @@
+from modules.frontier import Frontier
+
+
+def test_expanded_state_is_reopened_with_a_cheaper_g():
+    frontier = Frontier()
+    assert frontier.push("state", "first", 10, 5)
+    assert frontier.pop() == "first"
+    assert frontier.empty()
+
+    # A path that is not cheaper is ignored, a cheaper one reopens the state
+    assert not frontier.push("state", "worse", 12, 7)
+    assert not frontier.push("state", "same", 10, 5)
+    assert frontier.empty()
+    assert frontier.push("state", "cheaper", 8, 3)
+    assert frontier.get_best_cost("state") == 3
+    assert frontier.pop() == "cheaper"
+    assert frontier.empty()
+
+
+def test_stale_entries_are_skipped():
+    frontier = Frontier()
+    frontier.push("state", "first", 10, 5)
+    frontier.push("other", "other", 9, 4)
+    frontier.push("state", "cheaper", 11, 2)
+    assert frontier.pop() == "other"
+    assert frontier.pop() == "cheaper"
+    assert frontier.empty()
@@ -0,0 +1,53 @@
+import os
+
+from modules.game_state import GameState
+from modules.loader import load_map
+from modules.solver import Solver
+
+MAPS_DIRECTORY = os.path.join(os.path.dirname(__file__), os.pardir, "maps")
+
+
+def test_undo_restores_the_state_after_a_solution():
+    state = GameState(load_map(os.path.join(MAPS_DIRECTORY, "sokoban2.txt")))
+    solver = Solver(state.copy(), "astar")
+    solver.solve()
+    initial = (state.player, state.boxes, state.key, state.current_cost)
+
+    records = []  # (direction, player, pushed box) of every move, as used by undo
+    for direction in solver.get_solution():
+        player = state.player
+        state.move(direction)
+        records.append((direction, player, state.pushed_box))
+    assert state.check_solved()
+    assert any(pushed_box is not None for _, _, pushed_box in records)
+
+    for direction, player, pushed_box in reversed(records):
+        state.undo(direction, player, pushed_box)
+    assert (state.player, state.boxes, state.key, state.current_cost) == initial
+    assert state.key == state.board.get_key(state.player, state.boxes)
+
+
+def test_goal_states_are_only_seeded_next_to_the_boxes():
+    # The floor around the level is outside of it: the player can never end there
+    rows = [
+        "  #####   ",
+        "###   #   ",
+        "#.@$  #   ",
+        "### $.#   ",
+        "#.##$ #   ",
+        "# # . ##  ",
+        "#$ *$$.#  ",
+        "#   .  #  ",
+        "########  ",
+        "          ",
+    ]
+    state = GameState([list(row) for row in rows])
+    goal_states = state.get_goal_states()
+    assert [state.board.position(goal.player) for goal in goal_states] == [
+        (1, 3),
+        (5, 1),
+        (5, 3),
+    ]
+    for goal in goal_states:
+        assert goal.check_solved()
+        assert goal.key == goal.copy().normalize().key
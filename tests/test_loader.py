@@ -0,0 +1,30 @@
+from modules.loader import get_level_offsets, load_levels, load_map
+
+COLLECTION = """; Two levels
+Run-length encoded
+3#|#@$.#|5#
+
+Ragged rows
+####
+#-@$.#
+ ####
+"""
+
+
+def test_collection_levels_are_decoded_and_padded(tmp_path):
+    path = str(tmp_path / "collection.sok")
+    with open(path, "w") as f:
+        f.write(COLLECTION)
+
+    levels = load_levels(path)
+    assert [title for title, _ in levels] == ["Run-length encoded", "Ragged rows"]
+    assert ["".join(row) for row in levels[0][1]] == ["###  ", "#@$.#", "#####"]
+    # "-" is floor, and the short rows are padded with floor to the longest one
+    assert ["".join(row) for row in levels[1][1]] == ["####  ", "# @$.#", " #### "]
+
+    # Reading a level at its offset gives the same map as parsing the collection
+    offsets = get_level_offsets(path)
+    assert len(offsets) == 2
+    for level, offset in enumerate(offsets):
+        assert load_map(path, level, offset) == levels[level][1]
+        assert load_map(path, level) == levels[level][1]
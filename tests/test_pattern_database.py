@@ -0,0 +1,41 @@
+import os
+
+from modules.game_state import GameState
+from modules.loader import load_map
+from modules.pattern_database import PatternDatabase, save_database
+from modules.solver import Solver
+
+MAPS_DIRECTORY = os.path.join(os.path.dirname(__file__), os.pardir, "maps")
+
+
+def get_pushed_boxes(map, solution):
+    """Get the boxes of the level before the solution and after every push of it"""
+    state = GameState(map)
+    boxes = [state.boxes]
+    for direction in solution:
+        state.move(direction)
+        if state.pushed_box is not None:
+            boxes.append(state.boxes)
+    return boxes
+
+
+def test_bound_is_admissible_on_the_optimal_solution(tmp_path):
+    for name in ("sokoban2.txt", "sokoban3.txt", "sokoban4.txt"):
+        map = load_map(os.path.join(MAPS_DIRECTORY, name))
+        path = str(tmp_path / (name + ".pdb"))
+        save_database(path, GameState(map).board)
+
+        # The push-level A* solution has the optimal number of pushes, and so has every suffix of it
+        solver = Solver(GameState(map), "astar", push_level=True)
+        solver.solve()
+        boxes = get_pushed_boxes(map, solver.get_solution())
+        num_of_pushes = len(boxes) - 1
+        database = PatternDatabase(path, GameState(map).board)
+        for index, state_boxes in enumerate(boxes):
+            assert database.get_bound(state_boxes) <= num_of_pushes - index
+        database.close()
+
+        # A* with the bound as its heuristic still finds the optimal number of pushes
+        solver = Solver(GameState(map), "astar", push_level=True, pattern_database=path)
+        solver.solve()
+        assert len(get_pushed_boxes(map, solver.get_solution())) - 1 == num_of_pushes
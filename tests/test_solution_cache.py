@@ -0,0 +1,35 @@
+import os
+
+from modules.game_state import GameState
+from modules.loader import load_map
+from modules.solution_cache import SolutionCache
+from modules.solver import Solver
+
+MAPS_DIRECTORY = os.path.join(os.path.dirname(__file__), os.pardir, "maps")
+
+
+def rotate(map):
+    """Rotate the map a quarter turn clockwise"""
+    return [list(row) for row in zip(*map[::-1])]
+
+
+def mirror(map):
+    """Mirror the map left to right"""
+    return [row[::-1] for row in map]
+
+
+def test_rotated_and_mirrored_levels_hit_the_cache(tmp_path):
+    map = load_map(os.path.join(MAPS_DIRECTORY, "sokoban4.txt"))
+    cache = SolutionCache(str(tmp_path / "cache.db"))
+    solver = Solver(GameState(map), "astar")
+    solver.solve()
+    cache.put(GameState(map), "astar", solver.get_solution())
+
+    for variant in (rotate(map), mirror(map), rotate(rotate(mirror(map)))):
+        state = GameState(variant)
+        solution = cache.get(state, "astar")
+        assert solution is not None
+        assert state.check_solution(solution)
+    assert cache.num_of_hits == 3
+    assert cache.get(GameState(map), "bfs") is None
+    cache.close()
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from modules.game_state import GameState
+from modules.loader import load_map
+from modules.solver import STRATEGIES, Solver
+
+MAPS_DIRECTORY = os.path.join(os.path.dirname(__file__), os.pardir, "maps")
+# Number of moves of the optimal solution of maps/sokoban3.txt
+SOKOBAN3_OPTIMAL_MOVES = 34
+# Bundled maps every strategy solves in a few seconds
+BUNDLED_MAPS = ("sokoban1.txt", "sokoban2.txt", "sokoban3.txt", "sokoban4.txt")
+# Strategies without a transposition table, too slow for the longer bundled maps: only run on sokoban1.txt
+SLOW_STRATEGIES = ("idastar", "iddfs")
+
+
+def load_state(name):
+    return GameState(load_map(os.path.join(MAPS_DIRECTORY, name)))
+
+
+@pytest.mark.parametrize(
+    "strategy, map_name",
+    [
+        (strategy, map_name)
+        for strategy in STRATEGIES
+        if strategy != "custom"
+        for map_name in BUNDLED_MAPS
+        if strategy not in SLOW_STRATEGIES or map_name == "sokoban1.txt"
+    ],
+)
+def test_solution_solves_the_level(strategy, map_name):
+    solver = Solver(load_state(map_name), strategy)
+    solver.solve()
+    assert solver.get_status() == "solved"
+    assert load_state(map_name).check_solution(solver.get_solution())
+
+
+def test_custom_strategy_is_not_reported_as_solved():
+    solver = Solver(load_state("sokoban2.txt"), "custom")
+    solver.solve()
+    assert solver.get_status() == "no_solution"
+    assert solver.get_solution() is None
+
+
+def test_dfs_finds_solution_within_depth_limit():
+    for depth_limit in (SOKOBAN3_OPTIMAL_MOVES, SOKOBAN3_OPTIMAL_MOVES + 2):
+        solver = Solver(load_state("sokoban3.txt"), "dfs", depth_limit=depth_limit)
+        solver.solve()
+        assert solver.get_status() == "solved"
+        assert SOKOBAN3_OPTIMAL_MOVES <= len(solver.get_solution()) <= depth_limit